@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,12 @@ INSTALLED_APPS = [
 
 TAILWIND_APP_NAME = 'theme'
 
+# Files the app writes at runtime; kept out of the source tree's history by .gitignore
+RUNTIME_CACHE_DIR = Path(os.environ.get('SKILLS_CACHE_DIR', BASE_DIR / 'cache'))
+
+# bs_icon downloads its SVG from the CDN on every render unless it can keep a copy on disk
+BS_ICONS_CACHE = RUNTIME_CACHE_DIR / 'bootstrap_icons'
+
 INTERNAL_IPS = ['127.0.0.1']
 
 NPM_BIN_PATH = "/usr/local/bin/npm"
@@ -57,6 +64,12 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Background threads that process question/option images after authoring requests
+IMAGE_PROCESSING_WORKERS = 2
+
+# Stream every upload to a temporary file instead of buffering it in memory
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -64,23 +77,35 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'skills.middleware.CurrentStudentMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'TheSkillsTree.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# Production template profile: outside DEBUG templates are parsed once per
+# process and the navbar/footer includes are served from the cache
+# (see `python manage.py benchmark_templates`)
+TEMPLATE_FRAGMENT_CACHE = not DEBUG
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'skills.context_processors.current_student',
             ],
         },
     },
@@ -99,6 +124,20 @@ DATABASES = {
     }
 }
 
+# Dashboards, public pages, the navbar and the material taxonomy are cached
+# until a signal invalidates them. The cache has to be shared by every
+# gunicorn worker for that invalidation to reach them all: a per-process
+# LocMemCache would keep serving stale copies in the other workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': RUNTIME_CACHE_DIR / 'django',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
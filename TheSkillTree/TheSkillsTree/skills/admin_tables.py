@@ -0,0 +1,146 @@
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from .cohorts import grade_filter
+from .models import SignupUser, StudyMaterial, StudyMaterialGrade
+from .search import matching_ids, search_available
+
+TABLE_PAGE_SIZE = 50
+TABLE_MAX_PAGE_SIZE = 200
+
+# Sortable columns of each table; every one has an index on (column, id)
+STUDENT_SORTS = {
+    'student_name': 'student_name',
+    'parent_name': 'parent_name',
+    'grade': 'grade',
+    'email': 'email',
+    'created_at': 'created_at',
+}
+MATERIAL_SORTS = {
+    'subject': 'subject',
+    'created_at': 'created_at',
+}
+DATETIME_COLUMNS = {'created_at'}
+
+
+def parse_sort(value, sorts, default):
+    """Split a "column" or "-column" sort parameter, falling back to ``default``"""
+    descending = value.startswith('-')
+    column = value.lstrip('-')
+    if column not in sorts:
+        descending = default.startswith('-')
+        column = default.lstrip('-')
+    return sorts[column], descending
+
+
+def encode_cursor(value, pk):
+    value = value.isoformat() if hasattr(value, 'isoformat') else value
+    return f'{value}|{pk}'
+
+
+def decode_cursor(cursor, column):
+    """Split a "<value>|<id>" cursor into its keyset values"""
+    value, _, pk = cursor.rpartition('|')
+    if column in DATETIME_COLUMNS:
+        value = parse_datetime(value)
+    if value is None or not pk.isdigit():
+        raise ValueError('Invalid cursor')
+    return value, int(pk)
+
+
+def keyset_page(queryset, column, descending=False, cursor=None, limit=None):
+    """One page of ``queryset`` ordered by ``column`` then id, after ``cursor``
+
+    Returns the rows and the cursor of the next page (None on the last page).
+    Each page is a range scan of the (column, id) index, however deep it is.
+    """
+    try:
+        limit = max(1, min(int(limit or TABLE_PAGE_SIZE), TABLE_MAX_PAGE_SIZE))
+    except ValueError:
+        limit = TABLE_PAGE_SIZE
+
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}{column}', f'{prefix}id')
+    if cursor:
+        value, pk = decode_cursor(cursor, column)
+        after = 'lt' if descending else 'gt'
+        queryset = queryset.filter(Q(**{f'{column}__{after}': value}) | Q(**{column: value, f'id__{after}': pk}))
+
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], column), rows[-1].id)
+
+
+def search_students(term):
+    students = SignupUser.objects.all()
+    term = term.strip()
+    if not term:
+        return students
+    if search_available():
+        ids = matching_ids(term, 'student')
+        return students.filter(id__in=ids) if ids is not None else students
+
+    condition = Q(student_name__istartswith=term) | Q(parent_name__istartswith=term) | Q(email__istartswith=term)
+    if term.isdigit():
+        condition |= grade_filter(term)
+    return students.filter(condition)
+
+
+def search_materials(term):
+    materials = StudyMaterial.objects.all()
+    term = term.strip()
+    if not term:
+        return materials
+    if search_available():
+        ids = matching_ids(term, 'material')
+        return materials.filter(id__in=ids) if ids is not None else materials
+
+    condition = Q(subject__istartswith=term) | Q(topic__istartswith=term) | Q(sub_topic__istartswith=term)
+    if term.isdigit():
+        condition |= Q(id__in=StudyMaterialGrade.objects.filter(grade=int(term)).values('material'))
+    return materials.filter(condition)
+
+
+def serialize_student(student):
+    return {
+        'id': student.id,
+        'parent_name': student.parent_name,
+        'student_name': student.student_name,
+        'grade': student.grade,
+        'email': student.email,
+        'detail_url': reverse('student_detail', args=[student.id]),
+    }
+
+
+def serialize_material(material):
+    return {
+        'id': material.id,
+        'subject': material.subject,
+        'topic': material.topic or '',
+        'sub_topic': material.sub_topic or '',
+        'grades': material.grades,
+        'file_link': material.file_link,
+        'short_video_link': material.short_video_link or '',
+        'created_at': material.created_at.strftime('%b %d, %Y'),
+        'delete_url': reverse('delete_study_material', args=[material.id]),
+    }
+
+
+def students_page(params):
+    """A page of the admin students table for the q, sort, cursor and limit parameters"""
+    column, descending = parse_sort(params.get('sort', ''), STUDENT_SORTS, 'student_name')
+    rows, next_cursor = keyset_page(
+        search_students(params.get('q', '')), column, descending, params.get('cursor'), params.get('limit')
+    )
+    return {'rows': [serialize_student(student) for student in rows], 'next_cursor': next_cursor}
+
+
+def materials_page(params):
+    """A page of the admin study materials table for the q, sort, cursor and limit parameters"""
+    column, descending = parse_sort(params.get('sort', ''), MATERIAL_SORTS, '-created_at')
+    rows, next_cursor = keyset_page(
+        search_materials(params.get('q', '')), column, descending, params.get('cursor'), params.get('limit')
+    )
+    return {'rows': [serialize_material(material) for material in rows], 'next_cursor': next_cursor}
@@ -2,7 +2,10 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from .models import SignupUser, StudyMaterial, Test
+from django.http import JsonResponse
+from .admin_tables import materials_page, students_page
+from .models import SignupUser
+from .search import search_available, typeahead
 
 def admin_login_view(request):
     if request.method == 'POST':
@@ -22,19 +25,57 @@ def admin_login_view(request):
 
 @login_required(login_url='/admin-login/')
 def admin_dashboard_view(request):
-    students = SignupUser.objects.all()
-    study_materials = StudyMaterial.objects.all()
-    practice_tests = Test.objects.all().prefetch_related('questions')
-
+    # Only the first page of each table is sent; search, sorting and further
+    # pages come from the table endpoints, and tests from get_all_tests
     context = {
-        'students': students,
-        'study_materials': study_materials,
-        'practice_tests': practice_tests,
+        'students_page': students_page({}),
+        'materials_page': materials_page({}),
     }
 
     return render(request, 'skills/admin_dashboard.html', context)
 
 
+def _table_view(request, get_page):
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+
+    try:
+        return JsonResponse({'success': True, **get_page(request.GET)})
+
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+
+@login_required(login_url='/signin/admin/')
+def students_table_view(request):
+    """One page of the students table, searched and sorted on the server"""
+    return _table_view(request, students_page)
+
+
+@login_required(login_url='/signin/admin/')
+def materials_table_view(request):
+    """One page of the study materials table, searched and sorted on the server"""
+    return _table_view(request, materials_page)
+
+
+@login_required(login_url='/signin/admin/')
+def admin_search_view(request):
+    """Ranked typeahead matches among students and study materials"""
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+    if not search_available():
+        return JsonResponse({'success': False, 'message': 'Search index is not available'}, status=503)
+
+    kind = request.GET.get('kind')
+    if kind not in (None, '', 'student', 'material'):
+        return JsonResponse({'success': False, 'message': 'kind must be student or material'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'results': typeahead(request.GET.get('q', ''), kind, request.GET.get('limit'))
+    })
+
+
 @login_required(login_url='/admin-login/')
 def student_detail_view(request, student_id):
     student = get_object_or_404(SignupUser, id=student_id)
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from .models import AnswerCheckpoint, AssignedTest
+
+OPEN_ASSIGNMENT_TIMEOUT = 60
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def save_checkpoint(student_id, test_id, assignment_id, answers, feedback=None):
+    """Append one autosave of an assignment with a single insert
+
+    Returns False, and forgets the cached assignment, when the assignment
+    was deleted or completed since it was looked up.
+    """
+    feedback = feedback or {}
+    rows = [
+        AnswerCheckpoint(
+            assignment_id=assignment_id,
+            question_id=int(question_id),
+            option_id=_parse_id(answers[question_id]) if question_id in answers else None,
+            feedback=feedback.get(question_id)
+        )
+        for question_id in set(answers) | set(feedback)
+    ]
+    if not AssignedTest.objects.filter(id=assignment_id, completed=False).exists():
+        cache.delete(open_assignment_key(student_id, test_id))
+        return False
+    if rows:
+        try:
+            with transaction.atomic():
+                AnswerCheckpoint.objects.bulk_create(rows)
+        except IntegrityError:
+            cache.delete(open_assignment_key(student_id, test_id))
+            return False
+    return True
+
+
+def open_assignment_key(student_id, test_id):
+    return f'open_assignment:{student_id}:{test_id}'
+
+
+def get_open_assignment_id(student_id, test_id):
+    """Return the id of an assignment that is still in progress, cached briefly"""
+    key = open_assignment_key(student_id, test_id)
+    assignment_id = cache.get(key)
+    if assignment_id is None:
+        assignment_id = AssignedTest.objects.filter(
+            student_id=student_id,
+            test_id=test_id,
+            completed=False
+        ).values_list('id', flat=True).first()
+        if assignment_id is not None:
+            cache.set(key, assignment_id, OPEN_ASSIGNMENT_TIMEOUT)
+    return assignment_id
+
+
+def load_checkpoints(assignment_id):
+    """Fold every checkpoint of an assignment into the latest answer and feedback maps"""
+    answers = {}
+    feedback = {}
+    rows = AnswerCheckpoint.objects.filter(assignment_id=assignment_id)\
+        .order_by('id')\
+        .values_list('question_id', 'option_id', 'feedback')
+    for question_id, option_id, question_feedback in rows:
+        if option_id is not None:
+            answers[str(question_id)] = option_id
+        if question_feedback is not None:
+            feedback[str(question_id)] = question_feedback
+
+    return answers, feedback
+
+
+def fold_checkpoints(assignment, answers, feedback):
+    """Merge checkpointed answers under the answers sent with the final submission"""
+    cache.delete(open_assignment_key(assignment.student_id, assignment.test_id))
+    saved_answers, saved_feedback = load_checkpoints(assignment.id)
+    return {**saved_answers, **answers}, {**saved_feedback, **feedback}
@@ -0,0 +1,45 @@
+import re
+from django.db.models import Q
+from .models import SignupUser
+
+
+def grade_filter(grade):
+    """Match a grade number against values such as "5" or "Grade 5\""""
+    return Q(grade__regex=fr"\b{re.escape(str(grade))}\b")
+
+
+def select_students(student_ids=None, selector=None):
+    """Resolve explicit ids and/or a server-side selector to a student queryset
+
+    Supported selector keys, combined with AND:
+
+    * ``grade``: students in that grade (verified only unless ``verified`` is false)
+    * ``has_test``: students who have been assigned that test
+    * ``completed``: with ``has_test``, only students who did (or did not) complete it
+    """
+    condition = Q(pk__in=[])
+
+    if student_ids:
+        condition |= Q(id__in=student_ids)
+
+    if selector:
+        selector_condition = Q()
+        if selector.get('grade'):
+            selector_condition &= grade_filter(selector['grade'])
+            if selector.get('verified', True):
+                selector_condition &= Q(is_verified=True)
+        if selector.get('has_test'):
+            selector_condition &= Q(assignedtest__test_id=selector['has_test'])
+            if 'completed' in selector:
+                selector_condition &= Q(assignedtest__completed=bool(selector['completed']))
+        if not selector_condition:
+            raise ValueError('Selector must include a grade or has_test')
+        condition |= selector_condition
+
+    return SignupUser.objects.filter(condition).distinct()
+
+
+def grade_number(grade):
+    """The number of a grade value such as "5" or "Grade 5", or None"""
+    match = re.search(r'\d+', grade or '')
+    return int(match.group()) if match else None
@@ -0,0 +1,7 @@
+def current_student(request):
+    """Make the signed-in student and their profile picture available to every template"""
+    student = getattr(request, 'student', None)
+    return {
+        'student': student,
+        'profile_picture_url': student.get_profile_picture_url() if student else None,
+    }
@@ -1,13 +1,13 @@
-from django.shortcuts import render
 from django.http import FileResponse
 import os
+from .page_cache import render_public_page
 
 def math_page_view(request):
-    return render(request, 'skills/CoursesPage/Math/math.html')
+    return render_public_page(request, 'skills/CoursesPage/Math/math.html')
 
 
 def public_speaking_page_view(request):
-    return render(request, 'skills/CoursesPage/PublicSpeaking/publicspeking.html')
+    return render_public_page(request, 'skills/CoursesPage/PublicSpeaking/publicSpeaking.html')
 
 def download_pdf(request, grade):
     pdf_directory = 'pdf file path'
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import AssignedTest, Question, StudentEvent, StudentMaterial
+
+DASHBOARD_TIMEOUT = 60 * 10
+
+# Longest date range the calendar events endpoint serves in one request
+MAX_EVENTS_WINDOW = timedelta(days=93)
+
+
+def dashboard_cache_key(student_id, day=None):
+    # Validity and expiry flags depend on the day, so each day gets its own entry
+    day = day or timezone.now().date()
+    return f'dashboard:{student_id}:{day.isoformat()}'
+
+
+def invalidate_dashboard(*student_ids):
+    cache.delete_many([dashboard_cache_key(student_id) for student_id in student_ids])
+
+
+def build_dashboard_payload(student, today):
+    """Collect the materials and tests the student dashboard renders in three queries"""
+    student_materials = []
+    unique_topics = set()
+    rows = StudentMaterial.objects.filter(student=student).select_related('material')
+    for sm in rows:
+        material = sm.material
+        if material.topic:
+            unique_topics.add(material.topic)
+        student_materials.append({
+            'id': sm.id,
+            'valid_until': sm.valid_until,
+            'is_valid': today <= sm.valid_until,
+            'material': {
+                'subject': material.subject,
+                'topic': material.topic,
+                'sub_topic': material.sub_topic,
+                'grades': material.grades,
+                'file_link': material.file_link,
+                'short_video_link': material.short_video_link,
+            }
+        })
+
+    question_counts = Question.objects.filter(test=OuterRef('test_id'))\
+        .order_by()\
+        .values('test')\
+        .annotate(count=Count('id'))\
+        .values('count')
+    assignments = AssignedTest.objects.filter(student=student)\
+        .select_related('test')\
+        .annotate(questions_count=Coalesce(Subquery(question_counts), 0))\
+        .order_by('-assigned_date')
+
+    assigned_tests = []
+    practice_tests = []
+    for assignment in assignments:
+        test = assignment.test
+        (practice_tests if test.is_practice else assigned_tests).append({
+            'id': test.id,
+            'name': test.name,
+            'subject': test.subject,
+            'duration_minutes': test.duration_minutes,
+            'questions_count': assignment.questions_count,
+            'completed': assignment.completed,
+            'score': assignment.score,
+            'assigned_date': assignment.assigned_date.strftime('%Y-%m-%d %H:%M'),
+            'completed_date': assignment.completed_date.strftime('%Y-%m-%d %H:%M') if assignment.completed_date else None,
+            'valid_until': assignment.valid_until.strftime('%Y-%m-%d') if assignment.valid_until else 'No expiry',
+            'is_expired': assignment.valid_until and today > assignment.valid_until
+        })
+
+    return {
+        'student_materials': student_materials,
+        'unique_topics': sorted(unique_topics),
+        'assigned_tests': assigned_tests,
+        'practice_tests': practice_tests,
+    }
+
+
+def get_dashboard_payload(student):
+    """Return the cached dashboard payload of a student, building it on a miss"""
+    today = timezone.now().date()
+    key = dashboard_cache_key(student.id, today)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_dashboard_payload(student, today)
+        cache.set(key, payload, DASHBOARD_TIMEOUT)
+    return payload
+
+
+def serialize_event(event):
+    return {
+        'id': event.id,
+        'title': event.title,
+        'class_link': event.class_link,
+        'description': event.description or '',
+        'event_type': event.event_type,
+        'event_date': event.event_date.strftime('%Y-%m-%d'),
+        'start_time': event.start_time.strftime('%H:%M'),
+        'end_time': event.end_time.strftime('%H:%M'),
+        'timezone': event.timezone,
+        'is_completed': event.is_completed,
+        'notes': event.notes or ''
+    }
+
+
+def get_events_window(student_id, start, end):
+    """Events of a student between two dates, read with a range on (student, event_date)"""
+    events = StudentEvent.objects.filter(
+        student_id=student_id,
+        event_date__gte=start,
+        event_date__lte=end
+    ).order_by('event_date', 'start_time')
+    return [serialize_event(event) for event in events]
@@ -0,0 +1,179 @@
+from collections import defaultdict
+from django.db import transaction
+from .models import Question, Option
+from .images import is_upload_handle, release_image, retain_image
+
+QUESTION_FIELDS = ['question_text', 'question_image', 'points', 'order']
+OPTION_FIELDS = ['option_text', 'option_image', 'is_correct', 'order']
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _resolve_image(value, current):
+    """Work out the stored image name for an editor image value
+
+    A ``data:`` URL or ``upload:`` handle is a new upload: the current image
+    stays in place until the image pool has written the replacement, and
+    the upload is returned as the second item. Any other non-empty value
+    means "keep the current image" and an empty value removes the image.
+    Names sent by the client are never stored, so a row can only point at
+    an image the server wrote.
+    """
+    if not value:
+        return None, None
+    if value.startswith('data:') or is_upload_handle(value):
+        return current, value
+    return current, None
+
+
+def _apply_fields(instance, values):
+    """Set changed attributes on an instance and report whether any changed"""
+    changed = False
+    for field, value in values.items():
+        current = getattr(instance, field)
+        if field.endswith('_image'):
+            current = current.name or None
+        if current != value:
+            setattr(instance, field, value)
+            changed = True
+    return changed
+
+
+def apply_test_edit(test, data, images):
+    """Apply an editor payload to a test, writing only the rows that changed
+
+    Questions and options are matched to stored rows by ``id``; entries
+    without a known id are created and stored rows missing from the payload
+    are deleted. New uploads are queued on ``images`` (an ``ImageJobs``)
+    and references to images the test no longer uses are released once the
+    surrounding transaction commits. Returns a summary of the writes.
+    """
+    questions = {question.id: question for question in Question.objects.filter(test=test)}
+    options_by_question = defaultdict(dict)
+    for option in Option.objects.filter(question__test=test):
+        options_by_question[option.question_id][option.id] = option
+
+    summary = defaultdict(int)
+    question_updates = []
+    option_updates = []
+    new_questions = []
+    new_options = []
+    kept_question_ids = set()
+    kept_option_ids = set()
+    orphaned_images = []
+    retained_images = []
+
+    def diff_options(question, options_data, stored_options):
+        for j, option_data in enumerate(options_data):
+            option = stored_options.get(_parse_id(option_data.get('id')))
+            current_image = option.option_image.name if option and option.option_image else None
+            image, upload = _resolve_image(option_data.get('optionImage'), current_image)
+            values = {
+                'option_text': option_data['text'],
+                'option_image': image,
+                'is_correct': bool(option_data['isCorrect']),
+                'order': j + 1
+            }
+
+            if option is None:
+                new_options.append((question, values, upload))
+                if image:
+                    retained_images.append(image)
+                continue
+
+            if upload:
+                images.add(option, 'option_image', upload, 'option_images', replaces=current_image)
+
+            kept_option_ids.add(option.id)
+            if current_image and current_image != values['option_image']:
+                orphaned_images.append(current_image)
+            if _apply_fields(option, values):
+                option_updates.append(option)
+
+    for i, question_data in enumerate(data['questions']):
+        question = questions.get(_parse_id(question_data.get('id')))
+        current_image = question.question_image.name if question and question.question_image else None
+        image, upload = _resolve_image(question_data.get('questionImage'), current_image)
+        values = {
+            'question_text': question_data['text'],
+            'question_image': image,
+            'points': int(question_data['points']),
+            'order': i + 1
+        }
+
+        if question is None:
+            question = Question(test=test, **values)
+            new_questions.append(question)
+            if image:
+                retained_images.append(image)
+            if upload:
+                images.add(question, 'question_image', upload, 'question_images')
+            diff_options(question, question_data['options'], {})
+            continue
+
+        if upload:
+            images.add(question, 'question_image', upload, 'question_images', replaces=current_image)
+
+        kept_question_ids.add(question.id)
+        if current_image and current_image != values['question_image']:
+            orphaned_images.append(current_image)
+        if _apply_fields(question, values):
+            question_updates.append(question)
+        diff_options(question, question_data['options'], options_by_question[question.id])
+
+    removed_question_ids = set(questions) - kept_question_ids
+    removed_options = [
+        option
+        for stored_options in options_by_question.values()
+        for option in stored_options.values()
+        if option.id not in kept_option_ids
+    ]
+    removed_option_ids = [option.id for option in removed_options]
+
+    for question_id in removed_question_ids:
+        if questions[question_id].question_image:
+            orphaned_images.append(questions[question_id].question_image.name)
+    for option in removed_options:
+        if option.option_image:
+            orphaned_images.append(option.option_image.name)
+
+    with transaction.atomic():
+        if removed_option_ids:
+            summary['options_deleted'] = len(removed_option_ids)
+            Option.objects.filter(id__in=removed_option_ids).delete()
+        if removed_question_ids:
+            summary['questions_deleted'] = len(removed_question_ids)
+            Question.objects.filter(id__in=removed_question_ids).delete()
+
+        if question_updates:
+            summary['questions_updated'] = Question.objects.bulk_update(question_updates, QUESTION_FIELDS)
+        if option_updates:
+            summary['options_updated'] = Option.objects.bulk_update(option_updates, OPTION_FIELDS)
+
+        if new_questions:
+            summary['questions_created'] = len(Question.objects.bulk_create(new_questions))
+        if new_options:
+            created_options = Option.objects.bulk_create([
+                Option(question=question, **values) for question, values, upload in new_options
+            ])
+            summary['options_created'] = len(created_options)
+            for option, (question, values, upload) in zip(created_options, new_options):
+                if upload:
+                    images.add(option, 'option_image', upload, 'option_images')
+
+        # New rows that point at an already stored image take a reference to it
+        for image in retained_images:
+            retain_image(image)
+        for image in orphaned_images:
+            transaction.on_commit(lambda image=image: release_image(image))
+
+        if len(images):
+            summary['images_pending'] = len(images)
+        images.schedule()
+
+    return dict(summary)
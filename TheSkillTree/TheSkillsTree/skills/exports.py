@@ -0,0 +1,104 @@
+import csv
+import json
+from .cohorts import grade_filter
+from .models import AssignedTest, SignupUser, StudentAnswer
+
+EXPORT_CHUNK_SIZE = 500
+
+EXPORT_COLUMNS = [
+    'assignment_id', 'student_id', 'student_name', 'student_grade',
+    'test_id', 'test_name', 'subject', 'completed_date', 'score',
+    'question_id', 'question_order', 'points', 'selected_option_id', 'is_correct', 'feedback',
+]
+
+ASSIGNMENT_FIELDS = [
+    'id', 'student_id', 'student__student_name', 'student__grade',
+    'test_id', 'test__name', 'test__subject', 'completed_date', 'score',
+]
+
+ANSWER_FIELDS = [
+    'assignment_id', 'question_id', 'question__order', 'question__points', 'selected_option_id', 'is_correct', 'feedback',
+]
+
+
+def export_assignments(test_id=None, subject=None, grade=None, date_from=None, date_to=None):
+    """Completed assignments matching the export filters, oldest first"""
+    assignments = AssignedTest.objects.filter(completed=True)
+    if test_id:
+        assignments = assignments.filter(test_id=test_id)
+    if subject:
+        assignments = assignments.filter(test__subject=subject)
+    if grade:
+        assignments = assignments.filter(student__in=SignupUser.objects.filter(grade_filter(grade)))
+    if date_from:
+        assignments = assignments.filter(completed_date__date__gte=date_from)
+    if date_to:
+        assignments = assignments.filter(completed_date__date__lte=date_to)
+    return assignments.order_by('id')
+
+
+def iter_export_rows(assignments, chunk_size=None):
+    """Yield one dict per answer (or per unanswered attempt) with constant memory
+
+    Assignments are streamed with ``.iterator()`` and their answers are
+    joined one chunk of assignments at a time, so only ``chunk_size``
+    assignments and their answers are held at once.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    chunk = []
+    for assignment in assignments.values_list(*ASSIGNMENT_FIELDS).iterator(chunk_size=chunk_size):
+        chunk.append(assignment)
+        if len(chunk) >= chunk_size:
+            yield from _join_answers(chunk)
+            chunk = []
+    if chunk:
+        yield from _join_answers(chunk)
+
+
+def _join_answers(chunk):
+    answers = {}
+    rows = StudentAnswer.objects.filter(assignment_id__in=[assignment[0] for assignment in chunk])\
+        .order_by('assignment_id', 'question__order', 'question_id')\
+        .values_list(*ANSWER_FIELDS)
+    for row in rows:
+        answers.setdefault(row[0], []).append(row[1:])
+
+    for assignment_id, student_id, student_name, grade, test_id, test_name, subject, completed_date, score in chunk:
+        base = {
+            'assignment_id': assignment_id,
+            'student_id': student_id,
+            'student_name': student_name,
+            'student_grade': grade,
+            'test_id': test_id,
+            'test_name': test_name,
+            'subject': subject,
+            'completed_date': completed_date.isoformat() if completed_date else None,
+            'score': score,
+        }
+        assignment_answers = answers.get(assignment_id)
+        if not assignment_answers:
+            yield {**base, 'question_id': None, 'question_order': None, 'points': None,
+                   'selected_option_id': None, 'is_correct': None, 'feedback': None}
+            continue
+        for question_id, order, points, option_id, is_correct, feedback in assignment_answers:
+            yield {**base, 'question_id': question_id, 'question_order': order, 'points': points,
+                   'selected_option_id': option_id, 'is_correct': is_correct, 'feedback': feedback}
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[column] if row[column] is not None else '' for column in EXPORT_COLUMNS])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
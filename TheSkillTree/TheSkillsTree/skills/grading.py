@@ -0,0 +1,158 @@
+from django.db import transaction
+from django.utils import timezone
+from .dashboard import invalidate_dashboard
+from .item_statistics import record_submission
+from .models import Question, StudentAnswer, AssignedTest
+from .progress import record_progress
+from .results import build_results_document
+from .snapshots import get_test_snapshot
+
+
+def load_answer_key(test_id):
+    """Load every question of a test with its options in a single query"""
+    rows = Question.objects.filter(test_id=test_id)\
+        .order_by('order', 'id', 'options__order', 'options__id')\
+        .values_list('id', 'question_text', 'points', 'options__id', 'options__is_correct')
+
+    answer_key = {}
+    for question_id, question_text, points, option_id, is_correct in rows:
+        entry = answer_key.get(question_id)
+        if entry is None:
+            entry = answer_key[question_id] = {
+                'id': question_id,
+                'text': question_text,
+                'points': points,
+                'option_ids': set(),
+                'correct_option_id': None,
+            }
+
+        # Questions without options come back with a single NULL option row
+        if option_id is None:
+            continue
+
+        entry['option_ids'].add(option_id)
+        if is_correct and entry['correct_option_id'] is None:
+            entry['correct_option_id'] = option_id
+
+    return answer_key
+
+
+def _parse_option_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_answers(answer_key, answers, feedback=None):
+    """Grade a submitted answer map against an answer key without touching the database"""
+    feedback = feedback or {}
+    total_points = 0
+    earned_points = 0
+    results = []
+    graded = []
+
+    for question_id, entry in answer_key.items():
+        total_points += entry['points']
+
+        selected_option_id = answers.get(str(question_id))
+        option_id = _parse_option_id(selected_option_id)
+        correct_option_id = entry['correct_option_id']
+
+        # Only options that belong to this question count as an answer
+        answered = correct_option_id is not None and option_id in entry['option_ids']
+        is_correct = answered and option_id == correct_option_id
+
+        if answered:
+            graded.append({
+                'question_id': question_id,
+                'selected_option_id': option_id,
+                'is_correct': is_correct,
+                'feedback': feedback.get(str(question_id), ''),
+            })
+
+        if is_correct:
+            earned_points += entry['points']
+
+        results.append({
+            'question_id': question_id,
+            'question_text': entry['text'],
+            'selected_option_id': selected_option_id,
+            'correct_option_id': correct_option_id,
+            'is_correct': is_correct,
+            'points': entry['points']
+        })
+
+    score = (earned_points / total_points) * 100 if total_points > 0 else 0
+
+    return {
+        'score': score,
+        'earned_points': earned_points,
+        'total_points': total_points,
+        'results': results,
+        'graded': graded,
+    }
+
+
+def submit_assignment(assignment, answers, feedback=None, general_feedback=''):
+    """Grade a submission, store every answer with a single bulk insert and update the statistics and progress rollups
+
+    Returns the grading summary, or None when the assignment was already
+    completed by a concurrent request.
+    """
+    answer_key = load_answer_key(assignment.test_id)
+    summary = grade_answers(answer_key, answers, feedback)
+    completed_date = timezone.now()
+
+    # The results page is served from this document, so build it once here
+    results_document = build_results_document(get_test_snapshot(assignment.test), {
+        row['question_id']: {
+            'option_id': row['selected_option_id'],
+            'is_correct': row['is_correct'],
+            'feedback': row['feedback']
+        }
+        for row in summary['graded']
+    })
+
+    with transaction.atomic():
+        # Flip the completed flag first so a double submit cannot write answers twice
+        updated = AssignedTest.objects.filter(pk=assignment.pk, completed=False).update(
+            completed=True,
+            completed_date=completed_date,
+            score=summary['score'],
+            student_feedback=general_feedback,
+            results_document=results_document
+        )
+        if not updated:
+            return None
+
+        StudentAnswer.objects.bulk_create([
+            StudentAnswer(
+                assignment=assignment,
+                question_id=row['question_id'],
+                selected_option_id=row['selected_option_id'],
+                is_correct=row['is_correct'],
+                feedback=row['feedback']
+            )
+            for row in summary['graded']
+        ])
+
+        record_submission(assignment.test_id, summary['score'], answer_key, summary['graded'])
+        record_progress(
+            assignment.student_id,
+            assignment.test.subject,
+            completed_date,
+            summary['score'],
+            summary['earned_points']
+        )
+
+    # The conditional update above does not send signals
+    invalidate_dashboard(assignment.student_id)
+
+    assignment.completed = True
+    assignment.completed_date = completed_date
+    assignment.score = summary['score']
+    assignment.student_feedback = general_feedback
+    assignment.results_document = results_document
+
+    return summary
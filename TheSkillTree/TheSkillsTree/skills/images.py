@@ -0,0 +1,450 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image
+from io import BytesIO
+from .models import Option, PendingImage, Question, StoredImage, Test
+import base64
+import hashlib
+import logging
+import re
+import threading
+import time
+import uuid
+import os
+
+logger = logging.getLogger(__name__)
+
+# Number of background threads that decode and encode authoring images.
+# Pillow releases the GIL while resampling and encoding, so threads scale
+# across cores; 0 processes images inline once the request commits.
+IMAGE_PROCESSING_WORKERS = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+
+# Staged multipart uploads are referenced from test JSON as "upload:<hex id>"
+UPLOAD_HANDLE_RE = re.compile(r'^upload:([0-9a-f]{32})$')
+UPLOAD_MAX_AGE = 60 * 60 * 24
+
+# Static folders holding stored question and option images; releasing an
+# image never deletes anything outside them
+IMAGE_SUBFOLDERS = ('question_images', 'option_images')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def normalize_image(source):
+    """Decode an image (bytes or an open file) into RGB no larger than 1200x1200"""
+    image = Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+
+    # Convert image mode if needed
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Resize large images
+    max_size = (1200, 1200)
+    if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    return image
+
+
+def image_file_path(url):
+    """Where a stored image URL lives on disk"""
+    return os.path.join(settings.BASE_DIR, 'skills', 'static', url.replace(settings.STATIC_URL, '', 1))
+
+
+def stored_image_url(image, subfolder):
+    """The URL a normalized image is stored under, and its content hash"""
+    digest = hashlib.sha256(f"{image.size}".encode() + image.tobytes()).hexdigest()
+    return f"{settings.STATIC_URL}{subfolder}/{digest}.jpg", digest
+
+
+def write_image_file(image, url, overwrite=False):
+    # Create target folder: static/question_images/ or static/option_images/
+    file_path = image_file_path(url)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    # Only encode and write content we have not stored before
+    if overwrite or not os.path.exists(file_path):
+        temp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        image.save(temp_path, format='JPEG', quality=85, optimize=True)
+        os.replace(temp_path, file_path)
+
+
+def write_normalized_image(image, subfolder):
+    """Write a normalized image under its content hash and return (url, digest)
+
+    Files are named after a hash of the normalized pixels, so the same
+    diagram uploaded again (in another option, test or edit) reuses the
+    existing file and skips the JPEG encode entirely. No database access,
+    so it is safe to call from worker threads.
+    """
+    url, digest = stored_image_url(image, subfolder)
+    write_image_file(image, url)
+    return url, digest
+
+
+def store_normalized_image(image, subfolder):
+    """Store a normalized image by content and take one reference to it
+
+    The file is written after the reference is taken: while a reference is
+    held no release can delete the file, and a file deleted by the last
+    release just before is written again because the row is new.
+    """
+    url, digest = stored_image_url(image, subfolder)
+    created = retain_image(url, digest)
+    try:
+        write_image_file(image, url, overwrite=created)
+    except Exception:
+        release_image(url)
+        raise
+    return url
+
+
+def save_base64_image(base64_string, subfolder='question_img'):
+    try:
+        # Strip base64 header if present
+        if base64_string.startswith('data:'):
+            _, base64_string = base64_string.split(',', 1)
+
+        return store_normalized_image(normalize_image(base64.b64decode(base64_string)), subfolder)
+
+    except Exception as e:
+        raise Exception(f"Error saving image: {str(e)}")
+
+
+def upload_staging_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'image_uploads')
+
+
+def is_upload_handle(value):
+    return bool(value) and UPLOAD_HANDLE_RE.match(value) is not None
+
+
+def stage_uploaded_image(uploaded_file):
+    """Stream an uploaded file to the staging area and return its handle
+
+    The file is copied chunk by chunk, so memory stays flat no matter how
+    large the upload is. The returned ``upload:<id>`` handle can be used in
+    place of a base64 data URL for ``questionImage``/``optionImage``.
+    """
+    staging_dir = upload_staging_dir()
+    os.makedirs(staging_dir, exist_ok=True)
+
+    upload_id = uuid.uuid4().hex
+    with open(os.path.join(staging_dir, upload_id), 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    return f"upload:{upload_id}"
+
+
+def stage_image(value):
+    """Stage a data URL like an upload and return its handle; handles are returned as they are"""
+    if is_upload_handle(value):
+        return value
+    if value.startswith('data:'):
+        _, value = value.split(',', 1)
+    return stage_uploaded_image(ContentFile(base64.b64decode(value)))
+
+
+def staged_upload_path(handle):
+    match = UPLOAD_HANDLE_RE.match(handle)
+    if match is None:
+        raise Exception(f"Error saving image: invalid upload handle {handle!r}")
+    return os.path.join(upload_staging_dir(), match.group(1))
+
+
+def save_uploaded_image(handle, subfolder='question_img', remove=True):
+    """Store a staged upload like save_base64_image and remove the staged file"""
+    staged_path = staged_upload_path(handle)
+    try:
+        with open(staged_path, 'rb') as staged:
+            url = store_normalized_image(normalize_image(staged), subfolder)
+    except Exception as e:
+        raise Exception(f"Error saving image: {str(e)}")
+
+    if remove:
+        os.remove(staged_path)
+    return url
+
+
+def save_image(value, subfolder):
+    """Store an editor image value: a base64 data URL or an upload handle"""
+    if is_upload_handle(value):
+        return save_uploaded_image(value, subfolder)
+    return save_base64_image(value, subfolder)
+
+
+def purge_stale_uploads(max_age=UPLOAD_MAX_AGE):
+    """Remove staged uploads that were never attached to a question or option"""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(upload_staging_dir()))
+    except FileNotFoundError:
+        return
+    # Uploads of jobs a restarted worker never ran are kept for process_pending_images
+    pending = {source.split(':', 1)[1] for source in PendingImage.objects.values_list('source', flat=True)}
+    for entry in entries:
+        if entry.name in pending:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def retain_image(path, digest='', count=1):
+    """Add ``count`` references to a stored image; True when its row was created"""
+    with transaction.atomic():
+        updated = StoredImage.objects.filter(path=path).update(ref_count=F('ref_count') + count)
+        if not updated:
+            StoredImage.objects.create(path=path, digest=digest, ref_count=count)
+    return not updated
+
+
+def release_image(path):
+    """Drop a reference to a stored image and delete the file with the last one
+
+    Images without a ``StoredImage`` row predate reference counting and are
+    treated as having a single reference.
+    """
+    with transaction.atomic():
+        released = StoredImage.objects.filter(path=path, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        deleted, _ = StoredImage.objects.filter(path=path, ref_count=0).delete()
+        if released and not deleted:
+            return
+        # Unlink before the transaction ends: a concurrent retain of the same
+        # image waits for it, then creates a new row and writes the file again
+        delete_file_safely(path)
+
+
+def validate_image(image_file):
+    """Validate uploaded image"""
+    # Check file size (5MB limit)
+    if image_file.size > 5 * 1024 * 1024:
+        return False
+    
+    # Check file extension
+    allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif']
+    ext = os.path.splitext(image_file.name)[1].lower()
+    if ext not in allowed_extensions:
+        return False
+    
+    try:
+        # Try to open with PIL to validate
+        image = Image.open(image_file)
+        image.verify()
+        return True
+    except:
+        return False
+
+
+def process_image(image_file):
+    """Process uploaded image (resize, optimize)"""
+    image = Image.open(image_file)
+    
+    # Convert to RGB if necessary
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+        image = background
+    
+    # Resize if too large
+    max_size = (1200, 1200)
+    if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    
+    # Save to BytesIO
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    output.seek(0)
+    
+    return ContentFile(output.read())
+
+
+def delete_file_safely(file_path):
+    """Delete a question or option image; paths outside those folders are refused"""
+    full_path = os.path.realpath(image_file_path(file_path))
+    static_path = os.path.realpath(os.path.join(settings.BASE_DIR, 'skills', 'static'))
+    folders = [os.path.join(static_path, subfolder) for subfolder in IMAGE_SUBFOLDERS]
+    if not any(os.path.dirname(full_path) == folder for folder in folders):
+        logger.warning('Refusing to delete %r outside the image folders', file_path)
+        return
+    try:
+        os.remove(full_path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.exception('Deleting image %s failed', full_path)
+
+
+def get_image_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='image-processing'
+            )
+    return _executor
+
+
+class ImageJobs:
+    """Images of one authoring request, processed after the request commits
+
+    Questions and options are saved without their new images. Each image is
+    staged on disk and recorded as a ``PendingImage`` in the request's
+    transaction. Once it commits each image is decoded, resized and stored
+    by the bounded image pool, the row's image field is filled in, and the
+    test version is bumped when the last image of the batch is done so
+    cached snapshots pick the images up. Jobs lost with a restarted worker
+    keep their ``PendingImage`` and are finished by
+    ``process_pending_images``.
+
+    Each run claims its job before starting and only applies the result
+    while it still holds the claim, so a job the command takes over from a
+    stalled worker is applied (and its references taken) exactly once.
+    """
+
+    def __init__(self, test_id, stale_before=None):
+        self.test_id = test_id
+        self.stale_before = stale_before
+        self.jobs = []
+        self.pending = []
+        self.processed = 0
+        self._remaining = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, instance, field, data_url, subfolder, replaces=None):
+        """Queue a data URL or upload handle for ``instance.field``
+
+        ``replaces`` is released once the new image is written.
+        """
+        self.jobs.append((instance, field, data_url, subfolder, replaces))
+
+    def schedule(self):
+        if not self.jobs:
+            return
+        # Instances created with bulk_create only have their ids by now
+        pending = []
+        for instance, field, data_url, subfolder, replaces in self.jobs:
+            try:
+                source = stage_image(data_url)
+            except Exception:
+                logger.exception('Staging %s for %s %s failed', field, type(instance).__name__, instance.pk)
+                continue
+            pending.append(PendingImage(
+                test_id=self.test_id,
+                model=type(instance).__name__,
+                object_id=instance.pk,
+                field=field,
+                source=source,
+                subfolder=subfolder,
+                replaces=replaces or ''
+            ))
+        self.pending = PendingImage.objects.bulk_create(pending)
+        if self.pending:
+            transaction.on_commit(self._submit)
+
+    @classmethod
+    def resume(cls, test_id, pending, stale_before):
+        """Run recorded jobs inline, such as ones lost with a restarted worker
+
+        Jobs claimed before ``stale_before`` are taken over; ones claimed
+        since are left to the run holding them. Returns how many ran.
+        """
+        jobs = cls(test_id, stale_before)
+        jobs.pending = list(pending)
+        jobs._submit(inline=True)
+        return jobs.processed
+
+    def _submit(self, inline=False):
+        self._remaining = len(self.pending)
+        for pending in self.pending:
+            if IMAGE_PROCESSING_WORKERS and not inline:
+                get_image_executor().submit(self._run_in_thread, pending)
+            else:
+                self._run(pending)
+
+    def _run_in_thread(self, pending):
+        try:
+            self._run(pending)
+        finally:
+            connection.close()
+
+    def _claim(self, pending):
+        """Take the job and return the claim time, or None when another run holds it"""
+        claimable = Q(claimed_at=None)
+        if self.stale_before is not None:
+            claimable |= Q(claimed_at__lte=self.stale_before)
+        claimed_at = timezone.now()
+        if PendingImage.objects.filter(claimable, pk=pending.pk).update(claimed_at=claimed_at):
+            return claimed_at
+        return None
+
+    def _run(self, pending):
+        try:
+            try:
+                claimed_at = self._claim(pending)
+            except Exception:
+                logger.exception('Claiming %s for %s %s failed', pending.field, pending.model, pending.object_id)
+                claimed_at = None
+            if claimed_at is not None:
+                self._process(pending, claimed_at)
+        finally:
+            with self._lock:
+                self._remaining -= 1
+                done = self._remaining == 0
+            if done:
+                Test.objects.filter(pk=self.test_id).update(version=F('version') + 1)
+
+    def _process(self, pending, claimed_at):
+        model = {'Question': Question, 'Option': Option}[pending.model]
+        claim = PendingImage.objects.filter(pk=pending.pk, claimed_at=claimed_at)
+        try:
+            url = save_uploaded_image(pending.source, pending.subfolder, remove=False)
+        except Exception:
+            logger.exception('Processing %s for %s %s failed', pending.field, pending.model, pending.object_id)
+            url = None
+
+        try:
+            with transaction.atomic():
+                won = claim.delete()[0]
+                if not won:
+                    # The job was taken over after this run stalled
+                    if url:
+                        release_image(url)
+                elif url:
+                    updated = model.objects.filter(pk=pending.object_id).update(**{pending.field: url})
+                    if not updated:
+                        # The row was deleted while its image was being processed
+                        release_image(url)
+                    elif pending.replaces:
+                        release_image(pending.replaces)
+        except Exception:
+            # The claim goes stale and process_pending_images retries the job
+            logger.exception('Applying %s for %s %s failed', pending.field, pending.model, pending.object_id)
+            return
+
+        if won:
+            self.processed += 1
+            try:
+                os.remove(staged_upload_path(pending.source))
+            except FileNotFoundError:
+                pass
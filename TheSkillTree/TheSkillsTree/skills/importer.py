@@ -0,0 +1,292 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.db import transaction
+from .images import image_file_path, normalize_image, retain_image, write_normalized_image
+from .item_statistics import create_test_statistics
+from .models import Option, Question, Test
+import base64
+import csv
+import io
+import json
+import os
+import threading
+import zipfile
+
+CSV_COLUMNS = [
+    'test', 'subject', 'duration', 'grade', 'is_practice', 'question_number',
+    'question', 'points', 'question_image', 'option', 'is_correct', 'option_image',
+]
+
+SUBJECTS = {value for value, _ in Test.SUBJECT_CHOICES}
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+
+class BundleError(ValueError):
+    """A bundle that cannot be imported, with every problem found in it"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('\n'.join(errors))
+
+
+class Bundle:
+    """Tests read from a JSON/CSV file or a zip holding one plus its images
+
+    Tests use the same shape as the create test API payload. Image values
+    are data URLs or paths relative to the bundle (or inside the zip).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        self.archive = None
+        self._archive_lock = threading.Lock()
+
+        if zipfile.is_zipfile(path):
+            self.archive = zipfile.ZipFile(path)
+            names = [
+                name for name in self.archive.namelist()
+                if '/' not in name and name.lower().endswith(('.json', '.csv'))
+            ]
+            if len(names) != 1:
+                raise BundleError(['A zip bundle must contain exactly one .json or .csv file at its root'])
+            with self.archive.open(names[0]) as source:
+                self.tests = self._parse(names[0], io.TextIOWrapper(source, encoding='utf-8-sig'))
+        else:
+            with open(path, encoding='utf-8-sig', newline='') as source:
+                self.tests = self._parse(path, source)
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+    def _parse(self, name, source):
+        if name.lower().endswith('.csv'):
+            return parse_csv(source)
+        try:
+            data = json.load(source)
+        except json.JSONDecodeError as e:
+            raise BundleError([f'Invalid JSON: {e}'])
+        tests = data.get('tests') if isinstance(data, dict) else data
+        if not isinstance(tests, list):
+            raise BundleError(['A JSON bundle must be a list of tests or {"tests": [...]}'])
+        return tests
+
+    def image_exists(self, reference):
+        if reference.startswith('data:'):
+            return True
+        if self.archive is not None:
+            try:
+                self.archive.getinfo(reference)
+                return True
+            except KeyError:
+                return False
+        return os.path.isfile(os.path.join(self.base_dir, reference))
+
+    def read_image(self, reference):
+        if reference.startswith('data:'):
+            return base64.b64decode(reference.split(',', 1)[1])
+        if self.archive is not None:
+            with self._archive_lock:
+                return self.archive.read(reference)
+        with open(os.path.join(self.base_dir, reference), 'rb') as source:
+            return source.read()
+
+
+def parse_csv(source):
+    """Group CSV rows (one per option) into tests and questions"""
+    reader = csv.DictReader(source)
+    missing = set(CSV_COLUMNS) - set(reader.fieldnames or [])
+    if missing:
+        raise BundleError([f"CSV is missing columns: {', '.join(sorted(missing))}"])
+
+    tests = {}
+    questions = {}
+    for row in reader:
+        test = tests.get(row['test'])
+        if test is None:
+            test = tests[row['test']] = {
+                'name': row['test'],
+                'subject': row['subject'],
+                'duration': row['duration'],
+                'grade': row['grade'],
+                'is_practice': row['is_practice'].strip().lower() in TRUE_VALUES,
+                'questions': []
+            }
+
+        key = (row['test'], row['question_number'])
+        question = questions.get(key)
+        if question is None:
+            question = questions[key] = {
+                'text': row['question'],
+                'points': row['points'],
+                'questionImage': row['question_image'],
+                'options': []
+            }
+            test['questions'].append(question)
+
+        question['options'].append({
+            'text': row['option'],
+            'isCorrect': row['is_correct'].strip().lower() in TRUE_VALUES,
+            'optionImage': row['option_image']
+        })
+
+    return list(tests.values())
+
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+
+def validate_tests(tests, image_exists):
+    """Return every problem in a list of test payloads, without touching the database"""
+    errors = []
+    for t, test in enumerate(tests, 1):
+        where = f"test {t} ({test.get('name') or 'unnamed'})" if isinstance(test, dict) else f'test {t}'
+        if not isinstance(test, dict):
+            errors.append(f'{where}: must be an object')
+            continue
+        if not test.get('name') or len(test['name']) > 200:
+            errors.append(f'{where}: name is required and at most 200 characters')
+        if test.get('subject') not in SUBJECTS:
+            errors.append(f"{where}: subject must be one of {', '.join(sorted(SUBJECTS))}")
+        if _positive_int(test.get('duration')) is None:
+            errors.append(f'{where}: duration must be a positive number of minutes')
+        if len(test.get('grade') or '') > 20:
+            errors.append(f'{where}: grade is at most 20 characters')
+        if not test.get('questions'):
+            errors.append(f'{where}: has no questions')
+            continue
+
+        for q, question in enumerate(test['questions'], 1):
+            question_where = f'{where} question {q}'
+            if not question.get('text'):
+                errors.append(f'{question_where}: text is required')
+            if _positive_int(question.get('points')) is None:
+                errors.append(f'{question_where}: points must be a positive number')
+            options = question.get('options') or []
+            if len(options) < 2:
+                errors.append(f'{question_where}: needs at least two options')
+            if sum(1 for option in options if option.get('isCorrect')) != 1:
+                errors.append(f'{question_where}: needs exactly one correct option')
+
+            images = [(question_where, question.get('questionImage'))]
+            images += [(f'{question_where} option {o}', option.get('optionImage')) for o, option in enumerate(options, 1)]
+            for image_where, reference in images:
+                if reference and not image_exists(reference):
+                    errors.append(f'{image_where}: image {reference!r} not found')
+
+    return errors
+
+
+def _store_image(bundle, reference, subfolder):
+    return write_normalized_image(normalize_image(bundle.read_image(reference)), subfolder)
+
+
+def store_bundle_images(bundle, workers):
+    """Decode, resize and write every distinct image of a bundle in parallel
+
+    Returns a map of (reference, subfolder) to (url, digest). Only files are
+    written here; references are taken when the rows are inserted.
+    """
+    wanted = set()
+    for test in bundle.tests:
+        for question in test['questions']:
+            if question.get('questionImage'):
+                wanted.add((question['questionImage'], 'question_images'))
+            for option in question['options']:
+                if option.get('optionImage'):
+                    wanted.add((option['optionImage'], 'option_images'))
+
+    wanted = sorted(wanted)
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='image-import') as executor:
+        futures = [executor.submit(_store_image, bundle, reference, subfolder) for reference, subfolder in wanted]
+
+    stored = {}
+    errors = []
+    for key, future in zip(wanted, futures):
+        try:
+            stored[key] = future.result()
+        except Exception as e:
+            errors.append(f'image {key[0]!r}: {e}')
+    if errors:
+        raise BundleError(errors)
+    return stored
+
+
+def import_bundle(bundle, author, workers=4):
+    """Validate a bundle, store its images and insert its tests with bulk inserts"""
+    errors = validate_tests(bundle.tests, bundle.image_exists)
+    if errors:
+        raise BundleError(errors)
+
+    images = store_bundle_images(bundle, workers)
+    references = {}
+
+    def image_url(reference, subfolder):
+        if not reference:
+            return None
+        url, digest = images[(reference, subfolder)]
+        references.setdefault(url, [digest, 0])[1] += 1
+        return url
+
+    with transaction.atomic():
+        tests = Test.objects.bulk_create([
+            Test(
+                name=data['name'],
+                subject=data['subject'],
+                duration_minutes=int(data['duration']),
+                grade=data.get('grade') or '',
+                is_practice=bool(data.get('is_practice')),
+                created_by=author
+            )
+            for data in bundle.tests
+        ], batch_size=500)
+
+        questions = []
+        question_options = []
+        for test, data in zip(tests, bundle.tests):
+            for i, question_data in enumerate(data['questions']):
+                questions.append(Question(
+                    test=test,
+                    question_text=question_data['text'],
+                    question_image=image_url(question_data.get('questionImage'), 'question_images'),
+                    points=int(question_data['points']),
+                    order=i + 1
+                ))
+                question_options.append(question_data['options'])
+        Question.objects.bulk_create(questions, batch_size=500)
+
+        options = [
+            Option(
+                question=question,
+                option_text=option_data.get('text') or '',
+                option_image=image_url(option_data.get('optionImage'), 'option_images'),
+                is_correct=bool(option_data.get('isCorrect')),
+                order=j + 1
+            )
+            for question, options_data in zip(questions, question_options)
+            for j, option_data in enumerate(options_data)
+        ]
+        Option.objects.bulk_create(options, batch_size=1000)
+        # bulk_create does not send the signal that starts their statistics
+        create_test_statistics([test.id for test in tests])
+
+        created = [url for url, (digest, count) in references.items() if retain_image(url, digest, count)]
+
+    # The files were written before their rows existed, so the last release of
+    # an identical image in the meantime may have deleted one
+    sources = {url: key for key, (url, _) in images.items()}
+    for url in created:
+        if not os.path.exists(image_file_path(url)):
+            _store_image(bundle, *sources[url])
+
+    return {
+        'tests': len(tests),
+        'questions': len(questions),
+        'options': len(options),
+        'images': len(images)
+    }
@@ -0,0 +1,139 @@
+from django.db import IntegrityError, transaction
+from .models import AssignedTest, Question, QuestionStatistics, StudentAnswer, TestStatistics
+
+HISTOGRAM_BUCKETS = 10
+
+
+def score_bucket(score):
+    """Map a 0-100 score to its histogram bucket, counting 100 in the top one"""
+    return min(int((score or 0) // (100 / HISTOGRAM_BUCKETS)), HISTOGRAM_BUCKETS - 1)
+
+
+def empty_histogram():
+    return [0] * HISTOGRAM_BUCKETS
+
+
+def create_test_statistics(test_ids):
+    """Start the statistics of new tests at zero, so submissions only update them"""
+    TestStatistics.objects.bulk_create(
+        [TestStatistics(test_id=test_id, score_histogram=empty_histogram()) for test_id in test_ids],
+        ignore_conflicts=True
+    )
+
+
+def record_submission(test_id, score, answer_key, graded):
+    """Fold one graded attempt into the statistics of its test
+
+    Runs inside the submission transaction, so the counters always agree
+    with the stored answers. A test without statistics yet (created before
+    they existed) is rebuilt from its history instead.
+    """
+    test_stats = TestStatistics.objects.select_for_update().filter(test_id=test_id).first()
+    if test_stats is None:
+        try:
+            with transaction.atomic():
+                TestStatistics.objects.create(test_id=test_id, score_histogram=empty_histogram())
+        except IntegrityError:
+            # A concurrent first submission created and rebuilt them without
+            # this attempt, which it could not see yet: count it as usual
+            test_stats = TestStatistics.objects.select_for_update().get(test_id=test_id)
+        else:
+            rebuild_test_statistics(test_id)
+            return
+
+    test_stats.attempts += 1
+    test_stats.score_total += score
+    test_stats.score_histogram[score_bucket(score)] += 1
+    test_stats.save(update_fields=['attempts', 'score_total', 'score_histogram', 'updated_at'])
+
+    answers = {row['question_id']: row for row in graded}
+    stored = {
+        stats.question_id: stats
+        for stats in QuestionStatistics.objects.select_for_update().filter(test_id=test_id)
+    }
+    updated = []
+    created = []
+
+    for question_id in answer_key:
+        stats = stored.get(question_id)
+        if stats is None:
+            stats = QuestionStatistics(test_id=test_id, question_id=question_id)
+            created.append(stats)
+        else:
+            updated.append(stats)
+
+        stats.attempts += 1
+        answer = answers.get(question_id)
+        if answer:
+            if answer['is_correct']:
+                stats.correct_count += 1
+            option_key = str(answer['selected_option_id'])
+            stats.option_counts[option_key] = stats.option_counts.get(option_key, 0) + 1
+
+    if updated:
+        QuestionStatistics.objects.bulk_update(updated, ['attempts', 'correct_count', 'option_counts'])
+    if created:
+        QuestionStatistics.objects.bulk_create(created)
+
+
+def rebuild_test_statistics(test_id):
+    """Recompute the statistics of a test from its completed attempts"""
+    scores = list(
+        AssignedTest.objects.filter(test_id=test_id, completed=True).values_list('score', flat=True)
+    )
+    histogram = empty_histogram()
+    for score in scores:
+        histogram[score_bucket(score)] += 1
+
+    question_stats = {
+        question_id: QuestionStatistics(test_id=test_id, question_id=question_id, attempts=len(scores))
+        for question_id in Question.objects.filter(test_id=test_id).values_list('id', flat=True)
+    }
+    rows = StudentAnswer.objects.filter(assignment__test_id=test_id, assignment__completed=True)\
+        .values_list('question_id', 'selected_option_id', 'is_correct')
+    for question_id, option_id, is_correct in rows:
+        stats = question_stats[question_id]
+        if is_correct:
+            stats.correct_count += 1
+        option_key = str(option_id)
+        stats.option_counts[option_key] = stats.option_counts.get(option_key, 0) + 1
+
+    with transaction.atomic():
+        test_stats, _ = TestStatistics.objects.update_or_create(
+            test_id=test_id,
+            defaults={
+                'attempts': len(scores),
+                'score_total': sum(score or 0 for score in scores),
+                'score_histogram': histogram
+            }
+        )
+        QuestionStatistics.objects.filter(test_id=test_id).delete()
+        QuestionStatistics.objects.bulk_create(question_stats.values())
+
+    return test_stats
+
+
+def get_item_statistics(test_id):
+    """Return the precomputed statistics of a test and each of its questions
+
+    Read only: a test without statistics reports zeros until its next
+    submission or ``rebuild_item_statistics`` fills them in.
+    """
+    test_stats = TestStatistics.objects.filter(test_id=test_id).first() \
+        or TestStatistics(test_id=test_id, score_histogram=empty_histogram())
+
+    questions = {}
+    for stats in QuestionStatistics.objects.filter(test_id=test_id):
+        questions[stats.question_id] = {
+            'attempts': stats.attempts,
+            'correct_count': stats.correct_count,
+            'correct_rate': round(stats.correct_count / stats.attempts * 100, 2) if stats.attempts else 0,
+            'option_counts': stats.option_counts
+        }
+
+    return {
+        'attempts': test_stats.attempts,
+        'average_score': round(test_stats.score_total / test_stats.attempts, 2) if test_stats.attempts else 0,
+        'score_histogram': test_stats.score_histogram,
+        'questions': questions
+    }
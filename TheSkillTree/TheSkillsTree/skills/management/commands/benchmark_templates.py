@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from skills.template_benchmark import discover_templates, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Time and measure the memory of rendering each template under the development and production profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--template', action='append', dest='templates',
+                            help='Only benchmark this template (can be repeated)')
+        parser.add_argument('--iterations', type=int, default=20, help='Renders timed per template and profile')
+        parser.add_argument('--rows', type=int, default=50, help='Items in each list of the sample contexts')
+
+    def handle(self, *args, **options):
+        templates = options['templates'] or discover_templates()
+        unknown = set(templates) - set(discover_templates())
+        if unknown:
+            raise CommandError(f"Unknown templates: {', '.join(sorted(unknown))}")
+
+        results = run_benchmark(templates, max(options['iterations'], 1), options['rows'])
+
+        width = max(len(name) for name in templates)
+        self.stdout.write(f"{'template':<{width}}  {'dev ms':>8}  {'prod ms':>8}  {'speedup':>7}  {'dev KiB':>8}  {'prod KiB':>8}")
+        totals = [0, 0]
+        for name in templates:
+            (dev_seconds, dev_peak), (prod_seconds, prod_peak) = results[name]['development'], results[name]['production']
+            totals[0] += dev_seconds
+            totals[1] += prod_seconds
+            self.stdout.write(
+                f'{name:<{width}}  {dev_seconds * 1000:>8.2f}  {prod_seconds * 1000:>8.2f}  '
+                f'{dev_seconds / prod_seconds:>6.1f}x  {dev_peak / 1024:>8.0f}  {prod_peak / 1024:>8.0f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Total per render pass: {totals[0] * 1000:.1f} ms development, '
+            f'{totals[1] * 1000:.1f} ms production ({totals[0] / totals[1]:.1f}x faster)'
+        ))
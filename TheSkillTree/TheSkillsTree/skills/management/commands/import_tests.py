@@ -0,0 +1,53 @@
+import os
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from skills.importer import Bundle, BundleError, import_bundle, validate_tests
+
+
+class Command(BaseCommand):
+    help = 'Import tests from a JSON or CSV bundle, or a zip holding one plus its images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('bundle', help='Path to a .json, .csv or .zip bundle')
+        parser.add_argument('--author', help='Username recorded as the creator (default: first superuser)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Threads used to process images')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the bundle')
+
+    def handle(self, *args, **options):
+        author = self.get_author(options['author'])
+
+        try:
+            bundle = Bundle(options['bundle'])
+        except (OSError, BundleError) as e:
+            raise CommandError(str(e))
+
+        try:
+            if options['dry_run']:
+                errors = validate_tests(bundle.tests, bundle.image_exists)
+                if errors:
+                    raise BundleError(errors)
+                self.stdout.write(self.style.SUCCESS(f'{len(bundle.tests)} tests are valid'))
+                return
+
+            summary = import_bundle(bundle, author, options['workers'])
+        except BundleError as e:
+            raise CommandError(f'Bundle not imported:\n{e}')
+        finally:
+            bundle.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['tests']} tests, {summary['questions']} questions, "
+            f"{summary['options']} options and {summary['images']} images"
+        ))
+
+    def get_author(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'No user named {username!r}')
+        author = User.objects.filter(is_superuser=True).order_by('id').first()
+        if author is None:
+            raise CommandError('No superuser found; pass --author')
+        return author
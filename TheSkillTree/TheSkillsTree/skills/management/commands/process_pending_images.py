@@ -0,0 +1,27 @@
+from datetime import timedelta
+from itertools import groupby
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from skills.images import ImageJobs
+from skills.models import PendingImage
+
+
+class Command(BaseCommand):
+    help = 'Store staged question and option images whose job was lost, e.g. with a restarted worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=10,
+                            help='Only pick up jobs recorded, or claimed by a run, at least this many minutes ago')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        pending = (
+            PendingImage.objects
+            .filter(Q(claimed_at=None) | Q(claimed_at__lte=cutoff), created_at__lte=cutoff)
+            .order_by('test_id', 'id')
+        )
+        count = 0
+        for test_id, jobs in groupby(pending, key=lambda job: job.test_id):
+            count += ImageJobs.resume(test_id, jobs, stale_before=cutoff)
+        self.stdout.write(self.style.SUCCESS(f'Processed {count} pending images'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from skills.item_statistics import rebuild_test_statistics
+from skills.models import Test
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-test and per-question statistics from completed attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='test_ids',
+                            help='Only rebuild this test (can be repeated)')
+
+    def handle(self, *args, **options):
+        test_ids = options['test_ids'] or Test.objects.values_list('id', flat=True)
+        count = 0
+        for test_id in test_ids:
+            rebuild_test_statistics(test_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics of {count} tests'))
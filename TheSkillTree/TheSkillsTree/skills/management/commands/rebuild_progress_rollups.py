@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from skills.progress import rebuild_progress_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the weekly per-subject progress rollups from completed tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='student_ids',
+                            help='Only rebuild this student (can be repeated)')
+
+    def handle(self, *args, **options):
+        count = rebuild_progress_rollups(options['student_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} progress rollups'))
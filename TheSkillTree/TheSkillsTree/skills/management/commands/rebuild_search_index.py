@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+from skills.search import rebuild_search_index, search_available
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of students and study materials'
+
+    def handle(self, *args, **options):
+        if not search_available():
+            raise CommandError('The search index needs SQLite with FTS5')
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} students and study materials'))
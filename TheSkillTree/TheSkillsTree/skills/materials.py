@@ -0,0 +1,22 @@
+from django.db.models import Exists, OuterRef
+from .cohorts import grade_number
+from .models import StudentMaterial, StudyMaterial
+
+
+def available_materials(student):
+    """Materials for the student's grade that are not assigned to them yet
+
+    One query: the (grade, material) index picks the grade's materials and
+    an anti-join on StudentMaterial drops the ones already assigned.
+    """
+    grade = grade_number(student.grade)
+    if grade is None:
+        return StudyMaterial.objects.none()
+    assigned = StudentMaterial.objects.filter(student=student, material=OuterRef('pk'))
+    return StudyMaterial.objects.filter(grade_links__grade=grade).filter(~Exists(assigned))
+
+
+def grades_display(material):
+    """A material's grades as "Grade 5, Grade 6\""""
+    grades = material.get_grades_list()
+    return ', '.join(f'Grade {grade}' for grade in grades) if grades else 'No grades specified'
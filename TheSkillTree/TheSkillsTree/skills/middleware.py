@@ -0,0 +1,39 @@
+import hashlib
+from django.core.cache import cache
+from .models import SignupUser
+
+CURRENT_STUDENT_TIMEOUT = 60
+
+
+def current_student_key(email):
+    return f"current_student:{hashlib.md5(email.encode()).hexdigest()}"
+
+
+def invalidate_current_student(email):
+    cache.delete(current_student_key(email))
+
+
+def get_current_student(request):
+    """Return the signed-in student of a request, cached briefly per session email"""
+    email = request.session.get('user_email')
+    if not email:
+        return None
+
+    key = current_student_key(email)
+    student = cache.get(key)
+    if student is None:
+        student = SignupUser.objects.filter(email=email).first()
+        if student is not None:
+            cache.set(key, student, CURRENT_STUDENT_TIMEOUT)
+    return student
+
+
+class CurrentStudentMiddleware:
+    """Resolve the signed-in student once per request as ``request.student``"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.student = get_current_student(request)
+        return self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0022_assignedtest_student_feedback_studentanswer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
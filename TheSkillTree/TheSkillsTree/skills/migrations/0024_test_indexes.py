@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-17 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0023_test_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['-created_at', '-id'], name='test_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['subject', 'grade', 'is_practice'], name='test_filter_idx'),
+        ),
+    ]
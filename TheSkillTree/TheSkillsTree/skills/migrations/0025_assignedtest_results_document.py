@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0024_test_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignedtest',
+            name='results_document',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
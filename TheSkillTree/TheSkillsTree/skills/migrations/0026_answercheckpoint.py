@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0025_assignedtest_results_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_id', models.BigIntegerField()),
+                ('option_id', models.BigIntegerField(blank=True, null=True)),
+                ('feedback', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='skills.assignedtest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['assignment', 'id'], name='checkpoint_assignment_idx')],
+            },
+        ),
+    ]
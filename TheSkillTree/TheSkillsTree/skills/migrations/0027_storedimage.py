@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:48
+
+from collections import Counter
+from django.db import migrations, models
+
+
+def count_existing_images(apps, schema_editor):
+    """Give images uploaded before content addressing one reference per row using them"""
+    Question = apps.get_model('skills', 'Question')
+    Option = apps.get_model('skills', 'Option')
+    StoredImage = apps.get_model('skills', 'StoredImage')
+
+    counts = Counter()
+    counts.update(Question.objects.exclude(question_image='').exclude(question_image__isnull=True).values_list('question_image', flat=True))
+    counts.update(Option.objects.exclude(option_image='').exclude(option_image__isnull=True).values_list('option_image', flat=True))
+
+    StoredImage.objects.bulk_create(
+        [StoredImage(path=path, ref_count=count) for path, count in counts.items()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0026_answercheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('digest', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(count_existing_images, migrations.RunPython.noop),
+    ]
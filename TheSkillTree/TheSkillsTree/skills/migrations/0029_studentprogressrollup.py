@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0028_item_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentProgressRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=50)),
+                ('week_start', models.DateField()),
+                ('tests_completed', models.PositiveIntegerField(default=0)),
+                ('score_total', models.FloatField(default=0)),
+                ('points_earned', models.PositiveIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to='skills.signupuser')),
+            ],
+            options={
+                'unique_together': {('student', 'subject', 'week_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-17 13:40
+
+import django.db.models.deletion
+import random
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0029_studentprogressrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='source_question',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies', to='skills.question'),
+        ),
+        migrations.CreateModel(
+            name='QuestionBankEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(choices=[('Maths', 'Maths'), ('Public Speaking', 'Public Speaking'), ('ELA', 'ELA'), ('Personalized Courses', 'Personalized Courses')], max_length=50)),
+                ('grade', models.CharField(blank=True, default='', max_length=20)),
+                ('topic', models.CharField(blank=True, default='', max_length=200)),
+                ('sample_key', models.FloatField(default=random.random)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='bank_entry', to='skills.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subject', 'grade', 'topic', 'sample_key'], name='bank_topic_sample_idx'), models.Index(fields=['subject', 'grade', 'sample_key'], name='bank_grade_sample_idx')],
+            },
+        ),
+    ]
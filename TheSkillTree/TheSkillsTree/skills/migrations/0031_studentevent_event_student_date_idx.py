@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0030_question_bank'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentevent',
+            index=models.Index(fields=['student', 'event_date'], name='event_student_date_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0031_studentevent_event_student_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='signupuser',
+            index=models.Index(fields=['student_name', 'id'], name='student_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signupuser',
+            index=models.Index(fields=['parent_name', 'id'], name='student_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signupuser',
+            index=models.Index(fields=['grade', 'id'], name='student_grade_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signupuser',
+            index=models.Index(fields=['created_at', 'id'], name='student_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studymaterial',
+            index=models.Index(fields=['subject', 'id'], name='material_subject_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studymaterial',
+            index=models.Index(fields=['created_at', 'id'], name='material_created_idx'),
+        ),
+    ]
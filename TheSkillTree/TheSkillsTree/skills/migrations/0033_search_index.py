@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:20
+
+from django.db import migrations
+
+SEARCH_TABLE = 'skills_search_index'
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other databases search with prefix filters instead
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        f"kind, title, body, subtitle UNINDEXED, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    # Rank title matches well above matches in the other columns
+    schema_editor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(0.0, 10.0, 1.0, 0.0)')")
+    schema_editor.execute(f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, kind, title, body, subtitle)
+        SELECT id * 2, 'student', student_name, parent_name || ' ' || email || ' ' || grade, email
+        FROM skills_signupuser
+    """)
+    schema_editor.execute(f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, kind, title, body, subtitle)
+        SELECT id * 2 + 1, 'material', COALESCE(NULLIF(topic, ''), subject),
+               subject || ' ' || COALESCE(sub_topic, '') || ' ' || grades, subject
+        FROM skills_studymaterial
+    """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0032_admin_table_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
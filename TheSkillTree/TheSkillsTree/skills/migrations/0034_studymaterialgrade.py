@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_grades(apps, schema_editor):
+    StudyMaterial = apps.get_model('skills', 'StudyMaterial')
+    StudyMaterialGrade = apps.get_model('skills', 'StudyMaterialGrade')
+    links = []
+    for material_id, grades in StudyMaterial.objects.values_list('id', 'grades').iterator():
+        numbers = {int(grade) for grade in (grades or '').split(',') if grade.strip().isdigit()}
+        links += [StudyMaterialGrade(material_id=material_id, grade=grade) for grade in sorted(numbers)]
+    StudyMaterialGrade.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0033_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudyMaterialGrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.PositiveSmallIntegerField()),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_links', to='skills.studymaterial')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['grade', 'material'], name='material_grade_idx')],
+                'unique_together': {('material', 'grade')},
+            },
+        ),
+        migrations.RunPython(copy_grades, migrations.RunPython.noop),
+    ]
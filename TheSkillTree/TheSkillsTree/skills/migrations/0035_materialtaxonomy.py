@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_materials(apps, schema_editor):
+    StudyMaterial = apps.get_model('skills', 'StudyMaterial')
+    MaterialTaxonomy = apps.get_model('skills', 'MaterialTaxonomy')
+    counts = {}
+    rows = StudyMaterial.objects.values('subject', 'topic', 'sub_topic').annotate(count=Count('id')).order_by()
+    for row in rows:
+        key = (row['subject'], row['topic'] or '', row['sub_topic'] or '')
+        counts[key] = counts.get(key, 0) + row['count']
+    MaterialTaxonomy.objects.bulk_create([
+        MaterialTaxonomy(subject=subject, topic=topic, sub_topic=sub_topic, count=count)
+        for (subject, topic, sub_topic), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0034_studymaterialgrade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialTaxonomy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=50)),
+                ('topic', models.CharField(blank=True, default='', max_length=200)),
+                ('sub_topic', models.CharField(blank=True, default='', max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('subject', 'topic', 'sub_topic')},
+            },
+        ),
+        migrations.RunPython(count_materials, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_bank_questions(apps, schema_editor):
+    """Give every bank entry its own copy of the question it was published from"""
+    Question = apps.get_model('skills', 'Question')
+    Option = apps.get_model('skills', 'Option')
+    QuestionBankEntry = apps.get_model('skills', 'QuestionBankEntry')
+    StoredImage = apps.get_model('skills', 'StoredImage')
+
+    def retain(path):
+        # Images without a row count as one reference, held by the source question
+        if path and not StoredImage.objects.filter(path=path).update(ref_count=F('ref_count') + 1):
+            StoredImage.objects.create(path=path, ref_count=2)
+
+    for entry in QuestionBankEntry.objects.select_related('question').iterator():
+        source = entry.question
+        copy = Question.objects.create(
+            test=None,
+            question_text=source.question_text,
+            question_image=source.question_image.name or None,
+            points=source.points,
+            order=source.order
+        )
+        retain(copy.question_image.name)
+        for option in Option.objects.filter(question=source).order_by('order'):
+            Option.objects.create(
+                question=copy,
+                option_text=option.option_text,
+                option_image=option.option_image.name or None,
+                is_correct=option.is_correct,
+                order=option.order
+            )
+            retain(option.option_image.name)
+        entry.source_question = source
+        entry.question = copy
+        entry.save(update_fields=['question', 'source_question'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0035_materialtaxonomy'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='test',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='skills.test'),
+        ),
+        migrations.AddField(
+            model_name='questionbankentry',
+            name='source_question',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='published_entry', to='skills.question'),
+        ),
+        migrations.RunPython(copy_bank_questions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0037_pendingimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingimage',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
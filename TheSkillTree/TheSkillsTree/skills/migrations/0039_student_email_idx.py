@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0038_pendingimage_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='signupuser',
+            index=models.Index(fields=['email', 'id'], name='student_email_idx'),
+        ),
+    ]
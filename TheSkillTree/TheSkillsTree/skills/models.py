@@ -1,3 +1,4 @@
+import random
 import uuid
 from django.db import models
 from datetime import datetime
@@ -117,6 +118,16 @@ class SignupUser(models.Model):
 
     def __str__(self):
         return self.email
+
+    class Meta:
+        # Keyset pages of the admin students table, one per sortable column
+        indexes = [
+            models.Index(fields=['student_name', 'id'], name='student_name_idx'),
+            models.Index(fields=['parent_name', 'id'], name='student_parent_idx'),
+            models.Index(fields=['grade', 'id'], name='student_grade_idx'),
+            models.Index(fields=['email', 'id'], name='student_email_idx'),
+            models.Index(fields=['created_at', 'id'], name='student_created_idx'),
+        ]
     
 
 
@@ -140,18 +151,60 @@ class StudyMaterial(models.Model):
     def __str__(self):
         return f"{self.subject} - {self.grades}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.sync_grade_links()
+    
     def get_grades_list(self):
         """Return grades as a list of integers"""
         if not self.grades:
             return []
-        return [int(grade) for grade in self.grades.split(',')]
+        return [int(grade) for grade in self.grades.split(',') if grade.strip().isdigit()]
     
     def set_grades_list(self, grades_list):
         """Set grades from a list of values"""
         self.grades = ','.join(str(grade) for grade in grades_list)
     
+    def sync_grade_links(self):
+        """Mirror the grades string into StudyMaterialGrade rows, which queries filter on"""
+        grades = set(self.get_grades_list())
+        existing = set(self.grade_links.values_list('grade', flat=True))
+        if existing - grades:
+            self.grade_links.filter(grade__in=existing - grades).delete()
+        if grades - existing:
+            StudyMaterialGrade.objects.bulk_create([
+                StudyMaterialGrade(material=self, grade=grade) for grade in sorted(grades - existing)
+            ])
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['subject', 'id'], name='material_subject_idx'),
+            models.Index(fields=['created_at', 'id'], name='material_created_idx'),
+        ]
+
+
+class StudyMaterialGrade(models.Model):
+    """One grade a study material is meant for"""
+    material = models.ForeignKey(StudyMaterial, on_delete=models.CASCADE, related_name='grade_links')
+    grade = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('material', 'grade')
+        indexes = [
+            models.Index(fields=['grade', 'material'], name='material_grade_idx'),
+        ]
+
+
+class MaterialTaxonomy(models.Model):
+    """How many study materials use a subject, topic and sub topic; blank parts are stored as ''"""
+    subject = models.CharField(max_length=50)
+    topic = models.CharField(max_length=200, blank=True, default='')
+    sub_topic = models.CharField(max_length=200, blank=True, default='')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('subject', 'topic', 'sub_topic')
 
 
 
@@ -215,6 +268,9 @@ class StudentEvent(models.Model):
     
     class Meta:
         ordering = ['event_date', 'start_time']
+        indexes = [
+            models.Index(fields=['student', 'event_date'], name='event_student_date_idx'),
+        ]
 
 
 
@@ -256,20 +312,57 @@ class Test(models.Model):
     assigned_to = models.ManyToManyField('SignupUser', through='AssignedTest', related_name='assigned_tests')
     grade = models.CharField(max_length=20, blank=True, null=True)
     is_practice = models.BooleanField(default=False) 
+    version = models.PositiveIntegerField(default=1, editable=False)
     
     def __str__(self):
         return f"{self.name} ({self.subject})"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='test_created_idx'),
+            models.Index(fields=['subject', 'grade', 'is_practice'], name='test_filter_idx'),
+        ]
 
 class Question(models.Model):
-    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='questions')
+    # Questions of the question bank belong to no test
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='questions', null=True, blank=True)
     question_text = CKEditor5Field('Question Text', config_name='extends')
     question_image = models.ImageField(upload_to='question_images/', blank=True, null=True)
     points = models.PositiveIntegerField(default=1)
     order = models.PositiveIntegerField(default=0)
+    source_question = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='copies')
     
     def __str__(self):
+        if self.test_id is None:
+            return f"Bank question {self.id}"
         return f"Question {self.order} for {self.test.name}"
 
+class QuestionBankEntry(models.Model):
+    """A question published to the shared bank that practice tests are generated from
+
+    ``question`` is the bank's own copy, which belongs to no test: deleting
+    or editing the test it was published from leaves the bank as it was.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='bank_entry')
+    source_question = models.OneToOneField(
+        Question, on_delete=models.SET_NULL, null=True, blank=True, related_name='published_entry'
+    )
+    subject = models.CharField(max_length=50, choices=Test.SUBJECT_CHOICES)
+    grade = models.CharField(max_length=20, blank=True, default='')
+    topic = models.CharField(max_length=200, blank=True, default='')
+    # Random position used to sample entries with an index range scan
+    sample_key = models.FloatField(default=random.random)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.subject} {self.grade} {self.topic}: question {self.question_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['subject', 'grade', 'topic', 'sample_key'], name='bank_topic_sample_idx'),
+            models.Index(fields=['subject', 'grade', 'sample_key'], name='bank_grade_sample_idx'),
+        ]
+
 class Option(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='options')
     option_text = CKEditor5Field('Option Text', config_name='extends')
@@ -280,6 +373,36 @@ class Option(models.Model):
     def __str__(self):
         return f"Option {self.order} for Question {self.question.order}"
 
+class StoredImage(models.Model):
+    """A content-addressed question/option image file and how many rows use it"""
+    path = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64, blank=True, db_index=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.path} ({self.ref_count} refs)"
+
+class PendingImage(models.Model):
+    """A staged image the image pool has yet to store on a question or option
+
+    Rows outlive a worker that restarts before running them, so the
+    ``process_pending_images`` command can finish the job. ``claimed_at``
+    is set by the run that took the job.
+    """
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='pending_images')
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    field = models.CharField(max_length=20)
+    source = models.CharField(max_length=50)
+    subfolder = models.CharField(max_length=50)
+    replaces = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.field} of {self.model} {self.object_id} from {self.source}"
+
 class AssignedTest(models.Model):
     test = models.ForeignKey(Test, on_delete=models.CASCADE)
     student = models.ForeignKey('SignupUser', on_delete=models.CASCADE)
@@ -289,10 +412,62 @@ class AssignedTest(models.Model):
     score = models.FloatField(null=True, blank=True)
     valid_until = models.DateField(null=True, blank=True)
     student_feedback = models.TextField(blank=True, null=True)
+    results_document = models.JSONField(null=True, blank=True, editable=False)
     
     class Meta:
         unique_together = ('test', 'student')
 
+class AnswerCheckpoint(models.Model):
+    """Append-only autosave of an answer while a test is in progress"""
+    assignment = models.ForeignKey(AssignedTest, on_delete=models.CASCADE, related_name='checkpoints')
+    question_id = models.BigIntegerField()
+    option_id = models.BigIntegerField(null=True, blank=True)
+    feedback = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['assignment', 'id'], name='checkpoint_assignment_idx'),
+        ]
+
+class TestStatistics(models.Model):
+    """Running totals of every completed attempt of a test"""
+    test = models.OneToOneField(Test, on_delete=models.CASCADE, related_name='statistics')
+    attempts = models.PositiveIntegerField(default=0)
+    score_total = models.FloatField(default=0)
+    score_histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Statistics for {self.test.name}"
+
+class QuestionStatistics(models.Model):
+    """Running totals of the answers given to one question"""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='question_statistics')
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='statistics')
+    attempts = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    option_counts = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"Statistics for question {self.question_id}"
+
+class StudentProgressRollup(models.Model):
+    """Completed tests of a student per subject and week, kept up to date on submission"""
+    student = models.ForeignKey('SignupUser', on_delete=models.CASCADE, related_name='progress_rollups')
+    subject = models.CharField(max_length=50)
+    week_start = models.DateField()
+    tests_completed = models.PositiveIntegerField(default=0)
+    score_total = models.FloatField(default=0)
+    points_earned = models.PositiveIntegerField(default=0)
+
+    @property
+    def mean_score(self):
+        return self.score_total / self.tests_completed if self.tests_completed else 0
+
+    class Meta:
+        unique_together = ('student', 'subject', 'week_start')
+
 class StudentAnswer(models.Model):
     assignment = models.ForeignKey(AssignedTest, on_delete=models.CASCADE, related_name='student_answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+PUBLIC_PAGE_TIMEOUT = 60 * 15
+SHARED_FRAGMENT_TIMEOUT = 60 * 60
+NAVBAR_ACCOUNT_TIMEOUT = 60 * 5
+
+# Markers left in the shared page and swapped for per-request values when it is served
+CSRF_PLACEHOLDER = 'csrf-token-placeholder-7d41c9'
+ACCOUNT_PLACEHOLDER = 'navbar-account-placeholder-7d41c9'
+
+
+def public_page_key(template_name):
+    return f'public_page:{template_name}'
+
+
+def shared_fragment_key(template_name):
+    return f'shared_fragment:{template_name}'
+
+
+def navbar_account_key(request):
+    if not request.session.get('is_logged_in'):
+        return 'navbar_account:anonymous'
+    student = getattr(request, 'student', None)
+    return f'navbar_account:student:{student.id}' if student else 'navbar_account:signed_in'
+
+
+def invalidate_public_page(*template_names):
+    cache.delete_many([public_page_key(name) for name in template_names])
+
+
+def invalidate_navbar_account(student_id):
+    cache.delete(f'navbar_account:student:{student_id}')
+
+
+def render_navbar_account(request):
+    """Return the sign-in buttons or profile menu of the navbar, cached per student"""
+    key = navbar_account_key(request)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('skills/navbar_account.html', {'user': getattr(request, 'student', None)}, request)
+        cache.set(key, html, NAVBAR_ACCOUNT_TIMEOUT)
+    return html
+
+
+def render_shared(template_name, request, context=None):
+    """Render a template with its per-request parts left as placeholders"""
+    context = dict(context or {}, csrf_token=CSRF_PLACEHOLDER, navbar_account_placeholder=ACCOUNT_PLACEHOLDER)
+    return render_to_string(template_name, context, request)
+
+
+def personalize(content, request):
+    """Fill the placeholders of a shared render in for one request"""
+    content = content.replace(ACCOUNT_PLACEHOLDER, render_navbar_account(request))
+    return content.replace(CSRF_PLACEHOLDER, get_token(request))
+
+
+def get_shared_fragment(template_name, request):
+    """Return the shared render of an include such as the navbar, rendering it on a miss"""
+    key = shared_fragment_key(template_name)
+    html = cache.get(key)
+    if html is None:
+        html = render_shared(template_name, request)
+        cache.set(key, html, SHARED_FRAGMENT_TIMEOUT)
+    return html
+
+
+def render_public_page(request, template_name, get_context=None):
+    """Serve a marketing page from one cached render shared by every visitor
+
+    The page is rendered once with placeholders for the CSRF token and the
+    navbar account section; both are filled in per request, so anonymous
+    visitors are served without rendering a template or querying the
+    database. ``get_context`` is only called on a cache miss.
+    """
+    key = public_page_key(template_name)
+    content = cache.get(key)
+    if content is None:
+        content = render_shared(template_name, request, get_context() if get_context else None)
+        cache.set(key, content, PUBLIC_PAGE_TIMEOUT)
+
+    response = HttpResponse(personalize(content, request))
+    # The navbar depends on the session, so downstream caches must key on the cookie
+    patch_vary_headers(response, ('Cookie',))
+    return response
@@ -1,23 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.models import User
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from django.utils import timezone
 from django.db import transaction
 from django.contrib import messages
 from django.core.paginator import Paginator
-from .models import StudentAnswer, Test, Question, Option, SignupUser, AssignedTest
-from django.conf import settings
+from .models import Test, Question, Option, SignupUser, AssignedTest
+from .grading import submit_assignment
+from .item_statistics import get_item_statistics
+from .progress import get_progress_series
+from .snapshots import get_test_snapshot, invalidate_test_snapshot, student_questions
+from .results import get_results_document
+from .images import ImageJobs, purge_stale_uploads, release_image, stage_uploaded_image, validate_image
+from .editor import apply_test_edit
+from .question_bank import generate_practice_test, publish_questions
+from .dashboard import invalidate_dashboard
+from .cohorts import grade_filter, select_students
+from .exports import export_assignments, iter_export_rows, stream_csv, stream_ndjson
+from .checkpoints import fold_checkpoints, get_open_assignment_id, load_checkpoints, save_checkpoint
 import json
-import uuid
-import os
-from PIL import Image
-from io import BytesIO
-import base64
-from django.db.models import Avg
+from django.db.models import Avg, Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_date, parse_datetime
 
 @login_required(login_url='/signin/admin/')
 def create_test_view(request):
@@ -37,40 +43,42 @@ def create_test_view(request):
                     created_by=request.user
                 )
                 
+                # Images are processed by the image pool after commit
+                images = ImageJobs(test.id)
+                
                 # Create questions and options
                 for i, question_data in enumerate(data['questions']):
-                    # Handle question image if present
-                    question_image = None
-                    if 'questionImage' in question_data and question_data['questionImage']:
-                        question_image = save_base64_image(question_data['questionImage'], 'question_images')
-                    
                     question = Question.objects.create(
                         test=test,
                         question_text=question_data['text'],
-                        question_image=question_image,
                         points=int(question_data['points']),
                         order=i + 1
                     )
                     
+                    # Handle question image if present
+                    if 'questionImage' in question_data and question_data['questionImage']:
+                        images.add(question, 'question_image', question_data['questionImage'], 'question_images')
+                    
                     # Create options
                     for j, option_data in enumerate(question_data['options']):
-                        # Handle option image if present
-                        option_image = None
-                        if 'optionImage' in option_data and option_data['optionImage']:
-                            option_image = save_base64_image(option_data['optionImage'], 'option_images')
-                        
-                        Option.objects.create(
+                        option = Option.objects.create(
                             question=question,
                             option_text=option_data['text'],
-                            option_image=option_image,
                             is_correct=option_data['isCorrect'],
                             order=j + 1
                         )
+                        
+                        # Handle option image if present
+                        if 'optionImage' in option_data and option_data['optionImage']:
+                            images.add(option, 'option_image', option_data['optionImage'], 'option_images')
+                
+                images.schedule()
             
             return JsonResponse({
                 'success': True,
                 'message': 'Test created successfully',
-                'test_id': test.id
+                'test_id': test.id,
+                'images_pending': len(images)
             })
             
         except Exception as e:
@@ -82,33 +90,132 @@ def create_test_view(request):
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 
+@login_required(login_url='/signin/admin/')
+def upload_test_image_view(request):
+    """Stream question/option images to disk and return handles for the test JSON"""
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+
+    if request.method == 'POST':
+        try:
+            files = request.FILES.getlist('image')
+            if not files:
+                return JsonResponse({'success': False, 'message': 'No image uploaded'}, status=400)
+            
+            for image_file in files:
+                if not validate_image(image_file):
+                    return JsonResponse({
+                        'success': False,
+                        'message': f'Invalid image: {image_file.name}'
+                    }, status=400)
+            
+            handles = [stage_uploaded_image(image_file) for image_file in files]
+            purge_stale_uploads()
+            
+            return JsonResponse({'success': True, 'handles': handles})
+            
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error uploading image: {str(e)}'
+            })
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+
+TESTS_PAGE_SIZE = 50
+TESTS_MAX_PAGE_SIZE = 200
+
+
+def encode_test_cursor(test):
+    return f"{test.created_at.isoformat()}|{test.id}"
+
+
+def decode_test_cursor(cursor):
+    """Split a "<created_at>|<id>" cursor into its keyset values"""
+    created_at, _, test_id = cursor.rpartition('|')
+    created_at = parse_datetime(created_at)
+    if created_at is None or not test_id.isdigit():
+        raise ValueError('Invalid cursor')
+    return created_at, int(test_id)
+
+
 @login_required(login_url='/signin/admin/')
 def get_all_tests(request):
-    """Get all practice tests for admin dashboard"""
+    """Get one page of practice tests with their counts for the admin dashboard"""
+    cursor = request.GET.get('cursor')
     try:
-        tests = Test.objects.all().prefetch_related('questions', 'assigned_to').order_by('-created_at')
-        tests_data = []
+        keyset = decode_test_cursor(cursor) if cursor else None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid cursor', 'tests': []}, status=400)
+
+    try:
+        question_counts = Question.objects.filter(test=OuterRef('pk'))\
+            .order_by()\
+            .values('test')\
+            .annotate(count=Count('id'))\
+            .values('count')
         
-        for test in tests:
-            assigned_count = test.assigned_to.count()
-            completed_count = AssignedTest.objects.filter(test=test, completed=True).count()
-            
+        tests = Test.objects.select_related('created_by').annotate(
+            questions_count=Coalesce(Subquery(question_counts), 0),
+            assigned_count=Count('assignedtest'),
+            completed_count=Count('assignedtest', filter=Q(assignedtest__completed=True)),
+            average_score=Avg('assignedtest__score', filter=Q(assignedtest__completed=True))
+        ).order_by('-created_at', '-id')
+        
+        # Server-side filters
+        subject = request.GET.get('subject', '').strip()
+        grade = request.GET.get('grade', '').strip()
+        is_practice = request.GET.get('is_practice', '').strip().lower()
+        
+        if subject:
+            tests = tests.filter(subject=subject)
+        if grade:
+            tests = tests.filter(grade=grade)
+        if is_practice in ('true', '1'):
+            tests = tests.filter(is_practice=True)
+        elif is_practice in ('false', '0'):
+            tests = tests.filter(is_practice=False)
+        
+        # Keyset pagination on (created_at, id), newest first
+        if keyset:
+            created_at, test_id = keyset
+            tests = tests.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=test_id)
+            )
+        
+        try:
+            limit = int(request.GET.get('limit', TESTS_PAGE_SIZE))
+        except ValueError:
+            limit = TESTS_PAGE_SIZE
+        limit = max(1, min(limit, TESTS_MAX_PAGE_SIZE))
+        
+        page = list(tests[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        
+        tests_data = []
+        for test in page:
             tests_data.append({
                 'id': test.id,
                 'name': test.name,
                 'grade': test.grade,
                 'subject': test.subject,
+                'is_practice': test.is_practice,
                 'duration_minutes': test.duration_minutes or 0,
-                'questions_count': test.questions.count(),
-                'assigned_count': assigned_count,
-                'completed_count': completed_count,
+                'questions_count': test.questions_count,
+                'assigned_count': test.assigned_count,
+                'completed_count': test.completed_count,
+                'average_score': round(test.average_score, 2) if test.average_score is not None else None,
                 'created_at': test.created_at.strftime('%Y-%m-%d %H:%M'),
                 'created_by': test.created_by.username
             })
         
         return JsonResponse({
             'success': True,
-            'tests': tests_data
+            'tests': tests_data,
+            'has_more': has_more,
+            'next_cursor': encode_test_cursor(page[-1]) if has_more else None
         })
     
     except Exception as e:
@@ -123,48 +230,28 @@ def get_all_tests(request):
 def get_test_details(request, test_id):
     """Get detailed test information including questions and options"""
     try:
-        test = get_object_or_404(Test, id=test_id)
-        questions = []
+        test = get_object_or_404(Test.objects.select_related('created_by'), id=test_id)
+        snapshot = get_test_snapshot(test)
         
-        for question in test.questions.all().order_by('order'):
-            options = []
-            for option in question.options.all().order_by('order'):
-                options.append({
-                    'id': option.id,
-                    'text': option.option_text,
-                    'image_url': option.option_image.url if option.option_image else None,
-                    'is_correct': option.is_correct,
-                    'order': option.order
-                })
-            
-            questions.append({
-                'id': question.id,
-                'text': question.question_text,
-                'image_url': question.question_image.url if question.question_image else None,
-                'points': question.points,
-                'order': question.order,
-                'options': options
-            })
-        
-        # Get assignment statistics
+        # Get assignment statistics, maintained on every submission
         total_assigned = test.assigned_to.count()
-        completed_assignments = AssignedTest.objects.filter(test=test, completed=True)
-        completed_count = completed_assignments.count()
-        average_score = completed_assignments.aggregate(avg_score=Avg('score'))['avg_score'] or 0
+        statistics = get_item_statistics(test.id)
         
         test_data = {
-            'id': test.id,
-            'name': test.name,
-            'subject': test.subject,
-            'duration_minutes': test.duration_minutes,
-            'grade': test.grade,
-            'created_at': test.created_at.strftime('%Y-%m-%d %H:%M'),
-            'created_by': test.created_by.username,
-            'questions': questions,
+            'id': snapshot['id'],
+            'name': snapshot['name'],
+            'subject': snapshot['subject'],
+            'duration_minutes': snapshot['duration_minutes'],
+            'grade': snapshot['grade'],
+            'created_at': snapshot['created_at'],
+            'created_by': snapshot['created_by'],
+            'questions': snapshot['questions'],
             'stats': {
                 'total_assigned': total_assigned,
-                'completed_count': completed_count,
-                'average_score': round(average_score, 2)
+                'completed_count': statistics['attempts'],
+                'average_score': statistics['average_score'],
+                'score_histogram': statistics['score_histogram'],
+                'questions': statistics['questions']
             }
         }
         
@@ -183,56 +270,28 @@ def edit_test_view(request, test_id):
             data = json.loads(request.body)
             
             with transaction.atomic():
+                # Write only the questions and options that actually changed
+                changes = apply_test_edit(test, data, ImageJobs(test.id))
+                
                 # Update test basic info
+                test_changed = (
+                    test.name != data['name']
+                    or test.subject != data['subject']
+                    or test.duration_minutes != int(data['duration'])
+                )
                 test.name = data['name']
                 test.subject = data['subject']
                 test.duration_minutes = int(data['duration'])
-                test.save()
                 
-                # Delete existing questions and options (cascade delete will handle options)
-                test.questions.all().delete()
-                
-                # Create new questions and options
-                for i, question_data in enumerate(data['questions']):
-                    # Handle question image if present
-                    question_image = None
-                    if 'questionImage' in question_data and question_data['questionImage']:
-                        if question_data['questionImage'].startswith('data:'):
-                            question_image = save_base64_image(question_data['questionImage'], 'question_images')
-                        else:
-                            # Keep existing image URL
-                            question_image = question_data['questionImage']
-                    
-                    question = Question.objects.create(
-                        test=test,
-                        question_text=question_data['text'],
-                        question_image=question_image,
-                        points=int(question_data['points']),
-                        order=i + 1
-                    )
-                    
-                    # Create options
-                    for j, option_data in enumerate(question_data['options']):
-                        # Handle option image if present
-                        option_image = None
-                        if 'optionImage' in option_data and option_data['optionImage']:
-                            if option_data['optionImage'].startswith('data:'):
-                                option_image = save_base64_image(option_data['optionImage'], 'option_images')
-                            else:
-                                # Keep existing image URL
-                                option_image = option_data['optionImage']
-                        
-                        Option.objects.create(
-                            question=question,
-                            option_text=option_data['text'],
-                            option_image=option_image,
-                            is_correct=option_data['isCorrect'],
-                            order=j + 1
-                        )
+                if test_changed or changes:
+                    test.save(update_fields=['name', 'subject', 'duration_minutes'])
+                    # Image jobs of an earlier edit bump the version concurrently
+                    Test.objects.filter(pk=test.pk).update(version=F('version') + 1)
             
             return JsonResponse({
                 'success': True,
-                'message': 'Test updated successfully'
+                'message': 'Test updated successfully',
+                'changes': changes
             })
             
         except Exception as e:
@@ -252,16 +311,21 @@ def delete_test_view(request, test_id):
             test = get_object_or_404(Test, id=test_id)
             test_name = test.name
             
-            # Delete associated images
-            for question in test.questions.all():
-                if question.question_image:
-                    
-                    delete_file_safely(question.question_image.path)
-                for option in question.options.all():
-                    if option.option_image:
-                        delete_file_safely(option.option_image.path)
+            # Release associated images; files go away with their last reference
+            images = list(
+                Question.objects.filter(test=test).exclude(question_image='')
+                .exclude(question_image__isnull=True).values_list('question_image', flat=True)
+            )
+            images += list(
+                Option.objects.filter(question__test=test).exclude(option_image='')
+                .exclude(option_image__isnull=True).values_list('option_image', flat=True)
+            )
             
-            test.delete()
+            with transaction.atomic():
+                invalidate_test_snapshot(test)
+                test.delete()
+                for image in images:
+                    transaction.on_commit(lambda image=image: release_image(image))
             
             return JsonResponse({
                 'success': True,
@@ -278,35 +342,119 @@ def delete_test_view(request, test_id):
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 
+@login_required(login_url='/signin/admin/')
+def publish_to_bank_view(request):
+    """Add questions (or every question of a test) to the shared question bank"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            question_ids = data.get('question_ids') or []
+            if data.get('test_id'):
+                question_ids += list(Question.objects.filter(test_id=data['test_id']).values_list('id', flat=True))
+            
+            if not question_ids:
+                return JsonResponse({'success': False, 'message': 'No questions selected'}, status=400)
+            
+            added = publish_questions(question_ids, data.get('topic', ''))
+            
+            return JsonResponse({
+                'success': True,
+                'message': f'Added {added} questions to the bank',
+                'added': added
+            })
+            
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error adding questions to the bank: {str(e)}'
+            })
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+
+@login_required(login_url='/signin/admin/')
+def generate_practice_test_view(request):
+    """Generate a practice test from a random sample of the question bank"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            count = min(int(data.get('count') or 10), 100)
+            
+            test = generate_practice_test(
+                request.user,
+                name=data['name'],
+                subject=data['subject'],
+                count=count,
+                grade=data.get('grade', ''),
+                topic=data.get('topic'),
+                duration=int(data.get('duration') or 30)
+            )
+            if test is None:
+                return JsonResponse({'success': False, 'message': 'No bank questions match this filter'}, status=404)
+            
+            return JsonResponse({
+                'success': True,
+                'message': 'Practice test generated successfully',
+                'test_id': test.id,
+                'question_count': test.questions.count()
+            })
+            
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error generating practice test: {str(e)}'
+            })
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+
 @login_required(login_url='/signin/admin/')
 def assign_test_to_students(request):
-    """Assign a test to multiple students"""
+    """Assign a test to a list of students and/or a server-side cohort selector"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             test_id = data['test_id']
-            student_ids = data['student_ids']
+            student_ids = data.get('student_ids') or []
+            selector = data.get('selector')
             expiration_date = data.get('expiration_date')
             
+            if not student_ids and not selector:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Provide student_ids or a selector'
+                }, status=400)
+            
             test = get_object_or_404(Test, id=test_id)
-            students = SignupUser.objects.filter(id__in=student_ids)
-            
-            assigned_count = 0
-            for student in students:
-                assigned_test, created = AssignedTest.objects.get_or_create(
-                    test=test,
-                    student=student,
-                    defaults={
-                        'assigned_date': timezone.now(),
-                        'valid_until': expiration_date
-                    }
+            students = select_students(student_ids, selector)
+            
+            total = students.count()
+            new_student_ids = list(
+                students.exclude(assignedtest__test=test).values_list('id', flat=True)
+            )
+            
+            # Rows inserted concurrently are skipped by the unique (test, student) constraint
+            with transaction.atomic():
+                AssignedTest.objects.bulk_create(
+                    [
+                        AssignedTest(test=test, student_id=student_id, valid_until=expiration_date)
+                        for student_id in new_student_ids
+                    ],
+                    batch_size=500,
+                    ignore_conflicts=True
                 )
-                if created:
-                    assigned_count += 1
+            
+            # bulk_create does not send signals
+            invalidate_dashboard(*new_student_ids)
+            
+            created_count = len(new_student_ids)
             
             return JsonResponse({
                 'success': True,
-                'message': f'Test assigned to {assigned_count} new students (Total: {len(students)} students)'
+                'message': f'Test assigned to {created_count} new students (Total: {total} students)',
+                'created': created_count,
+                'skipped': total - created_count,
+                'total': total
             })
             
         except Exception as e:
@@ -325,7 +473,7 @@ def get_students_for_assignment(request):
     
     students = SignupUser.objects.filter(is_verified=True)
     if grade:
-        students = students.filter(grade__regex=fr"\b{grade}\b")
+        students = students.filter(grade_filter(grade))
     
     students = students.order_by('student_name')
     students_data = []
@@ -374,6 +522,24 @@ def get_assigned_tests(request, student_id):
             'message': str(e)
         }, status=500)
 
+def student_progress_view(request, student_id):
+    """Weekly test progress of a student per subject, for admins or the student themself"""
+    is_student = request.student is not None and request.student.id == student_id
+    if not (request.user.is_superuser or is_student):
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+    
+    try:
+        return JsonResponse({
+            'success': True,
+            'series': get_progress_series(student_id, request.GET.get('subject'))
+        })
+    
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
 @login_required(login_url='/signin/admin/')
 def revoke_test_assignment(request, student_id, test_id):
     """Revoke a test assignment from a student"""
@@ -460,17 +626,22 @@ def student_test_list(request, student_id):
 
 def take_test_view(request, student_id, test_id):
     """Student interface for taking a test"""
-    student = get_object_or_404(SignupUser, id=student_id)
-    test = get_object_or_404(Test, id=test_id)
-    
     # Check if student is assigned to this test
     try:
-        assignment = AssignedTest.objects.get(test=test, student=student)
+        assignment = AssignedTest.objects.select_related('test__created_by', 'student').get(
+            test_id=test_id,
+            student_id=student_id
+        )
     except AssignedTest.DoesNotExist:
+        get_object_or_404(SignupUser, id=student_id)
+        get_object_or_404(Test, id=test_id)
         return render(request, 'skills/error.html', {
             'message': 'You are not assigned to this test.'
         })
     
+    student = assignment.student
+    test = assignment.test
+    
     # Check if test is already completed
     if assignment.completed:
         return render(request, 'skills/test_completed.html', {
@@ -479,28 +650,13 @@ def take_test_view(request, student_id, test_id):
             'student': student
         })
     
-    questions = []
-    for question in test.questions.all().order_by('order'):
-        options = []
-        for option in question.options.all().order_by('order'):
-            options.append({
-                'id': option.id,
-                'text': option.option_text,
-                'image_url': option.option_image.url if option.option_image else None
-            })
-        
-        questions.append({
-            'id': question.id,
-            'text': question.question_text,
-            'image_url': question.question_image.url if question.question_image else None,
-            'points': question.points,
-            'options': options
-        })
+    # Serve the question tree from the cached snapshot of this test version
+    snapshot = get_test_snapshot(test)
     
     return render(request, 'skills/take_test.html', {
         'student': student,
         'test': test,
-        'questions': questions
+        'questions': student_questions(snapshot)
     })
 
 
@@ -509,11 +665,12 @@ def submit_test_view(request, student_id, test_id):
     """Handle test submission and calculate score"""
     if request.method == 'POST':
         try:
-            student = get_object_or_404(SignupUser, id=student_id)
-            test = get_object_or_404(Test, id=test_id)
-            
             # Get assignment
-            assignment = get_object_or_404(AssignedTest, test=test, student=student)
+            assignment = get_object_or_404(
+                AssignedTest.objects.select_related('test__created_by'),
+                test_id=test_id,
+                student_id=student_id
+            )
             
             # Check if already completed
             if assignment.completed:
@@ -522,72 +679,36 @@ def submit_test_view(request, student_id, test_id):
                     'message': 'Test already completed'
                 })
             
-            data = json.loads(request.body)
+            if request.content_type == 'application/json':
+                data = json.loads(request.body)
+            else:
+                data = parse_test_form(request.POST)
             answers = data.get('answers', {})
             feedback = data.get('feedback', {})
             
-            # Calculate score
-            total_points = 0
-            earned_points = 0
-            results = []
+            # Answers autosaved during the test fill in anything not sent now
+            answers, feedback = fold_checkpoints(assignment, answers, feedback)
             
-            for question in test.questions.all():
-                total_points += question.points
-                
-                # Check if answer is correct
-                question_id = str(question.id)
-                selected_option_id = answers.get(question_id)
-                question_feedback = feedback.get(question_id, '')
-                correct_option = question.options.filter(is_correct=True).first()
-                
-                is_correct = False
-                selected_option = None
-                
-                if correct_option and selected_option_id:
-                    try:
-                        selected_option = Option.objects.get(id=selected_option_id)
-                        is_correct = str(correct_option.id) == str(selected_option_id)
-                    except Option.DoesNotExist:
-                        pass
-                
-                if selected_option:
-                    # Save student answer
-                    StudentAnswer.objects.create(
-                        assignment=assignment,
-                        question=question,
-                        selected_option=selected_option,
-                        is_correct=is_correct,
-                        feedback=question_feedback
-                    )
-                
-                if is_correct:
-                    earned_points += question.points
-                
-                results.append({
-                    'question_id': question.id,
-                    'question_text': question.question_text,
-                    'selected_option_id': selected_option_id,
-                    'correct_option_id': correct_option.id if correct_option else None,
-                    'is_correct': is_correct,
-                    'points': question.points
-                })
-            
-            # Calculate percentage score
-            score_percentage = (earned_points / total_points) * 100 if total_points > 0 else 0
+            # Grade against the answer key in memory and bulk insert the answers
+            summary = submit_assignment(
+                assignment,
+                answers,
+                feedback=feedback,
+                general_feedback=data.get('general_feedback', '')
+            )
             
-            # Update assignment
-            assignment.completed = True
-            assignment.completed_date = timezone.now()
-            assignment.score = score_percentage
-            assignment.student_feedback = data.get('general_feedback', '')
-            assignment.save()
+            if summary is None:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Test already completed'
+                })
             
             return JsonResponse({
                 'success': True,
-                'score': round(score_percentage, 2),
-                'earned_points': earned_points,
-                'total_points': total_points,
-                'results': results
+                'score': round(summary['score'], 2),
+                'earned_points': summary['earned_points'],
+                'total_points': summary['total_points'],
+                'results': summary['results']
             })
             
         except Exception as e:
@@ -599,60 +720,109 @@ def submit_test_view(request, student_id, test_id):
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 
-def get_student_answer(assignment, question):
+def parse_test_form(post):
+    """Read answers and feedback from the form-encoded take-test page"""
+    answers = {}
+    feedback = {}
+    for key, value in post.items():
+        if key.startswith('question_'):
+            answers[key[len('question_'):]] = value
+        elif key.startswith('feedback_') and value:
+            feedback[key[len('feedback_'):]] = value
+    
+    return {
+        'answers': answers,
+        'feedback': feedback,
+        'general_feedback': post.get('general_feedback', '')
+    }
+
+
+@csrf_exempt
+def checkpoint_test_view(request, student_id, test_id):
+    """Autosave in-progress answers (POST) or return them to resume a test (GET)"""
+    assignment_id = get_open_assignment_id(student_id, test_id)
+    if assignment_id is None:
+        return JsonResponse({'success': False, 'message': 'No test in progress'}, status=404)
+    
+    if request.method == 'GET':
+        answers, feedback = load_checkpoints(assignment_id)
+        return JsonResponse({'success': True, 'answers': answers, 'feedback': feedback})
+    
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            if not save_checkpoint(student_id, test_id, assignment_id, data.get('answers', {}), data.get('feedback', {})):
+                return JsonResponse({'success': False, 'message': 'No test in progress'}, status=404)
+            return JsonResponse({'success': True})
+        except (ValueError, AttributeError, TypeError) as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'}, status=405)
+
+
+@login_required(login_url='/signin/admin/')
+def export_results_view(request):
+    """Stream completed test results with every answer as CSV or NDJSON"""
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+    
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return JsonResponse({'success': False, 'message': 'format must be csv or ndjson'}, status=400)
+    
+    # Bad filters fail here with a 400, not halfway through the streamed body
+    date_from = request.GET.get('from')
+    date_to = request.GET.get('to')
     try:
-        student_answer = StudentAnswer.objects.get(
-            assignment=assignment,
-            question=question
-        )
-        
-        return {
-            'option_id': student_answer.selected_option.id,
-            'option_text': student_answer.selected_option.option_text,
-            'option_image': student_answer.selected_option.option_image.url if student_answer.selected_option.option_image else None,
-            'is_correct': student_answer.is_correct,
-            'answered_at': student_answer.created_at,
-            'feedback': student_answer.feedback
-        }
-    except StudentAnswer.DoesNotExist:
-        return None
+        if (date_from and parse_date(date_from) is None) or (date_to and parse_date(date_to) is None):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Dates must be YYYY-MM-DD'}, status=400)
+    
+    test_id = request.GET.get('test')
+    grade = request.GET.get('grade')
+    try:
+        test_id = int(test_id) if test_id else None
+        grade = int(grade) if grade else None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'test and grade must be numbers'}, status=400)
+    
+    assignments = export_assignments(
+        test_id=test_id,
+        subject=request.GET.get('subject'),
+        grade=grade,
+        date_from=date_from,
+        date_to=date_to
+    )
+    rows = iter_export_rows(assignments)
+    
+    if export_format == 'ndjson':
+        response = StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="test_results.{export_format}"'
+    return response
 
 
 def test_results_view(request, student_id, test_id):
     """Return JSON data with test results"""
-    student = get_object_or_404(SignupUser, id=student_id)
-    test = get_object_or_404(Test, id=test_id)
-    assignment = get_object_or_404(AssignedTest, test=test, student=student)
+    assignment = get_object_or_404(
+        AssignedTest.objects.select_related('test__created_by'),
+        test_id=test_id,
+        student_id=student_id
+    )
     
     if not assignment.completed:
         return JsonResponse({'error': 'Test not completed'}, status=400)
     
-    # Get all questions with student answers
-    questions = []
-    for question in test.questions.all().order_by('order'):
-        student_answer = get_student_answer(assignment, question)
-        correct_option = question.options.filter(is_correct=True).first()
-        
-        questions.append({
-            'question_id': question.id,
-            'text': question.question_text,
-            'image_url': question.question_image.url if question.question_image else None,
-            'selected_answer': student_answer['option_text'] if student_answer else None,
-            'selected_answer_id': student_answer['option_id'] if student_answer else None,
-            'selected_answer_image': student_answer['option_image'] if student_answer and 'option_image' in student_answer else None,
-            'correct_answer': correct_option.option_text if correct_option else None,
-            'correct_answer_id': correct_option.id if correct_option else None,
-            'correct_answer_image': correct_option.option_image.url if correct_option and correct_option.option_image else None,
-            'is_correct': student_answer['is_correct'] if student_answer else False,
-            'points': question.points,
-            'feedback': student_answer['feedback'] if student_answer and 'feedback' in student_answer else None
-        })
+    # Results are stored on the assignment at submission time
+    document = get_results_document(assignment)
     
     return JsonResponse({
-        'test_name': test.name,
+        'test_name': document['test_name'],
         'score': assignment.score,
         'completed_date': assignment.completed_date.strftime('%Y-%m-%d %H:%M'),
-        'questions': questions,
+        'questions': document['questions'],
         'student_feedback': assignment.student_feedback or ""
     })
 
@@ -682,104 +852,3 @@ def test_feedback_view(request, student_id, test_id):
             return JsonResponse({'success': False, 'message': str(e)})
     
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
-
-
-# Utility functions
-
-def save_base64_image(base64_string, subfolder='question_img'):
-    try:
-        # Strip base64 header if present
-        if base64_string.startswith('data:'):
-            _, base64_string = base64_string.split(',', 1)
-
-        # Decode base64 and open image
-        image_data = base64.b64decode(base64_string)
-        image = Image.open(BytesIO(image_data))
-
-        # Convert image mode if needed
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = background
-
-        # Resize large images
-        max_size = (1200, 1200)
-        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-        # Generate unique filename
-        filename = f"{uuid.uuid4()}.jpg"
-
-        # Create target folder: static/question_img/ or static/option_img/
-        static_target_dir = os.path.join(settings.BASE_DIR, 'skills', 'static', subfolder)
-        os.makedirs(static_target_dir, exist_ok=True)
-
-        # Save image
-        file_path = os.path.join(static_target_dir, filename)
-        image.save(file_path, format='JPEG', quality=85, optimize=True)
-
-        # Return relative static path for browser use
-        return f"{settings.STATIC_URL}{subfolder}/{filename}"
-
-    except Exception as e:
-        raise Exception(f"Error saving image: {str(e)}")
-
-
-def validate_image(image_file):
-    """Validate uploaded image"""
-    # Check file size (5MB limit)
-    if image_file.size > 5 * 1024 * 1024:
-        return False
-    
-    # Check file extension
-    allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif']
-    ext = os.path.splitext(image_file.name)[1].lower()
-    if ext not in allowed_extensions:
-        return False
-    
-    try:
-        # Try to open with PIL to validate
-        image = Image.open(image_file)
-        image.verify()
-        return True
-    except:
-        return False
-
-
-def process_image(image_file):
-    """Process uploaded image (resize, optimize)"""
-    image = Image.open(image_file)
-    
-    # Convert to RGB if necessary
-    if image.mode in ('RGBA', 'LA', 'P'):
-        background = Image.new('RGB', image.size, (255, 255, 255))
-        if image.mode == 'P':
-            image = image.convert('RGBA')
-        background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-        image = background
-    
-    # Resize if too large
-    max_size = (1200, 1200)
-    if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-    
-    # Save to BytesIO
-    output = BytesIO()
-    image.save(output, format='JPEG', quality=85, optimize=True)
-    output.seek(0)
-    
-    return ContentFile(output.read())
-
-
-def delete_file_safely(file_path):
-    try:
-        base_static_path = os.path.join(settings.BASE_DIR, 'skills', 'static')
-        relative_path = file_path.replace('/static/', '')
-        full_path = os.path.join(base_static_path, relative_path)
-        
-        if os.path.exists(full_path):
-            os.remove(full_path)
-    except:
-        pass  # Ignore errors when deleting files
\ No newline at end of file
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from .models import AssignedTest, StudentProgressRollup
+
+
+def week_start(moment):
+    """Return the Monday of the (local) week a completion time falls in"""
+    day = timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+    return day - timedelta(days=day.weekday())
+
+
+def record_progress(student_id, subject, completed_date, score, points_earned):
+    """Add one completed test to the student's weekly rollup for its subject"""
+    week = week_start(completed_date)
+    with transaction.atomic():
+        updated = StudentProgressRollup.objects.filter(
+            student_id=student_id,
+            subject=subject,
+            week_start=week
+        ).update(
+            tests_completed=F('tests_completed') + 1,
+            score_total=F('score_total') + score,
+            points_earned=F('points_earned') + points_earned
+        )
+        if not updated:
+            StudentProgressRollup.objects.create(
+                student_id=student_id,
+                subject=subject,
+                week_start=week,
+                tests_completed=1,
+                score_total=score,
+                points_earned=points_earned
+            )
+
+
+def rebuild_progress_rollups(student_ids=None):
+    """Recompute weekly rollups from completed assignments
+
+    Rebuilds every student, or only ``student_ids`` when given. Returns the
+    number of rollup rows written.
+    """
+    assignments = AssignedTest.objects.filter(completed=True, completed_date__isnull=False)
+    rollups = StudentProgressRollup.objects.all()
+    if student_ids is not None:
+        assignments = assignments.filter(student_id__in=student_ids)
+        rollups = rollups.filter(student_id__in=student_ids)
+
+    # Grouping on the id keeps one row per assignment
+    rows = assignments.values_list('id', 'student_id', 'test__subject', 'completed_date', 'score')\
+        .annotate(earned=Sum('student_answers__question__points', filter=Q(student_answers__is_correct=True)))
+
+    totals = defaultdict(lambda: {'tests_completed': 0, 'score_total': 0, 'points_earned': 0})
+    for _, student_id, subject, completed_date, score, earned in rows:
+        entry = totals[(student_id, subject, week_start(completed_date))]
+        entry['tests_completed'] += 1
+        entry['score_total'] += score or 0
+        entry['points_earned'] += earned or 0
+
+    with transaction.atomic():
+        rollups.delete()
+        StudentProgressRollup.objects.bulk_create([
+            StudentProgressRollup(student_id=student_id, subject=subject, week_start=week, **entry)
+            for (student_id, subject, week), entry in totals.items()
+        ], batch_size=500)
+
+    return len(totals)
+
+
+def get_progress_series(student_id, subject=None):
+    """Return a student's weekly series per subject from the rollup table"""
+    rollups = StudentProgressRollup.objects.filter(student_id=student_id)
+    if subject:
+        rollups = rollups.filter(subject=subject)
+
+    series = defaultdict(list)
+    rows = rollups.order_by('subject', 'week_start')\
+        .values_list('subject', 'week_start', 'tests_completed', 'score_total', 'points_earned')
+    for row_subject, week, tests_completed, score_total, points_earned in rows:
+        series[row_subject].append({
+            'week_start': week.strftime('%Y-%m-%d'),
+            'tests_completed': tests_completed,
+            'mean_score': round(score_total / tests_completed, 2) if tests_completed else 0,
+            'points_earned': points_earned
+        })
+
+    return dict(series)
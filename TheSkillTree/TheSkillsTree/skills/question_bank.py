@@ -0,0 +1,133 @@
+import random
+from collections import Counter
+from django.db import transaction
+from .images import retain_image
+from .models import Option, Question, QuestionBankEntry, Test
+
+
+def copy_questions(sources, test=None, link_sources=False):
+    """Bulk insert copies of questions and their options, sharing their images
+
+    ``sources`` must have their options prefetched. Copies go to ``test``,
+    or to the question bank when it is None, and are numbered in order.
+    """
+    images = Counter()
+    questions = Question.objects.bulk_create([
+        Question(
+            test=test,
+            question_text=source.question_text,
+            question_image=source.question_image.name or None,
+            points=source.points,
+            order=i + 1,
+            source_question=source if link_sources else None
+        )
+        for i, source in enumerate(sources)
+    ])
+
+    options = []
+    for question, source in zip(questions, sources):
+        if question.question_image:
+            images[question.question_image.name] += 1
+        for option in sorted(source.options.all(), key=lambda option: option.order):
+            options.append(Option(
+                question=question,
+                option_text=option.option_text,
+                option_image=option.option_image.name or None,
+                is_correct=option.is_correct,
+                order=option.order
+            ))
+            if option.option_image:
+                images[option.option_image.name] += 1
+    Option.objects.bulk_create(options)
+
+    for image, references in images.items():
+        retain_image(image, count=references)
+    return questions
+
+
+def publish_questions(question_ids, topic=''):
+    """Copy questions into the bank under the subject and grade of their test
+
+    The bank keeps its own copy, so later edits to the test, or deleting
+    it, do not change what practice tests are generated from. Questions
+    already published are left as they are. Returns the number of new
+    entries.
+    """
+    sources = list(
+        Question.objects.filter(id__in=question_ids, test__isnull=False, published_entry__isnull=True)
+        .select_related('test').prefetch_related('options').order_by('id')
+    )
+    if not sources:
+        return 0
+
+    with transaction.atomic():
+        copies = copy_questions(sources)
+        QuestionBankEntry.objects.bulk_create([
+            QuestionBankEntry(
+                question=copy,
+                source_question=source,
+                subject=source.test.subject,
+                grade=source.test.grade or '',
+                topic=topic or ''
+            )
+            for copy, source in zip(copies, sources)
+        ])
+    return len(sources)
+
+
+def sample_bank_questions(subject, count, grade='', topic=None):
+    """Pick up to ``count`` random bank questions matching a filter
+
+    Starts at a random point of ``sample_key`` and reads forward, wrapping
+    around to the start when it runs out, so the pick is at most two index
+    range scans however large the bank is. The picked entries then get new
+    keys, so neighbours on the key do not keep coming out together.
+    """
+    entries = QuestionBankEntry.objects.filter(subject=subject, grade=grade or '')
+    if topic:
+        entries = entries.filter(topic=topic)
+
+    pivot = random.random()
+    picked = list(
+        entries.filter(sample_key__gte=pivot).order_by('sample_key').values_list('id', 'question_id')[:count]
+    )
+    if len(picked) < count:
+        picked += list(
+            entries.filter(sample_key__lt=pivot).order_by('sample_key')
+            .values_list('id', 'question_id')[:count - len(picked)]
+        )
+
+    QuestionBankEntry.objects.bulk_update(
+        [QuestionBankEntry(id=entry_id, sample_key=random.random()) for entry_id, _ in picked], ['sample_key']
+    )
+    return [question_id for _, question_id in picked]
+
+
+def generate_practice_test(author, name, subject, count, grade='', topic=None, duration=30):
+    """Create a practice test from a random sample of the question bank
+
+    Returns the new test, or None when no bank question matches. Sampled
+    questions are inserted with bulk inserts and keep a link to their bank
+    question; their images are shared, not copied. The test gets rows of
+    its own because answers, grading and snapshots are kept per test
+    question.
+    """
+    question_ids = sample_bank_questions(subject, count, grade, topic)
+    if not question_ids:
+        return None
+
+    sources = Question.objects.filter(id__in=question_ids).prefetch_related('options')
+    sources = sorted(sources, key=lambda question: question_ids.index(question.id))
+
+    with transaction.atomic():
+        test = Test.objects.create(
+            name=name,
+            subject=subject,
+            duration_minutes=duration,
+            grade=grade or '',
+            is_practice=True,
+            created_by=author
+        )
+        copy_questions(sources, test, link_sources=True)
+
+    return test
@@ -0,0 +1,61 @@
+from .models import AssignedTest, StudentAnswer
+from .snapshots import get_test_snapshot
+
+
+def build_results_document(snapshot, answers):
+    """Build the per-question results of an attempt from a test snapshot
+
+    ``answers`` maps question ids to dicts with ``option_id``, ``is_correct``
+    and ``feedback`` for every question the student answered.
+    """
+    questions = []
+    for question in snapshot['questions']:
+        options = {option['id']: option for option in question['options']}
+        correct_option = next((option for option in question['options'] if option['is_correct']), None)
+        answer = answers.get(question['id'])
+        selected_option = options.get(answer['option_id']) if answer else None
+
+        questions.append({
+            'question_id': question['id'],
+            'text': question['text'],
+            'image_url': question['image_url'],
+            'selected_answer': selected_option['text'] if selected_option else None,
+            'selected_answer_id': selected_option['id'] if selected_option else None,
+            'selected_answer_image': selected_option['image_url'] if selected_option else None,
+            'correct_answer': correct_option['text'] if correct_option else None,
+            'correct_answer_id': correct_option['id'] if correct_option else None,
+            'correct_answer_image': correct_option['image_url'] if correct_option else None,
+            'is_correct': answer['is_correct'] if answer else False,
+            'points': question['points'],
+            'feedback': answer['feedback'] if answer else None
+        })
+
+    return {
+        'test_name': snapshot['name'],
+        'test_version': snapshot['version'],
+        'questions': questions,
+    }
+
+
+def compute_results_document(assignment):
+    """Rebuild the results of a completed attempt from its stored answers"""
+    answers = {}
+    rows = StudentAnswer.objects.filter(assignment=assignment)\
+        .values_list('question_id', 'selected_option_id', 'is_correct', 'feedback')
+    for question_id, option_id, is_correct, feedback in rows:
+        answers[question_id] = {
+            'option_id': option_id,
+            'is_correct': is_correct,
+            'feedback': feedback
+        }
+
+    return build_results_document(get_test_snapshot(assignment.test), answers)
+
+
+def get_results_document(assignment):
+    """Return the stored results of an attempt, backfilling it if missing"""
+    if assignment.results_document is None:
+        assignment.results_document = compute_results_document(assignment)
+        AssignedTest.objects.filter(pk=assignment.pk).update(results_document=assignment.results_document)
+
+    return assignment.results_document
@@ -0,0 +1,124 @@
+import re
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+SEARCH_TABLE = 'skills_search_index'
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 50
+
+# Each kind owns the rowids ``id * len(KINDS) + code``, so a row is replaced
+# or deleted by rowid without scanning the index
+KINDS = {'student': 0, 'material': 1}
+
+# Rows of the index built in SQL, for rebuilds; index_student/index_material
+# build the same rows from model instances
+REBUILD_SQL = {
+    'student': f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, kind, title, body, subtitle)
+        SELECT id * 2, 'student', student_name, parent_name || ' ' || email || ' ' || grade, email
+        FROM skills_signupuser
+    """,
+    'material': f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, kind, title, body, subtitle)
+        SELECT id * 2 + 1, 'material', COALESCE(NULLIF(topic, ''), subject),
+               subject || ' ' || COALESCE(sub_topic, '') || ' ' || grades, subject
+        FROM skills_studymaterial
+    """,
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def search_available():
+    """The index is an SQLite FTS5 table; other databases fall back to prefix filters"""
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, object_id):
+    return object_id * len(KINDS) + KINDS[kind]
+
+
+def _write(kind, object_id, title, body, subtitle):
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, kind, title, body, subtitle) VALUES (%s, %s, %s, %s, %s)',
+            [_rowid(kind, object_id), kind, title, body, subtitle]
+        )
+
+
+def index_student(student):
+    _write('student', student.id, student.student_name,
+           f'{student.parent_name} {student.email} {student.grade}', student.email)
+
+
+def index_material(material):
+    _write('material', material.id, material.topic or material.subject,
+           f"{material.subject} {material.sub_topic or ''} {material.grades}", material.subject)
+
+
+def remove_from_index(kind, object_id):
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [_rowid(kind, object_id)])
+
+
+def rebuild_search_index():
+    """Refill the index from the students and study materials tables; returns the row count"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        for sql in REBUILD_SQL.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_expression(term, kind=None):
+    """FTS5 query matching every word of ``term`` as a prefix, or None when it has no words"""
+    tokens = TOKEN_RE.findall(term.lower())
+    if not tokens:
+        return None
+    expression = '{title body}: (' + ' '.join(f'"{token}"*' for token in tokens) + ')'
+    if kind:
+        expression = f'kind: {kind} AND {expression}'
+    return expression
+
+
+def matching_ids(term, kind):
+    """RawSQL of the ids of one kind matching ``term``, for ``id__in`` filters; None without words"""
+    expression = match_expression(term, kind)
+    if expression is None:
+        return None
+    return RawSQL(f'SELECT rowid / {len(KINDS)} FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [expression])
+
+
+def typeahead(term, kind=None, limit=None):
+    """Best ranked matches for a search box, as dicts with a link to each record"""
+    try:
+        limit = max(1, min(int(limit or TYPEAHEAD_LIMIT), TYPEAHEAD_MAX_LIMIT))
+    except ValueError:
+        limit = TYPEAHEAD_LIMIT
+
+    expression = match_expression(term, kind)
+    if expression is None:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, kind, title, subtitle FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+            [expression, limit]
+        )
+        rows = cursor.fetchall()
+
+    results = []
+    for rowid, row_kind, title, subtitle in rows:
+        object_id = rowid // len(KINDS)
+        url = reverse('student_detail', args=[object_id]) if row_kind == 'student' \
+            else reverse('edit_study_material', args=[object_id])
+        results.append({'kind': row_kind, 'id': object_id, 'title': title, 'subtitle': subtitle, 'url': url})
+    return results
@@ -1,12 +1,15 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.hashers import check_password
-from .models import SignupUser, StudentMaterial, StudentEvent, AssignedTest
+from .models import SignupUser
+from .dashboard import MAX_EVENTS_WINDOW, get_dashboard_payload, get_events_window
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+import hashlib
 import json
 from datetime import datetime, timedelta
 
@@ -52,102 +55,55 @@ def dashboard_view(request):
     if not request.session.get('is_logged_in'):
         return render(request, 'skills/home.html', {'error': 'Please login to continue.'})
 
-    user_email = request.session.get('user_email')
-
-    try:
-        user = SignupUser.objects.get(email=user_email)
-    except SignupUser.DoesNotExist:
+    user = request.student
+    if user is None:
         return render(request, 'skills/home.html', {'error': 'User not found. Please log in again.'})
     
-    # Get student materials
-    student_materials = StudentMaterial.objects.filter(student=user).select_related('material')
-
-    # Get unique topics for filtering
-    unique_topics = set()
-    for sm in student_materials:
-        if sm.material.topic:
-            unique_topics.add(sm.material.topic)
-    
-    # Check validity of materials
-    for sm in student_materials:
-        sm.is_valid = timezone.now().date() <= sm.valid_until
-    
-    # Get student events
-    student_events = StudentEvent.objects.filter(student=user).order_by('event_date', 'start_time')
-    
-    # Get upcoming events (next 30 days)
-    today = timezone.now().date()
-    upcoming_events = student_events.filter(
-        event_date__gte=today,
-        event_date__lte=today + timedelta(days=30)
-    )[:10]  # Limit to 10 upcoming events
-    
-    # Get assigned tests and practice materials
-    assigned_tests = AssignedTest.objects.filter(
-        student=user, 
-        test__is_practice=False
-    ).select_related('test').order_by('-assigned_date')
-    
-    practice_tests = AssignedTest.objects.filter(
-        student=user, 
-        test__is_practice=True
-    ).select_related('test').order_by('-assigned_date')
-    
-    # Prepare test data for templates
-    def prepare_test_data(assignments):
-        test_data = []
-        for assignment in assignments:
-            test = assignment.test
-            test_data.append({
-                'id': test.id,
-                'name': test.name,
-                'subject': test.subject,
-                'duration_minutes': test.duration_minutes,
-                'questions_count': test.questions.count(),
-                'completed': assignment.completed,
-                'score': assignment.score,
-                'assigned_date': assignment.assigned_date.strftime('%Y-%m-%d %H:%M'),
-                'completed_date': assignment.completed_date.strftime('%Y-%m-%d %H:%M') if assignment.completed_date else None,
-                'valid_until': assignment.valid_until.strftime('%Y-%m-%d') if assignment.valid_until else 'No expiry',
-                'is_expired': assignment.valid_until and timezone.now().date() > assignment.valid_until
-            })
-        return test_data
-    
-    assigned_tests_data = prepare_test_data(assigned_tests)
-    practice_tests_data = prepare_test_data(practice_tests)
-    
-    # Prepare events data for JavaScript calendar
-    events_data = []
-    for event in student_events:
-        events_data.append({
-            'id': event.id,
-            'title': event.title,
-            'class_link': event.class_link,
-            'description': event.description or '',
-            'event_type': event.event_type,
-            'event_date': event.event_date.strftime('%Y-%m-%d'),
-            'start_time': event.start_time.strftime('%H:%M'),
-            'end_time': event.end_time.strftime('%H:%M'),
-            'timezone': event.timezone,
-            'is_completed': event.is_completed,
-            'notes': event.notes or ''
-        })
-    
+    # Materials and tests are cached per student and day, and invalidated
+    # whenever one of them changes
     context = {
         'user': user,
-        'student_materials': student_materials,
-        'profile_picture_url': user.get_profile_picture_url(),
-        'unique_topics': sorted(unique_topics),
-        'student_events': student_events,
-        'upcoming_events': upcoming_events,
-        'events_data_json': json.dumps(events_data),
-        'assigned_tests': assigned_tests_data,
-        'practice_tests': practice_tests_data,
+        **get_dashboard_payload(user),
     }
 
     return render(request, 'skills/dashboard.html', context)
 
 
+def student_events_view(request, student_id):
+    """Calendar events of a student between ``start`` and ``end`` (default: this month)"""
+    is_student = request.student is not None and request.student.id == student_id
+    if not (request.user.is_superuser or is_student):
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+
+    today = timezone.now().date()
+    try:
+        # parse_date raises on well-formed but impossible dates such as 2024-02-30
+        start = parse_date(request.GET.get('start', '')) or today.replace(day=1)
+        end = parse_date(request.GET.get('end', '')) or (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid date range'}, status=400)
+    if end < start or end - start > MAX_EVENTS_WINDOW:
+        return JsonResponse({'success': False, 'message': 'Invalid date range'}, status=400)
+
+    body = json.dumps({
+        'success': True,
+        'start': start.strftime('%Y-%m-%d'),
+        'end': end.strftime('%Y-%m-%d'),
+        'events': get_events_window(student_id, start, end)
+    })
+
+    # Months the browser already has are answered with 304 Not Modified. The
+    # events are still queried to compute the ETag; only the body is saved
+    etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 def logout_view(request):
     logout(request)
     request.session.flush() 
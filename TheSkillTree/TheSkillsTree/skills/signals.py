@@ -0,0 +1,88 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .dashboard import invalidate_dashboard
+from .item_statistics import create_test_statistics
+from .middleware import invalidate_current_student
+from .models import AssignedTest, Category, SignupUser, Skill, StudentMaterial, StudyMaterial, Test
+from .page_cache import invalidate_navbar_account, invalidate_public_page
+from .search import index_material, index_student, remove_from_index
+from .taxonomy import adjust_taxonomy, taxonomy_key
+
+
+@receiver([post_save, post_delete], sender=StudentMaterial)
+@receiver([post_save, post_delete], sender=AssignedTest)
+def invalidate_student_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.student_id)
+
+
+@receiver(post_save, sender=Test)
+def start_test_statistics(sender, instance, created, **kwargs):
+    if created:
+        create_test_statistics([instance.id])
+
+
+@receiver(post_save, sender=Test)
+def invalidate_test_dashboards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_dashboard(*AssignedTest.objects.filter(test=instance).values_list('student_id', flat=True))
+
+
+@receiver(post_save, sender=StudyMaterial)
+def invalidate_material_dashboards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_dashboard(*instance.student_assignments.values_list('student_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=SignupUser)
+def invalidate_signed_in_student(sender, instance, **kwargs):
+    invalidate_current_student(instance.email)
+    invalidate_navbar_account(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Skill)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_home_page(sender, instance, **kwargs):
+    invalidate_public_page('skills/home.html')
+
+
+@receiver(post_save, sender=SignupUser)
+def index_saved_student(sender, instance, **kwargs):
+    index_student(instance)
+
+
+@receiver(post_save, sender=StudyMaterial)
+def index_saved_material(sender, instance, **kwargs):
+    index_material(instance)
+
+
+@receiver(post_delete, sender=SignupUser)
+def unindex_deleted_student(sender, instance, **kwargs):
+    remove_from_index('student', instance.id)
+
+
+@receiver(post_delete, sender=StudyMaterial)
+def unindex_deleted_material(sender, instance, **kwargs):
+    remove_from_index('material', instance.id)
+
+
+@receiver(pre_save, sender=StudyMaterial)
+def remember_material_taxonomy(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = StudyMaterial.objects.filter(pk=instance.pk).values_list('subject', 'topic', 'sub_topic').first()
+    instance._previous_taxonomy_key = taxonomy_key(*previous) if previous else None
+
+
+@receiver(post_save, sender=StudyMaterial)
+def count_saved_material(sender, instance, **kwargs):
+    key = taxonomy_key(instance.subject, instance.topic, instance.sub_topic)
+    previous = getattr(instance, '_previous_taxonomy_key', None)
+    if key != previous:
+        if previous:
+            adjust_taxonomy(previous, -1)
+        adjust_taxonomy(key, 1)
+
+
+@receiver(post_delete, sender=StudyMaterial)
+def uncount_deleted_material(sender, instance, **kwargs):
+    adjust_taxonomy(taxonomy_key(instance.subject, instance.topic, instance.sub_topic), -1)
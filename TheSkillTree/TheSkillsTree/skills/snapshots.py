@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+from django.core.cache import cache
+from django.db.models import Prefetch
+from .models import Option, Question
+
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+LOCAL_SNAPSHOT_LIMIT = 128
+
+_local_snapshots = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def snapshot_cache_key(test_id, version):
+    return f'test_snapshot:{test_id}:v{version}'
+
+
+def build_test_snapshot(test):
+    """Serialize a test with its questions and options into plain data"""
+    questions = Question.objects.filter(test_id=test.id).order_by('order').prefetch_related(
+        Prefetch('options', queryset=Option.objects.order_by('order'))
+    )
+
+    questions_data = []
+    for question in questions:
+        options = []
+        for option in question.options.all():
+            options.append({
+                'id': option.id,
+                'text': option.option_text,
+                'image_url': option.option_image.url if option.option_image else None,
+                'is_correct': option.is_correct,
+                'order': option.order
+            })
+
+        questions_data.append({
+            'id': question.id,
+            'text': question.question_text,
+            'image_url': question.question_image.url if question.question_image else None,
+            'points': question.points,
+            'order': question.order,
+            'options': options
+        })
+
+    return {
+        'id': test.id,
+        'version': test.version,
+        'name': test.name,
+        'subject': test.subject,
+        'duration_minutes': test.duration_minutes,
+        'grade': test.grade,
+        'is_practice': test.is_practice,
+        'created_at': test.created_at.strftime('%Y-%m-%d %H:%M'),
+        'created_by': test.created_by.username,
+        'questions': questions_data,
+    }
+
+
+def get_test_snapshot(test):
+    """Return the snapshot for the current version of a test
+
+    Looks in the per-process cache first, then the shared cache, and only
+    rebuilds from the database when neither has this version.
+    """
+    key = snapshot_cache_key(test.id, test.version)
+
+    with _local_lock:
+        snapshot = _local_snapshots.get(key)
+        if snapshot is not None:
+            _local_snapshots.move_to_end(key)
+            return snapshot
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_test_snapshot(test)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+
+    with _local_lock:
+        _local_snapshots[key] = snapshot
+        while len(_local_snapshots) > LOCAL_SNAPSHOT_LIMIT:
+            _local_snapshots.popitem(last=False)
+
+    return snapshot
+
+
+def invalidate_test_snapshot(test):
+    """Drop the cached snapshot for the current version of a test"""
+    key = snapshot_cache_key(test.id, test.version)
+    cache.delete(key)
+    with _local_lock:
+        _local_snapshots.pop(key, None)
+
+
+def student_questions(snapshot):
+    """Strip the answer key from a snapshot before it reaches a student"""
+    return [
+        {
+            'id': question['id'],
+            'text': question['text'],
+            'image_url': question['image_url'],
+            'points': question['points'],
+            'options': [
+                {
+                    'id': option['id'],
+                    'text': option['text'],
+                    'image_url': option['image_url']
+                }
+                for option in question['options']
+            ]
+        }
+        for question in snapshot['questions']
+    ]
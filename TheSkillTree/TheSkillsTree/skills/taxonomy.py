@@ -0,0 +1,96 @@
+import hashlib
+import json
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import MaterialTaxonomy
+
+TAXONOMY_CACHE_KEY = 'material_taxonomy'
+TAXONOMY_TIMEOUT = 60 * 60 * 24
+
+
+def taxonomy_key(subject, topic, sub_topic):
+    return subject, topic or '', sub_topic or ''
+
+
+def adjust_taxonomy(key, delta):
+    """Add ``delta`` materials to a (subject, topic, sub_topic) entry, dropping it at zero"""
+    subject, topic, sub_topic = key
+    lookup = {'subject': subject, 'topic': topic, 'sub_topic': sub_topic}
+    entries = MaterialTaxonomy.objects.filter(**lookup)
+    if delta > 0:
+        try:
+            with transaction.atomic():
+                _, created = MaterialTaxonomy.objects.get_or_create(**lookup, defaults={'count': delta})
+        except IntegrityError:
+            # Another request created the entry first
+            created = False
+        if not created:
+            entries.update(count=F('count') + delta)
+    else:
+        entries.filter(count__lte=-delta).delete()
+        entries.update(count=F('count') + delta)
+    cache.delete(TAXONOMY_CACHE_KEY)
+
+
+def build_taxonomy():
+    """{subject: {'topics': [...], 'sub_topics': [...]}}, most used first
+
+    Each topic carries its own most used sub topics; the subject's
+    ``sub_topics`` add them up across topics.
+    """
+    subjects = {}
+    for entry in MaterialTaxonomy.objects.order_by('-count', 'topic', 'sub_topic'):
+        subject = subjects.setdefault(entry.subject, {'topics': {}, 'sub_topics': {}})
+        if entry.topic:
+            topic = subject['topics'].setdefault(entry.topic, {'name': entry.topic, 'count': 0, 'sub_topics': []})
+            topic['count'] += entry.count
+            if entry.sub_topic:
+                topic['sub_topics'].append({'name': entry.sub_topic, 'count': entry.count})
+        if entry.sub_topic:
+            subject['sub_topics'][entry.sub_topic] = subject['sub_topics'].get(entry.sub_topic, 0) + entry.count
+
+    def most_used(items):
+        return sorted(items, key=lambda item: (-item['count'], item['name']))
+
+    return {
+        name: {
+            'topics': most_used(subject['topics'].values()),
+            'sub_topics': most_used({'name': sub_topic, 'count': count} for sub_topic, count in subject['sub_topics'].items()),
+        }
+        for name, subject in sorted(subjects.items())
+    }
+
+
+def get_taxonomy():
+    """The taxonomy and its ETag, cached until a study material changes
+
+    The cache is shared by every worker, so they all drop the entry, and
+    serve the same ETag, as soon as one of them changes a material.
+    """
+    cached = cache.get(TAXONOMY_CACHE_KEY)
+    if cached is None:
+        taxonomy = build_taxonomy()
+        etag = hashlib.md5(json.dumps(taxonomy, sort_keys=True).encode()).hexdigest()
+        cached = {'taxonomy': taxonomy, 'etag': etag}
+        cache.set(TAXONOMY_CACHE_KEY, cached, TAXONOMY_TIMEOUT)
+    return cached
+
+
+def taxonomy_etag(request, *args, **kwargs):
+    return get_taxonomy()['etag']
+
+
+def topic_names(subject):
+    return [topic['name'] for topic in get_taxonomy()['taxonomy'].get(subject, {}).get('topics', [])]
+
+
+def sub_topic_names(subject, topic=None):
+    """Sub topics of a subject, or of one of its topics"""
+    subject = get_taxonomy()['taxonomy'].get(subject, {})
+    if topic:
+        for entry in subject.get('topics', []):
+            if entry['name'] == topic:
+                return [sub_topic['name'] for sub_topic in entry['sub_topics']]
+        return []
+    return [sub_topic['name'] for sub_topic in subject.get('sub_topics', [])]
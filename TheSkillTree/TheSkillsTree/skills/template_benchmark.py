@@ -0,0 +1,167 @@
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from .models import DemoBooking, SignupUser, StudyMaterial, Test
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+# Loader and fragment cache settings compared by the benchmark
+PROFILES = {
+    'development': {
+        'loaders': settings.TEMPLATE_LOADERS,
+        'fragment_cache': False,
+    },
+    'production': {
+        'loaders': [('django.template.loaders.cached.Loader', settings.TEMPLATE_LOADERS)],
+        'fragment_cache': True,
+    },
+}
+
+
+def discover_templates():
+    """Every template of the app, by the name views load it with"""
+    return sorted(path.relative_to(TEMPLATE_DIR).as_posix() for path in TEMPLATE_DIR.rglob('*.html'))
+
+
+def make_backend(profile):
+    options = dict(settings.TEMPLATES[0]['OPTIONS'], loaders=PROFILES[profile]['loaders'])
+    return DjangoTemplates({'NAME': f'benchmark-{profile}', 'DIRS': [], 'APP_DIRS': False, 'OPTIONS': options})
+
+
+def make_request():
+    request = RequestFactory().get('/')
+    request.session = {}
+    request.user = AnonymousUser()
+    request.student = None
+    return request
+
+
+def sample_context(template_name, rows):
+    """Context shaped like the one the view of a template passes, with ``rows`` items per list"""
+    now = timezone.now()
+    subjects = [value for value, _ in StudyMaterial.SUBJECT_CHOICES]
+    student = SignupUser(id=1, parent_name='Parent', student_name='Student', grade='7',
+                         email='student@example.com', created_at=now)
+    students = [
+        SignupUser(id=i, parent_name=f'Parent {i}', student_name=f'Student {i}', grade=str(i % 12 + 1),
+                   email=f'student{i}@example.com', created_at=now)
+        for i in range(1, rows + 1)
+    ]
+    materials = [
+        {
+            'id': i,
+            'subject': subjects[i % len(subjects)],
+            'topic': f'Topic {i % 8}',
+            'sub_topic': f'Sub topic {i}',
+            'grades': '5,6,7',
+            'file_link': f'https://example.com/materials/{i}.pdf',
+            'short_video_link': f'https://example.com/videos/{i}' if i % 2 else None,
+            'created_at': now,
+        }
+        for i in range(1, rows + 1)
+    ]
+    tests = [
+        {
+            'id': i,
+            'name': f'Test {i}',
+            'subject': subjects[i % len(subjects)],
+            'duration_minutes': 30,
+            'questions_count': 20,
+            'completed': i % 3 == 0,
+            'score': 80 if i % 3 == 0 else None,
+            'assigned_date': now.strftime('%Y-%m-%d %H:%M'),
+            'valid_until': 'No expiry',
+            'is_expired': False,
+        }
+        for i in range(1, rows + 1)
+    ]
+
+    contexts = {
+        'skills/admin_dashboard.html': {
+            'students': students,
+            'study_materials': [StudyMaterial(**material) for material in materials],
+            'practice_tests': [],
+        },
+        'skills/student_detail.html': {
+            'student': student,
+            'assigned_materials': [
+                dict(material, assignment_id=material['id'], valid_until=now + timedelta(days=30),
+                     is_expired=material['id'] % 5 == 0)
+                for material in materials
+            ],
+            'available_materials': materials,
+            'today_date': now,
+        },
+        'skills/dashboard.html': {
+            'user': student,
+            'student_materials': [
+                {'id': material['id'], 'valid_until': now.date(), 'is_valid': True, 'material': material}
+                for material in materials
+            ],
+            'unique_topics': sorted({material['topic'] for material in materials}),
+            'assigned_tests': tests,
+            'practice_tests': tests,
+        },
+        'skills/take_test.html': {
+            'student': student,
+            'test': Test(id=1, name='Test', subject='Maths', duration_minutes=30),
+            'questions': [
+                {
+                    'id': i,
+                    'text': f'Question {i}',
+                    'image_url': None,
+                    'points': 1,
+                    'options': [{'id': i * 10 + j, 'text': f'Option {j}', 'image_url': None} for j in range(4)]
+                }
+                for i in range(1, rows + 1)
+            ],
+        },
+        'skills/edit_study_material.html': {
+            'material': StudyMaterial(**materials[0]),
+            'grades_list': [5, 6, 7],
+        },
+        'skills/demo_confirmation.html': {
+            'booking': DemoBooking(parent_name='Parent', student_name='Student', email='parent@example.com',
+                                   grade='7', booking_date=now.date(), booking_time=now.time()),
+        },
+    }
+    return contexts.get(template_name, {})
+
+
+def measure(backend, template_name, context, request, iterations):
+    """Mean seconds per render, and peak bytes allocated by one render"""
+    def render():
+        return backend.get_template(template_name).render(context, request)
+
+    # Warm the loader and fragment caches the way the first request would
+    render()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    seconds = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    try:
+        render()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmark(template_names=None, iterations=20, rows=50):
+    """Render templates under each profile and return {template: {profile: (seconds, peak_bytes)}}"""
+    template_names = template_names or discover_templates()
+    results = {name: {} for name in template_names}
+    for profile, options in PROFILES.items():
+        backend = make_backend(profile)
+        with override_settings(TEMPLATE_FRAGMENT_CACHE=options['fragment_cache']):
+            for name in template_names:
+                results[name][profile] = measure(backend, name, sample_context(name, rows), make_request(), iterations)
+    return results
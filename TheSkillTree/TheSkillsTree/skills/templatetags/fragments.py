@@ -0,0 +1,26 @@
+from django import template
+from django.conf import settings
+from django.utils.safestring import mark_safe
+from ..page_cache import get_shared_fragment, personalize
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cached_include(context, template_name):
+    """Include a template that is the same for every visitor, such as the navbar
+
+    With ``TEMPLATE_FRAGMENT_CACHE`` on, the include is rendered once into
+    the cache and only its CSRF token and account section are filled in per
+    request. Otherwise it behaves like ``{% include %}``.
+    """
+    request = context.get('request')
+    if not settings.TEMPLATE_FRAGMENT_CACHE or request is None:
+        with context.push():
+            return context.template.engine.get_template(template_name).render(context)
+
+    html = get_shared_fragment(template_name, request)
+    if context.get('navbar_account_placeholder'):
+        # Part of a shared page render: the page fills the placeholders in when served
+        return mark_safe(html)
+    return mark_safe(personalize(html, request))
@@ -1,3 +1,1455 @@
-from django.test import TestCase
+import atexit
+import base64
+import csv
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from datetime import date, time, timedelta
+from pathlib import Path
+from unittest import mock
+from PIL import Image
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import IntegrityError, connection
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.middleware.csrf import CSRF_TOKEN_LENGTH
+from django.template.loader import get_template
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from . import admin_tables, images, page_cache, practice_tests, question_bank, search, snapshots, taxonomy, template_benchmark
+from .dashboard import dashboard_cache_key
+from .models import (
+    Category, Skill, SignupUser, Test, Question, Option, AssignedTest, StudentAnswer, AnswerCheckpoint, StoredImage,
+    TestStatistics, QuestionStatistics, StudentProgressRollup, StudyMaterial, StudyMaterialGrade, StudentMaterial,
+    StudentEvent, MaterialTaxonomy, QuestionBankEntry, PendingImage
+)
 
-# Create your tests here.
+
+def make_student(email='student@example.com', grade='5'):
+    # SignupUser.save() only persists rows that carry a profile picture
+    return SignupUser.objects.bulk_create([SignupUser(
+        parent_name='Parent',
+        student_name='Student',
+        grade=grade,
+        email=email,
+        password='x',
+        is_verified=True
+    )])[0]
+
+
+def make_test(author, question_count, options_per_question=4, **kwargs):
+    """Create a test whose first option is always the correct one"""
+    test = Test.objects.create(
+        name=kwargs.pop('name', f'Test with {question_count} questions'),
+        subject=kwargs.pop('subject', 'Maths'),
+        duration_minutes=30,
+        created_by=author,
+        **kwargs
+    )
+    for i in range(question_count):
+        question = Question.objects.create(test=test, question_text=f'Q{i}', points=2, order=i + 1)
+        Option.objects.bulk_create([
+            Option(question=question, option_text=f'O{j}', is_correct=(j == 0), order=j + 1)
+            for j in range(options_per_question)
+        ])
+    return test
+
+
+def answer_map(test, correct=True):
+    answers = {}
+    for question in test.questions.prefetch_related('options'):
+        options = sorted(question.options.all(), key=lambda o: o.order)
+        answers[str(question.id)] = str(options[0].id if correct else options[1].id)
+    return answers
+
+
+# Tests clear and invalidate the cache freely, so they get a cache directory
+# of their own instead of the project's shared one
+TEST_CACHE_DIR = tempfile.mkdtemp(prefix='skills-cache-')
+atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(TEST_CACHE_DIR, 'django'),
+    }
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SkillsTestCase(TestCase):
+    """Test case that starts every test with empty caches"""
+
+    def setUp(self):
+        # Primary keys are reused after each rolled back test, so cached
+        # snapshots from an earlier test would otherwise leak into this one
+        cache.clear()
+        snapshots._local_snapshots.clear()
+
+
+class SubmitTestGradingTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.student = make_student()
+
+    def submit(self, test, answers, **extra):
+        payload = {'answers': answers, **extra}
+        return self.client.post(
+            f'/student/{self.student.id}/test/{test.id}/submit/',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+
+    def test_scores_and_stores_answers(self):
+        test = make_test(self.author, 4)
+        AssignedTest.objects.create(test=test, student=self.student)
+        answers = answer_map(test)
+        wrong_id = next(iter(answers))
+        answers[wrong_id] = str(Question.objects.get(id=wrong_id).options.get(order=2).id)
+
+        data = self.submit(test, answers, feedback={wrong_id: 'hard'}).json()
+
+        self.assertTrue(data['success'])
+        self.assertEqual(data['earned_points'], 6)
+        self.assertEqual(data['total_points'], 8)
+        self.assertEqual(data['score'], 75.0)
+        self.assertEqual(StudentAnswer.objects.count(), 4)
+        self.assertEqual(StudentAnswer.objects.get(question_id=wrong_id).feedback, 'hard')
+        self.assertTrue(AssignedTest.objects.get(test=test).completed)
+
+    def test_rejects_options_from_other_questions_and_double_submit(self):
+        test = make_test(self.author, 2)
+        AssignedTest.objects.create(test=test, student=self.student)
+        first, second = test.questions.order_by('order')
+        answers = {str(first.id): str(second.options.get(is_correct=True).id)}
+
+        data = self.submit(test, answers).json()
+        self.assertEqual(data['earned_points'], 0)
+        self.assertEqual(StudentAnswer.objects.count(), 0)
+
+        self.assertFalse(self.submit(test, answers).json()['success'])
+
+    def test_results_are_a_single_keyed_read(self):
+        test = make_test(self.author, 3)
+        AssignedTest.objects.create(test=test, student=self.student)
+        self.submit(test, answer_map(test, correct=False), general_feedback='ok')
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(f'/student/{self.student.id}/test/{test.id}/results/').json()
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(data['score'], 0)
+        self.assertEqual(data['student_feedback'], 'ok')
+        self.assertEqual(len(data['questions']), 3)
+        first = data['questions'][0]
+        self.assertEqual(first['selected_answer'], 'O1')
+        self.assertEqual(first['correct_answer'], 'O0')
+
+    def test_query_count_is_constant_in_question_count(self):
+        """Benchmark: grading 5 or 100 questions costs the same number of queries"""
+        counts = {}
+        # Separate subjects so both submissions start a new progress rollup
+        for size, subject in ((5, 'Maths'), (100, 'ELA')):
+            test = make_test(self.author, size, subject=subject)
+            AssignedTest.objects.create(test=test, student=self.student)
+            answers = answer_map(test)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.submit(test, answers)
+            self.assertEqual(response.json()['score'], 100)
+            counts[size] = len(ctx.captured_queries)
+
+        self.assertEqual(counts[5], counts[100])
+
+
+class ItemStatisticsTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.client.force_login(self.author)
+        self.test = make_test(self.author, 2)
+
+    def submit(self, student, answers):
+        AssignedTest.objects.create(test=self.test, student=student)
+        return self.client.post(
+            f'/student/{student.id}/test/{self.test.id}/submit/',
+            data=json.dumps({'answers': answers}),
+            content_type='application/json'
+        )
+
+    def test_statistics_are_updated_on_each_submission(self):
+        first, second = self.test.questions.order_by('order')
+        wrong = first.options.get(order=2)
+        self.submit(make_student(), answer_map(self.test))
+        self.submit(make_student(email='b@example.com'), {str(first.id): str(wrong.id)})
+
+        stats = self.client.get(f'/api/get-test/{self.test.id}/').json()['test']['stats']
+        self.assertEqual(stats['completed_count'], 2)
+        self.assertEqual(stats['average_score'], 50)
+        self.assertEqual(stats['score_histogram'][0], 1)
+        self.assertEqual(stats['score_histogram'][-1], 1)
+        first_stats = stats['questions'][str(first.id)]
+        self.assertEqual((first_stats['attempts'], first_stats['correct_count']), (2, 1))
+        self.assertEqual(first_stats['option_counts'][str(wrong.id)], 1)
+        self.assertEqual(stats['questions'][str(second.id)]['correct_rate'], 50)
+
+    def test_missing_statistics_are_rebuilt_from_history(self):
+        self.submit(make_student(), answer_map(self.test))
+        TestStatistics.objects.all().delete()
+        QuestionStatistics.objects.all().delete()
+        self.submit(make_student(email='b@example.com'), answer_map(self.test))
+
+        self.assertEqual(TestStatistics.objects.get(test=self.test).attempts, 2)
+        self.assertEqual(set(QuestionStatistics.objects.values_list('correct_count', flat=True)), {2})
+
+    def test_reading_missing_statistics_writes_nothing(self):
+        self.submit(make_student(), answer_map(self.test))
+        TestStatistics.objects.all().delete()
+
+        stats = self.client.get(f'/api/get-test/{self.test.id}/').json()['test']['stats']
+        self.assertEqual((stats['completed_count'], stats['average_score']), (0, 0))
+        self.assertFalse(TestStatistics.objects.exists())
+
+        call_command('rebuild_item_statistics', test_ids=[self.test.id], stdout=StringIO())
+        self.assertEqual(TestStatistics.objects.get(test=self.test).attempts, 1)
+
+
+class ProgressRollupTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_superuser(username='admin', password='x')
+        self.student = make_student()
+
+    def submit(self, test, answers):
+        AssignedTest.objects.create(test=test, student=self.student)
+        self.client.post(
+            f'/student/{self.student.id}/test/{test.id}/submit/',
+            data=json.dumps({'answers': answers}),
+            content_type='application/json'
+        )
+
+    def test_rollups_follow_submissions_and_rebuild(self):
+        maths = [make_test(self.author, 2, subject='Maths') for _ in range(2)]
+        ela = make_test(self.author, 1, subject='ELA')
+        self.submit(maths[0], answer_map(maths[0]))
+        self.submit(maths[1], answer_map(maths[1], correct=False))
+        self.submit(ela, answer_map(ela))
+
+        self.client.force_login(self.author)
+        with CaptureQueriesContext(connection) as ctx:
+            series = self.client.get(f'/api/student-progress/{self.student.id}/').json()['series']
+        self.assertEqual(len([q for q in ctx.captured_queries if 'progressrollup' in q['sql']]), 1)
+        self.assertEqual(len(series['Maths']), 1)
+        self.assertEqual(series['Maths'][0]['tests_completed'], 2)
+        self.assertEqual(series['Maths'][0]['mean_score'], 50)
+        self.assertEqual(series['Maths'][0]['points_earned'], 4)
+        self.assertEqual(series['ELA'][0]['points_earned'], 2)
+
+        StudentProgressRollup.objects.all().delete()
+        call_command('rebuild_progress_rollups', stdout=StringIO())
+        self.assertEqual(self.client.get(f'/api/student-progress/{self.student.id}/').json()['series'], series)
+
+    def test_other_students_cannot_read_progress(self):
+        response = self.client.get(f'/api/student-progress/{self.student.id}/')
+        self.assertEqual(response.status_code, 403)
+
+
+class DashboardTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.student = make_student()
+        session = self.client.session
+        session['is_logged_in'] = True
+        session['user_email'] = self.student.email
+        session.save()
+
+    def add_items(self, count):
+        today = date.today()
+        for i in range(count):
+            test = make_test(self.author, 2, is_practice=bool(i % 2))
+            AssignedTest.objects.create(test=test, student=self.student)
+            material = StudyMaterial.objects.create(
+                file_link='https://example.com/m.pdf', subject='Maths', grades='5', topic=f'Topic {i}'
+            )
+            StudentMaterial.objects.create(student=self.student, material=material, valid_until=today)
+            StudentEvent.objects.create(
+                student=self.student, title=f'Class {i}', event_date=today + timedelta(days=i),
+                start_time=time(10), end_time=time(11)
+            )
+        # An event far outside the calendar window is not sent with the page
+        StudentEvent.objects.create(
+            student=self.student, title='Old', event_date=today - timedelta(days=400),
+            start_time=time(10), end_time=time(11)
+        )
+
+    def render(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_query_budget_does_not_grow_with_items(self):
+        self.add_items(1)
+        _, small = self.render()
+        self.add_items(8)
+        response, large = self.render()
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 6)
+        self.assertEqual(len(response.context['practice_tests']) + len(response.context['assigned_tests']), 9)
+        self.assertEqual(response.context['assigned_tests'][0]['questions_count'], 2)
+
+    def test_events_are_served_per_window_with_conditional_get(self):
+        self.add_items(3)
+        today = date.today()
+        url = f'/student/{self.student.id}/events/'
+        params = {'start': today.isoformat(), 'end': (today + timedelta(days=1)).isoformat()}
+
+        response = self.client.get(url, params)
+        self.assertEqual([event['title'] for event in response.json()['events']], ['Class 0', 'Class 1'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'skills_studentevent' in q['sql']]), 1)
+
+        StudentEvent.objects.filter(title='Class 1').update(is_completed=True)
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+        for bad in ({'start': '2024-02-30'}, {'end': '2024-13-01'}, {'start': today.isoformat(), 'end': '2000-01-01'}):
+            self.assertEqual(self.client.get(url, bad).status_code, 400)
+
+        other = make_student(email='other@example.com')
+        self.assertEqual(self.client.get(f'/student/{other.id}/events/').status_code, 403)
+
+    def test_cached_payload_is_invalidated_by_changes(self):
+        self.add_items(1)
+        self.client.get('/dashboard/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/dashboard/')
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+
+        AssignedTest.objects.create(test=make_test(self.author, 1), student=self.student)
+        response = self.client.get('/dashboard/')
+        self.assertEqual(len(response.context['assigned_tests']) + len(response.context['practice_tests']), 2)
+
+
+
+class SharedCacheTests(SkillsTestCase):
+
+    def test_invalidation_reaches_other_processes(self):
+        # Another gunicorn worker invalidates a dashboard this process has cached
+        key = dashboard_cache_key(1)
+        cache.set(key, 'stale')
+        subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c',
+             'from skills.dashboard import invalidate_dashboard; invalidate_dashboard(1)'],
+            cwd=settings.BASE_DIR, check=True, capture_output=True,
+            env={**os.environ, 'SKILLS_CACHE_DIR': TEST_CACHE_DIR}
+        )
+        self.assertIsNone(cache.get(key))
+
+class CurrentStudentTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = make_student()
+        session = self.client.session
+        session['is_logged_in'] = True
+        session['user_email'] = self.student.email
+        session.save()
+
+    def student_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len([q for q in ctx.captured_queries if 'skills_signupuser' in q['sql']])
+
+    def test_student_is_resolved_from_cache_and_invalidated_on_save(self):
+        _, first = self.student_queries('/about/')
+        response, cached = self.student_queries('/contact/')
+        self.assertEqual((first, cached), (1, 0))
+        self.assertEqual(response.context['student'], self.student)
+        self.assertEqual(response.context['profile_picture_url'], self.student.get_profile_picture_url())
+
+        # SignupUser.save() skips rows without a profile picture, so send its signal directly
+        post_save.send(SignupUser, instance=self.student, created=False)
+        response, after_save = self.student_queries('/about/')
+        self.assertEqual(after_save, 1)
+
+
+class PublicPageCacheTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Skill.objects.create(title='Algebra', description='x', category=Category.objects.create(name='Maths'))
+
+    def get(self, url='/'):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_anonymous_page_is_served_without_rendering(self):
+        self.get()
+        response, queries = self.get()
+        self.assertEqual((queries, response.templates), (0, []))
+        self.assertIn('Cookie', response['Vary'])
+
+        content = response.content.decode()
+        self.assertNotIn(page_cache.CSRF_PLACEHOLDER, content)
+        self.assertNotIn(page_cache.ACCOUNT_PLACEHOLDER, content)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', content).group(1)
+        self.assertEqual(len(token), CSRF_TOKEN_LENGTH)
+
+        Skill.objects.create(title='Geometry', description='x', category=Category.objects.get())
+        response, _ = self.get()
+        self.assertIn('skills/home.html', [t.name for t in response.templates])
+
+    def test_signed_in_student_gets_their_own_navbar(self):
+        self.get('/about/')
+        student = make_student(email='ada@example.com')
+        session = self.client.session
+        session['is_logged_in'] = True
+        session['user_email'] = student.email
+        session.save()
+
+        response, _ = self.get('/about/')
+        self.assertEqual([t.name for t in response.templates], ['skills/navbar_account.html'])
+        self.assertContains(response, 'ada@example.com')
+        self.assertContains(response, 'Logout')
+
+
+class TemplateRenderingTests(SkillsTestCase):
+
+    def test_every_template_compiles(self):
+        for name in template_benchmark.discover_templates():
+            with self.subTest(template=name):
+                get_template(name)
+
+    def test_benchmark_reports_both_profiles(self):
+        names = ['skills/take_test.html', 'skills/edit_study_material.html']
+        results = template_benchmark.run_benchmark(names, iterations=1, rows=3)
+        for name in names:
+            self.assertEqual(set(results[name]), {'development', 'production'})
+            for seconds, peak in results[name].values():
+                self.assertGreater(seconds, 0)
+                self.assertGreater(peak, 0)
+
+    @override_settings(TEMPLATE_FRAGMENT_CACHE=True)
+    def test_navbar_is_rendered_once_and_personalized_per_request(self):
+        student = make_student()
+        session = self.client.session
+        session['is_logged_in'] = True
+        session['user_email'] = student.email
+        session.save()
+
+        self.client.get('/dashboard/')
+        response = self.client.get('/dashboard/')
+        rendered = [t.name for t in response.templates]
+        self.assertIn('skills/dashboard.html', rendered)
+        self.assertNotIn('skills/navbar.html', rendered)
+        self.assertNotIn('skills/footer.html', rendered)
+
+        content = response.content.decode()
+        self.assertIn(student.email, content)
+        self.assertNotIn(page_cache.CSRF_PLACEHOLDER, content)
+        self.assertIn('name="csrfmiddlewaretoken"', content)
+
+
+class AdminTablesTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(username='admin', password='x')
+        self.client.force_login(self.admin)
+        SignupUser.objects.bulk_create([
+            SignupUser(parent_name=f'Parent {name}', student_name=name, grade=grade, email=f'{name.lower()}@example.com',
+                       password='x')
+            for name, grade in [('Carol', '5'), ('alice', '7'), ('Bob', 'Grade 5'), ('Dave', '8'), ('Alan', '12')]
+        ])
+        # bulk_create sends no signals, so index the students by hand
+        search.rebuild_search_index()
+
+    def pages(self, url, **params):
+        rows, cursor = [], None
+        while True:
+            response = self.client.get(url, dict(params, **({'cursor': cursor} if cursor else {})))
+            data = response.json()
+            self.assertTrue(data['success'])
+            rows += data['rows']
+            cursor = data['next_cursor']
+            if cursor is None:
+                return rows
+
+    def test_students_are_paged_in_sort_order(self):
+        rows = self.pages('/api/admin/students/', sort='-student_name', limit=2)
+        self.assertEqual([row['student_name'] for row in rows], ['alice', 'Dave', 'Carol', 'Bob', 'Alan'])
+
+    def test_students_are_searched_on_the_server(self):
+        rows = self.pages('/api/admin/students/', q='al', limit=1)
+        self.assertEqual(sorted(row['student_name'] for row in rows), ['Alan', 'alice'])
+        rows = self.pages('/api/admin/students/', q='5')
+        self.assertEqual(sorted(row['student_name'] for row in rows), ['Bob', 'Carol'])
+
+    def test_materials_are_paged_newest_first(self):
+        for i in range(3):
+            StudyMaterial.objects.create(file_link='https://example.com/m.pdf', subject='Maths', grades='5,6', topic=f'T{i}')
+        StudyMaterial.objects.create(file_link='https://example.com/m.pdf', subject='ELA', grades='12', topic='Essays')
+        rows = self.pages('/api/admin/materials/', limit=3)
+        self.assertEqual([row['topic'] for row in rows], ['Essays', 'T2', 'T1', 'T0'])
+        rows = self.pages('/api/admin/materials/', q='6')
+        self.assertEqual(len(rows), 3)
+
+    def test_dashboard_renders_only_the_first_page(self):
+        with mock.patch.object(admin_tables, 'TABLE_PAGE_SIZE', 2):
+            response = self.client.get('/dashboard/admin/')
+        page = response.context['students_page']
+        self.assertEqual(len(page['rows']), 2)
+        self.assertIsNotNone(page['next_cursor'])
+        self.assertContains(response, 'id="students-first-page"')
+
+    def test_tables_are_for_admins_only(self):
+        self.assertEqual(self.client.get('/api/admin/materials/', {'sort': 'created_at', 'cursor': 'x|1'}).status_code, 400)
+        self.client.force_login(User.objects.create_user(username='student', password='x'))
+        self.assertEqual(self.client.get('/api/admin/students/').status_code, 403)
+
+
+class SearchIndexTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='x'))
+
+    def titles(self, q, **params):
+        response = self.client.get('/api/admin/search/', dict(params, q=q))
+        self.assertTrue(response.json()['success'])
+        return [result['title'] for result in response.json()['results']]
+
+    def test_signals_keep_materials_in_sync(self):
+        material = StudyMaterial.objects.create(
+            file_link='https://example.com/m.pdf', subject='Maths', grades='5', topic='Fractions'
+        )
+        StudyMaterial.objects.create(
+            file_link='https://example.com/m.pdf', subject='Maths', grades='5', topic='Decimals', sub_topic='Fractions to decimals'
+        )
+        # A match on the title ranks above a match in the other columns
+        self.assertEqual(self.titles('fract'), ['Fractions', 'Decimals'])
+
+        material.topic = 'Ratios'
+        material.save()
+        self.assertEqual(self.titles('fract'), ['Decimals'])
+        self.assertEqual(self.titles('rat', kind='material'), ['Ratios'])
+
+        material.delete()
+        self.assertEqual(self.titles('rat'), [])
+
+    def test_rebuild_command_indexes_existing_rows(self):
+        student = make_student(email='ada.lovelace@example.com')
+        self.assertEqual(self.titles('lovel'), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 1', out.getvalue())
+        response = self.client.get('/api/admin/search/', {'q': 'ada love', 'kind': 'student', 'limit': 5})
+        self.assertEqual(response.json()['results'], [{
+            'kind': 'student', 'id': student.id, 'title': 'Student', 'subtitle': student.email,
+            'url': f'/student/{student.id}/'
+        }])
+        self.assertEqual(self.titles('ada', kind='material'), [])
+        self.assertEqual(self.titles('" OR *'), [])
+
+
+class AvailableMaterialsTests(SkillsTestCase):
+
+    def make_material(self, grades, topic='Fractions'):
+        return StudyMaterial.objects.create(
+            file_link='https://example.com/m.pdf', subject='Maths', grades=grades, topic=topic
+        )
+
+    def available(self, student):
+        response = self.client.post(f'/student/{student.id}/tab-change/assign/', '{}', content_type='application/json')
+        return [material['id'] for material in response.json()['available_materials'].get('Maths', [])]
+
+    def test_grade_links_follow_the_grades_string(self):
+        material = self.make_material('5,6')
+        self.assertEqual(sorted(material.grade_links.values_list('grade', flat=True)), [5, 6])
+
+        material.set_grades_list([6, 7])
+        material.save()
+        self.assertEqual(sorted(material.grade_links.values_list('grade', flat=True)), [6, 7])
+        self.assertEqual(StudyMaterialGrade.objects.count(), 2)
+
+    def test_assign_tab_lists_unassigned_materials_in_one_query(self):
+        student = make_student(grade='Grade 5')
+        assigned = self.make_material('5,6')
+        open_material = self.make_material('4,5')
+        self.make_material('6')
+        StudentMaterial.objects.create(student=student, material=assigned, valid_until=date.today() + timedelta(days=30))
+
+        self.assertEqual(self.available(student), [open_material.id])
+
+        with CaptureQueriesContext(connection) as before:
+            self.available(student)
+        for i in range(10):
+            self.make_material('5', topic=f'Topic {i}')
+        with CaptureQueriesContext(connection) as after:
+            self.assertEqual(len(self.available(student)), 11)
+        self.assertEqual(len(after), len(before))
+
+
+class MaterialTaxonomyTests(SkillsTestCase):
+
+    def make_material(self, topic, sub_topic=None, subject='Maths'):
+        return StudyMaterial.objects.create(
+            file_link='https://example.com/m.pdf', subject=subject, grades='5', topic=topic, sub_topic=sub_topic
+        )
+
+    def test_counts_follow_create_edit_and_delete(self):
+        self.make_material('Fractions', 'Halves')
+        self.make_material('Fractions', 'Quarters')
+        moved = self.make_material('Decimals', 'Halves')
+        self.make_material('Grammar', subject='ELA')
+
+        self.assertEqual(self.client.get('/api/get-topics/', {'subject': 'Maths'}).json(), ['Fractions', 'Decimals'])
+        self.assertEqual(self.client.get('/api/get-subtopics/', {'subject': 'Maths'}).json(), ['Halves', 'Quarters'])
+        self.assertEqual(
+            self.client.get('/api/get-subtopics/', {'subject': 'Maths', 'topic': 'Decimals'}).json(), ['Halves']
+        )
+
+        moved.topic = 'Fractions'
+        moved.sub_topic = 'Quarters'
+        moved.save()
+        moved.save()
+        self.assertEqual(
+            list(MaterialTaxonomy.objects.filter(subject='Maths').values_list('topic', 'sub_topic', 'count')
+                 .order_by('sub_topic')),
+            [('Fractions', 'Halves', 1), ('Fractions', 'Quarters', 2)]
+        )
+
+        StudyMaterial.objects.filter(subject='ELA').delete()
+        self.assertEqual(list(self.client.get('/api/material-taxonomy/').json()), ['Maths'])
+
+    def test_concurrent_create_falls_back_to_an_update(self):
+        MaterialTaxonomy.objects.create(subject='Maths', topic='Fractions', count=1)
+        with mock.patch.object(MaterialTaxonomy.objects, 'get_or_create', side_effect=IntegrityError):
+            taxonomy.adjust_taxonomy(('Maths', 'Fractions', ''), 1)
+        self.assertEqual(MaterialTaxonomy.objects.get().count, 2)
+
+    def test_autocomplete_is_a_cached_lookup_with_an_etag(self):
+        self.make_material('Fractions', 'Halves')
+
+        response = self.client.get('/api/get-topics/', {'subject': 'Maths'})
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/get-topics/', {'subject': 'Maths'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.make_material('Decimals')
+        response = self.client.get('/api/get-topics/', {'subject': 'Maths'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json(), ['Decimals', 'Fractions'])
+
+
+class AssignMaterialsTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='x'))
+        self.materials = [
+            StudyMaterial.objects.create(file_link=f'https://example.com/{i}.pdf', subject='Maths', grades='7')
+            for i in range(3)
+        ]
+
+    def assign(self, **payload):
+        payload = {'material_ids': [material.id for material in self.materials], 'valid_until': '2030-01-01', **payload}
+        return self.client.post('/api/assign-materials/', data=json.dumps(payload), content_type='application/json')
+
+    def test_grade_selector_assigns_every_pair_in_bulk(self):
+        students = [make_student(email=f's{i}@example.com', grade='Grade 7') for i in range(20)]
+        make_student(email='other@example.com', grade='8')
+        StudentMaterial.objects.create(student=students[0], material=self.materials[0], valid_until=date(2029, 1, 1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.assign(selector={'grade': 7}).json()
+
+        self.assertLess(len(ctx.captured_queries), 12)
+        self.assertEqual((data['created'], data['skipped'], data['total']), (59, 1, 60))
+        self.assertEqual(StudentMaterial.objects.count(), 60)
+        # Existing assignments keep their own validity
+        self.assertEqual(
+            StudentMaterial.objects.get(student=students[0], material=self.materials[0]).valid_until, date(2029, 1, 1)
+        )
+
+    def test_rejects_bad_dates_and_unknown_materials(self):
+        student = make_student()
+        self.assertEqual(self.assign(student_ids=[student.id], valid_until='2000-01-01').status_code, 400)
+        self.assertEqual(self.assign(student_ids=[student.id], valid_until='soon').status_code, 400)
+        response = self.assign(student_ids=[student.id], material_ids=[self.materials[0].id, 9999])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('9999', response.json()['message'])
+        self.assertFalse(StudentMaterial.objects.exists())
+
+    def test_non_admins_are_not_allowed(self):
+        make_student(grade='7')
+        self.client.force_login(User.objects.create_user(username='student', password='x'))
+        self.assertEqual(self.assign(selector={'grade': 7}).status_code, 403)
+        self.assertFalse(StudentMaterial.objects.exists())
+
+
+class ResultsExportTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_superuser(username='admin', password='x')
+        self.client.force_login(self.author)
+        self.maths = make_test(self.author, 2, subject='Maths')
+        self.ela = make_test(self.author, 1, subject='ELA')
+        for i in range(3):
+            student = make_student(email=f's{i}@example.com', grade='Grade 7' if i else '8')
+            for test in (self.maths, self.ela):
+                AssignedTest.objects.create(test=test, student=student)
+                self.client.post(
+                    f'/student/{student.id}/test/{test.id}/submit/',
+                    data=json.dumps({'answers': answer_map(test)}),
+                    content_type='application/json'
+                )
+
+    def export(self, **params):
+        response = self.client.get('/api/export-results/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_has_one_row_per_answer(self):
+        with mock.patch('skills.exports.EXPORT_CHUNK_SIZE', 2):
+            rows = list(csv.DictReader(StringIO(self.export(subject='Maths'))))
+
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({row['subject'] for row in rows}, {'Maths'})
+        self.assertEqual({row['is_correct'] for row in rows}, {'True'})
+
+    def test_ndjson_export_filters_by_grade_and_date(self):
+        lines = self.export(format='ndjson', grade=7, **{'from': '2000-01-01'}).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({row['student_grade'] for row in rows}, {'Grade 7'})
+
+        self.assertEqual(self.export(format='ndjson', to='2000-01-01'), '')
+
+    def test_bad_filters_and_non_admins_are_rejected_up_front(self):
+        for params in ({'test': 'abc'}, {'grade': 'seven'}, {'from': '2024-02-30'}, {'to': 'yesterday'}):
+            self.assertEqual(self.client.get('/api/export-results/', params).status_code, 400)
+
+        self.client.force_login(User.objects.create_user(username='student', password='x'))
+        self.assertEqual(self.client.get('/api/export-results/').status_code, 403)
+
+
+class TestSnapshotTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.student = make_student()
+        self.test = make_test(self.author, 3)
+        AssignedTest.objects.create(test=self.test, student=self.student)
+
+    def test_snapshot_is_reused_and_hides_answer_key(self):
+        url = f'/student/{self.student.id}/test/{self.test.id}/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        questions = response.context['questions']
+        self.assertEqual(len(questions), 3)
+        self.assertNotIn('is_correct', questions[0]['options'][0])
+
+    def test_edit_publishes_a_new_snapshot_version(self):
+        self.client.force_login(self.author)
+        payload = {
+            'name': 'Renamed',
+            'subject': 'Maths',
+            'duration': 20,
+            'questions': [{
+                'text': 'Only question',
+                'points': 1,
+                'options': [{'text': 'Yes', 'isCorrect': True}, {'text': 'No', 'isCorrect': False}]
+            }]
+        }
+        self.client.get(f'/api/get-test/{self.test.id}/')
+        self.client.post(f'/api/edit-test/{self.test.id}/', data=json.dumps(payload), content_type='application/json')
+
+        data = self.client.get(f'/api/get-test/{self.test.id}/').json()['test']
+        self.assertEqual(data['name'], 'Renamed')
+        self.assertEqual([q['text'] for q in data['questions']], ['Only question'])
+
+
+class GetAllTestsTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.client.force_login(self.author)
+
+    def test_counts_filters_and_keyset_pages(self):
+        student = make_student()
+        other = make_student(email='other@example.com')
+        maths = make_test(self.author, 3, grade='5')
+        AssignedTest.objects.create(test=maths, student=student, completed=True, score=80)
+        AssignedTest.objects.create(test=maths, student=other)
+        for i in range(4):
+            make_test(self.author, 1, name=f'ELA {i}', subject='ELA', grade='6')
+
+        data = self.client.get('/api/get-all-tests/', {'subject': 'Maths'}).json()
+        self.assertEqual(len(data['tests']), 1)
+        row = data['tests'][0]
+        self.assertEqual(
+            (row['questions_count'], row['assigned_count'], row['completed_count'], row['average_score']),
+            (3, 2, 1, 80.0)
+        )
+
+        names = []
+        cursor = None
+        while True:
+            params = {'subject': 'ELA', 'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.client.get('/api/get-all-tests/', params).json()
+            self.assertLessEqual(len(ctx.captured_queries), 3)
+            names += [t['name'] for t in data['tests']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(sorted(names), [f'ELA {i}' for i in range(4)])
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ('x|1', '2024-02-30T10:00:00|1', '2024-01-01T10:00:00|abc'):
+            response = self.client.get('/api/get-all-tests/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()['success'])
+
+
+class EditTestDiffTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.client.force_login(self.author)
+        self.test = make_test(self.author, 3)
+
+    def editor_payload(self):
+        data = self.client.get(f'/api/get-test/{self.test.id}/').json()['test']
+        return {
+            'name': data['name'],
+            'subject': data['subject'],
+            'duration': data['duration_minutes'],
+            'questions': [
+                {
+                    'id': question['id'],
+                    'text': question['text'],
+                    'points': question['points'],
+                    'questionImage': question['image_url'],
+                    'options': [
+                        {'id': option['id'], 'text': option['text'], 'isCorrect': option['is_correct'], 'optionImage': option['image_url']}
+                        for option in question['options']
+                    ]
+                }
+                for question in data['questions']
+            ]
+        }
+
+    def edit(self, payload):
+        return self.client.post(
+            f'/api/edit-test/{self.test.id}/', data=json.dumps(payload), content_type='application/json'
+        ).json()
+
+    def test_typo_fix_updates_one_row_and_keeps_answers(self):
+        student = make_student()
+        assignment = AssignedTest.objects.create(test=self.test, student=student)
+        question = self.test.questions.order_by('order').first()
+        StudentAnswer.objects.create(
+            assignment=assignment, question=question, selected_option=question.options.first(), is_correct=True
+        )
+        payload = self.editor_payload()
+        payload['questions'][0]['text'] = 'Q0 fixed'
+
+        data = self.edit(payload)
+
+        self.assertEqual(data['changes'], {'questions_updated': 1})
+        self.assertEqual(StudentAnswer.objects.count(), 1)
+        self.assertEqual(Question.objects.get(id=question.id).question_text, 'Q0 fixed')
+
+    def test_adds_and_removes_rows(self):
+        payload = self.editor_payload()
+        removed = payload['questions'].pop(1)
+        payload['questions'].append({
+            'text': 'New', 'points': 1, 'options': [{'text': 'A', 'isCorrect': True}, {'text': 'B', 'isCorrect': False}]
+        })
+
+        data = self.edit(payload)
+
+        self.assertEqual(data['changes']['questions_created'], 1)
+        self.assertEqual(data['changes']['questions_deleted'], 1)
+        self.assertEqual(data['changes']['options_created'], 2)
+        self.assertFalse(Question.objects.filter(id=removed['id']).exists())
+        self.assertEqual(
+            list(self.test.questions.order_by('order').values_list('question_text', flat=True)),
+            ['Q0', 'Q2', 'New']
+        )
+
+    def test_image_names_from_the_client_are_not_stored(self):
+        question = self.test.questions.order_by('order').first()
+        Question.objects.filter(id=question.id).update(question_image='/static/question_images/kept.png')
+        payload = self.editor_payload()
+        payload['questions'][0]['questionImage'] = '../../TheSkillsTree/settings.py'
+        payload['questions'].append({
+            'text': 'New', 'points': 1, 'questionImage': '../../manage.py',
+            'options': [{'text': 'A', 'isCorrect': True, 'optionImage': '../../manage.py'}, {'text': 'B', 'isCorrect': False}]
+        })
+
+        self.edit(payload)
+
+        self.assertEqual(Question.objects.get(id=question.id).question_image.name, '/static/question_images/kept.png')
+        new_question = self.test.questions.get(question_text='New')
+        self.assertFalse(new_question.question_image)
+        self.assertFalse(new_question.options.get(order=1).option_image)
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_unchanged_payload_writes_nothing(self):
+        payload = self.editor_payload()
+        version = Test.objects.get(id=self.test.id).version
+
+        self.assertEqual(self.edit(payload)['changes'], {})
+        self.assertEqual(Test.objects.get(id=self.test.id).version, version)
+
+    def test_version_bump_does_not_lose_a_concurrent_one(self):
+        payload = self.editor_payload()
+        payload['name'] = 'Renamed'
+        version = Test.objects.get(id=self.test.id).version
+        real_apply = practice_tests.apply_test_edit
+
+        def apply_while_images_finish(test, *args):
+            # The image jobs of an earlier edit finish after the test was loaded
+            Test.objects.filter(pk=test.pk).update(version=F('version') + 1)
+            return real_apply(test, *args)
+
+        with mock.patch('skills.practice_tests.apply_test_edit', apply_while_images_finish):
+            self.edit(payload)
+
+        test = Test.objects.get(id=self.test.id)
+        self.assertEqual((test.name, test.version), ('Renamed', version + 2))
+
+
+class AssignTestTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.client.force_login(self.author)
+        self.test = make_test(self.author, 1)
+
+    def assign(self, **payload):
+        return self.client.post(
+            '/api/assign-test/', data=json.dumps({'test_id': self.test.id, **payload}), content_type='application/json'
+        ).json()
+
+    def test_grade_selector_inserts_in_bulk_and_reports_skips(self):
+        students = [make_student(email=f's{i}@example.com', grade='Grade 7') for i in range(30)]
+        make_student(email='other@example.com', grade='8')
+        AssignedTest.objects.create(test=self.test, student=students[0])
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.assign(selector={'grade': 7}, expiration_date='2030-01-01')
+
+        self.assertLess(len(ctx.captured_queries), 12)
+        self.assertEqual((data['created'], data['skipped'], data['total']), (29, 1, 30))
+        self.assertEqual(AssignedTest.objects.filter(test=self.test).count(), 30)
+
+    def test_has_test_selector_combines_with_ids(self):
+        source = make_test(self.author, 1, name='Source')
+        first, second, third = (make_student(email=f's{i}@example.com') for i in range(3))
+        AssignedTest.objects.create(test=source, student=first)
+
+        data = self.assign(student_ids=[second.id], selector={'has_test': source.id})
+
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(
+            set(AssignedTest.objects.filter(test=self.test).values_list('student_id', flat=True)),
+            {first.id, second.id}
+        )
+
+
+class CheckpointTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.student = make_student()
+        self.test = make_test(self.author, 3)
+        self.assignment = AssignedTest.objects.create(test=self.test, student=self.student)
+        self.base = f'/student/{self.student.id}/test/{self.test.id}'
+
+    def checkpoint(self, answers):
+        return self.client.post(f'{self.base}/checkpoint/', data=json.dumps({'answers': answers}), content_type='application/json')
+
+    def test_checkpoints_are_appended_and_folded_into_submission(self):
+        answers = answer_map(self.test)
+        first, second, third = answers
+        wrong = answer_map(self.test, correct=False)
+
+        self.checkpoint({first: wrong[first]})
+        self.checkpoint({first: answers[first], second: answers[second]})
+        self.assertEqual(AnswerCheckpoint.objects.count(), 3)
+
+        resumed = self.client.get(f'{self.base}/checkpoint/').json()
+        self.assertEqual(resumed['answers'], {first: int(answers[first]), second: int(answers[second])})
+
+        data = self.client.post(
+            f'{self.base}/submit/', data=json.dumps({'answers': {third: answers[third]}}), content_type='application/json'
+        ).json()
+        self.assertEqual(data['score'], 100)
+
+    def test_deleted_assignment_is_not_written(self):
+        first = next(iter(answer_map(self.test)))
+        self.assertEqual(self.checkpoint({first: '1'}).status_code, 200)
+
+        # The assignment id is still cached when the assignment is revoked
+        self.assignment.delete()
+        self.assertEqual(self.checkpoint({first: '1'}).status_code, 404)
+        self.assertFalse(AnswerCheckpoint.objects.exists())
+        self.assertEqual(self.client.get(f'{self.base}/checkpoint/').status_code, 404)
+
+
+def png_data_url(color=(255, 0, 0), size=(8, 8)):
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(output.getvalue()).decode()
+
+
+class QuestionBankTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.client.force_login(self.author)
+
+    def publish(self, test, topic):
+        return self.client.post(
+            '/api/question-bank/publish/',
+            data=json.dumps({'test_id': test.id, 'topic': topic}),
+            content_type='application/json'
+        ).json()
+
+    def generate(self, **payload):
+        return self.client.post(
+            '/api/question-bank/generate/',
+            data=json.dumps({'name': 'Practice', 'subject': 'Maths', 'grade': '5', **payload}),
+            content_type='application/json'
+        )
+
+    def test_generated_tests_sample_the_matching_bank_questions(self):
+        fractions = make_test(self.author, 20, grade='5')
+        Question.objects.filter(test=fractions).update(question_image='/static/question_images/shared.jpg')
+        self.assertEqual(self.publish(fractions, 'Fractions')['added'], 20)
+        self.assertEqual(self.publish(fractions, 'Fractions')['added'], 0)
+        self.publish(make_test(self.author, 20, grade='5'), 'Geometry')
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.generate(topic='Fractions', count=8).json()
+        # At most two sampling scans, depending on where the random pivot lands
+        self.assertLessEqual(len(ctx.captured_queries), 17)
+
+        test = Test.objects.get(id=data['test_id'])
+        self.assertTrue(test.is_practice)
+        questions = list(test.questions.select_related('source_question__bank_entry__source_question'))
+        self.assertEqual(len(questions), 8)
+        self.assertEqual(
+            {q.source_question.bank_entry.source_question.test_id for q in questions}, {fractions.id}
+        )
+        self.assertEqual(len({q.source_question_id for q in questions}), 8)
+        self.assertEqual(Option.objects.filter(question__test=test, is_correct=True).count(), 8)
+        # One reference per bank copy and one per generated question
+        self.assertEqual(StoredImage.objects.get(path='/static/question_images/shared.jpg').ref_count, 28)
+
+    def test_generate_without_matching_questions(self):
+        self.publish(make_test(self.author, 3, grade='5'), 'Fractions')
+        self.assertEqual(self.generate(topic='Algebra').status_code, 404)
+        self.assertEqual(self.generate(grade='6').status_code, 404)
+        self.assertEqual(len(Test.objects.get(id=self.generate(count=10).json()['test_id']).questions.all()), 3)
+
+    def test_bank_outlives_edits_and_deletion_of_the_source_test(self):
+        source = make_test(self.author, 3, grade='5')
+        self.publish(source, 'Fractions')
+        source.questions.update(question_text='Edited')
+
+        self.client.post(f'/api/delete-test/{source.id}/')
+        self.assertFalse(Test.objects.filter(id=source.id).exists())
+        self.assertEqual(QuestionBankEntry.objects.count(), 3)
+        self.assertEqual(
+            sorted(QuestionBankEntry.objects.values_list('question__question_text', flat=True)), ['Q0', 'Q1', 'Q2']
+        )
+
+        test = Test.objects.get(id=self.generate(count=3).json()['test_id'])
+        self.assertEqual(Option.objects.filter(question__test=test).count(), 12)
+
+    def test_sampled_entries_get_new_keys(self):
+        self.publish(make_test(self.author, 10, grade='5'), 'Fractions')
+        keys = dict(QuestionBankEntry.objects.values_list('question_id', 'sample_key'))
+
+        picked = question_bank.sample_bank_questions('Maths', 3, grade='5')
+
+        moved = dict(QuestionBankEntry.objects.values_list('question_id', 'sample_key'))
+        self.assertEqual({question_id for question_id in keys if keys[question_id] != moved[question_id]}, set(picked))
+
+
+class ImageProcessingTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_superuser(username='admin', password='x')
+        self.client.force_login(self.author)
+        self.static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_dir)
+        os.makedirs(os.path.join(self.static_dir, 'skills', 'static'))
+
+    def test_images_are_filled_in_after_the_request_commits(self):
+        payload = {
+            'name': 'Illustrated',
+            'subject': 'Maths',
+            'duration': 10,
+            'questions': [{
+                'text': 'Which colour?',
+                'points': 1,
+                'questionImage': png_data_url(),
+                'options': [
+                    {'text': 'Red', 'isCorrect': True, 'optionImage': png_data_url()},
+                    {'text': 'Blue', 'isCorrect': False},
+                ]
+            }]
+        }
+
+        with self.settings(BASE_DIR=Path(self.static_dir), MEDIA_ROOT=self.static_dir), \
+                mock.patch('skills.images.IMAGE_PROCESSING_WORKERS', 0), \
+                self.captureOnCommitCallbacks(execute=True):
+            data = self.client.post('/api/create-test/', data=json.dumps(payload), content_type='application/json').json()
+            question = Question.objects.get(test_id=data['test_id'])
+            self.assertEqual(data['images_pending'], 2)
+            self.assertFalse(question.question_image)
+
+        question.refresh_from_db()
+        self.assertTrue(question.question_image.name.startswith('/static/question_images/'))
+        self.assertTrue(question.options.get(order=1).option_image)
+        self.assertEqual(Test.objects.get(id=data['test_id']).version, 2)
+
+    def test_identical_images_share_one_reference_counted_file(self):
+        image = png_data_url(color=(0, 128, 0))
+        payload = {
+            'name': 'Shared diagram',
+            'subject': 'Maths',
+            'duration': 10,
+            'questions': [{
+                'text': 'Q',
+                'points': 1,
+                'questionImage': image,
+                'options': [{'text': 'A', 'isCorrect': True, 'optionImage': image}, {'text': 'B', 'isCorrect': False, 'optionImage': image}]
+            }]
+        }
+
+        with self.settings(BASE_DIR=Path(self.static_dir), MEDIA_ROOT=self.static_dir), mock.patch('skills.images.IMAGE_PROCESSING_WORKERS', 0):
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.client.post('/api/create-test/', data=json.dumps(payload), content_type='application/json').json()
+            with self.captureOnCommitCallbacks(execute=True):
+                second = self.client.post('/api/create-test/', data=json.dumps(payload), content_type='application/json').json()
+
+            option_dir = os.path.join(self.static_dir, 'skills', 'static', 'option_images')
+            self.assertEqual(len(os.listdir(option_dir)), 1)
+            path = Option.objects.filter(question__test_id=first['test_id']).first().option_image.name
+            self.assertEqual(StoredImage.objects.get(path=path).ref_count, 4)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f"/api/delete-test/{first['test_id']}/")
+            self.assertEqual(StoredImage.objects.get(path=path).ref_count, 2)
+            self.assertEqual(len(os.listdir(option_dir)), 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f"/api/delete-test/{second['test_id']}/")
+            self.assertFalse(StoredImage.objects.filter(path=path).exists())
+            self.assertEqual(os.listdir(option_dir), [])
+
+    def test_file_deleted_by_a_concurrent_last_release_is_written_again(self):
+        image = images.normalize_image(base64.b64decode(png_data_url(color=(9, 9, 9)).split(',', 1)[1]))
+        real_retain = images.retain_image
+
+        def retain_after_last_release(url, *args):
+            # The last reference to the same image goes away just before ours is taken
+            images.release_image(url)
+            return real_retain(url, *args)
+
+        with self.settings(BASE_DIR=Path(self.static_dir)):
+            url = images.store_normalized_image(image, 'option_images')
+            with mock.patch('skills.images.retain_image', retain_after_last_release):
+                self.assertEqual(images.store_normalized_image(image, 'option_images'), url)
+
+            self.assertEqual(StoredImage.objects.get(path=url).ref_count, 1)
+            self.assertTrue(os.path.exists(images.image_file_path(url)))
+
+    def test_releasing_never_deletes_outside_the_image_folders(self):
+        static = os.path.join(self.static_dir, 'skills', 'static')
+        os.makedirs(os.path.join(static, 'question_images'))
+        os.makedirs(os.path.join(static, 'css'))
+        paths = {
+            '/static/question_images/legacy.jpg': os.path.join(static, 'question_images', 'legacy.jpg'),
+            '/static/css/site.css': os.path.join(static, 'css', 'site.css'),
+            '/static/question_images/../../../settings.py': os.path.join(self.static_dir, 'settings.py'),
+        }
+        for path in paths.values():
+            Path(path).touch()
+
+        with self.settings(BASE_DIR=Path(self.static_dir)), self.assertLogs('skills.images', 'WARNING') as logs:
+            for url in paths:
+                images.release_image(url)
+
+        self.assertFalse(os.path.exists(paths['/static/question_images/legacy.jpg']))
+        self.assertTrue(os.path.exists(paths['/static/css/site.css']))
+        self.assertTrue(os.path.exists(paths['/static/question_images/../../../settings.py']))
+        self.assertEqual(len(logs.output), 2)
+
+    def test_uploaded_images_are_referenced_by_handle(self):
+        png = base64.b64decode(png_data_url(color=(0, 0, 255)).split(',', 1)[1])
+
+        with self.settings(BASE_DIR=Path(self.static_dir), MEDIA_ROOT=self.static_dir), \
+                mock.patch('skills.images.IMAGE_PROCESSING_WORKERS', 0):
+            upload = SimpleUploadedFile('diagram.png', png, content_type='image/png')
+            handle = self.client.post('/api/upload-test-image/', {'image': upload}).json()['handles'][0]
+            self.assertTrue(handle.startswith('upload:'))
+
+            payload = {
+                'name': 'Uploaded',
+                'subject': 'Maths',
+                'duration': 10,
+                'questions': [{
+                    'text': 'Q',
+                    'points': 1,
+                    'questionImage': handle,
+                    'options': [{'text': 'A', 'isCorrect': True}, {'text': 'B', 'isCorrect': False}]
+                }]
+            }
+            with self.captureOnCommitCallbacks(execute=True):
+                data = self.client.post('/api/create-test/', data=json.dumps(payload), content_type='application/json').json()
+
+            question = Question.objects.get(test_id=data['test_id'])
+            self.assertTrue(question.question_image.name.startswith('/static/question_images/'))
+            self.assertEqual(os.listdir(os.path.join(self.static_dir, 'image_uploads')), [])
+
+    def test_only_admins_can_upload_images(self):
+        png = base64.b64decode(png_data_url().split(',', 1)[1])
+        self.client.force_login(User.objects.create_user(username='student', password='x'))
+
+        with self.settings(MEDIA_ROOT=self.static_dir):
+            upload = SimpleUploadedFile('diagram.png', png, content_type='image/png')
+            response = self.client.post('/api/upload-test-image/', {'image': upload})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(os.path.exists(os.path.join(self.static_dir, 'image_uploads')))
+
+    def test_lost_image_jobs_are_finished_by_the_command(self):
+        test = make_test(self.author, 1)
+        question = test.questions.get()
+
+        with self.settings(BASE_DIR=Path(self.static_dir), MEDIA_ROOT=self.static_dir):
+            # The worker restarted after the request committed, before the job ran
+            PendingImage.objects.create(
+                test=test, model='Question', object_id=question.id, field='question_image',
+                source=images.stage_image(png_data_url()), subfolder='question_images'
+            )
+            PendingImage.objects.update(created_at=F('created_at') - timedelta(hours=1))
+            images.purge_stale_uploads(max_age=0)
+
+            call_command('process_pending_images', stdout=StringIO())
+
+        question.refresh_from_db()
+        self.assertTrue(question.question_image.name.startswith('/static/question_images/'))
+        self.assertFalse(PendingImage.objects.exists())
+        self.assertEqual(Test.objects.get(id=test.id).version, 2)
+
+    def test_a_job_taken_over_from_a_stalled_worker_is_applied_once(self):
+        test = make_test(self.author, 2)
+        first, second = test.questions.order_by('order')
+        # The replaced image is still used by the other question
+        Question.objects.filter(test=test).update(question_image='/static/question_images/old.jpg')
+        StoredImage.objects.create(path='/static/question_images/old.jpg', ref_count=2)
+        real_save = images.save_uploaded_image
+        stalled = []
+
+        def save_then_stall(*args, **kwargs):
+            url = real_save(*args, **kwargs)
+            if not stalled:
+                # The worker stalls long enough for the command to take the job over
+                stalled.append(url)
+                PendingImage.objects.update(
+                    created_at=F('created_at') - timedelta(hours=1), claimed_at=F('claimed_at') - timedelta(hours=1)
+                )
+                call_command('process_pending_images', stdout=StringIO())
+            return url
+
+        with self.settings(BASE_DIR=Path(self.static_dir), MEDIA_ROOT=self.static_dir), \
+                mock.patch('skills.images.save_uploaded_image', save_then_stall):
+            worker = images.ImageJobs(test.id)
+            worker.pending = [PendingImage.objects.create(
+                test=test, model='Question', object_id=first.id, field='question_image',
+                source=images.stage_image(png_data_url()), subfolder='question_images',
+                replaces='/static/question_images/old.jpg'
+            )]
+            worker._submit(inline=True)
+
+        first.refresh_from_db()
+        self.assertEqual(first.question_image.name, stalled[0])
+        self.assertEqual(StoredImage.objects.get(path=stalled[0]).ref_count, 1)
+        self.assertEqual(StoredImage.objects.get(path='/static/question_images/old.jpg').ref_count, 1)
+        self.assertEqual(worker.processed, 0)
+        self.assertFalse(PendingImage.objects.exists())
+
+    def test_the_command_leaves_jobs_a_worker_is_running(self):
+        test = make_test(self.author, 1)
+        question = test.questions.get()
+
+        with self.settings(BASE_DIR=Path(self.static_dir), MEDIA_ROOT=self.static_dir):
+            PendingImage.objects.create(
+                test=test, model='Question', object_id=question.id, field='question_image',
+                source=images.stage_image(png_data_url()), subfolder='question_images'
+            )
+            # Recorded long ago, but a worker claimed it just now
+            PendingImage.objects.update(created_at=F('created_at') - timedelta(hours=1), claimed_at=F('created_at'))
+
+            call_command('process_pending_images', stdout=StringIO())
+
+        self.assertFalse(Question.objects.get(id=question.id).question_image)
+        self.assertTrue(PendingImage.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImagePoolTests(TransactionTestCase):
+    """The create view's images processed by the real worker pool"""
+
+    def setUp(self):
+        cache.clear()
+        snapshots._local_snapshots.clear()
+        self.author = User.objects.create_user(username='admin', password='x')
+        self.client.force_login(self.author)
+        self.static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_dir)
+        os.makedirs(os.path.join(self.static_dir, 'skills', 'static'))
+
+    def test_images_are_stored_by_the_pool_after_commit(self):
+        payload = {
+            'name': 'Illustrated',
+            'subject': 'Maths',
+            'duration': 10,
+            'questions': [{
+                'text': 'Which colour?',
+                'points': 1,
+                'questionImage': png_data_url(),
+                'options': [
+                    {'text': 'Red', 'isCorrect': True, 'optionImage': png_data_url(color=(0, 0, 255))},
+                    # Decodes fine but is not an image, so its job fails
+                    {'text': 'Blue', 'isCorrect': False, 'optionImage': base64.b64encode(b'not an image').decode()},
+                ]
+            }]
+        }
+
+        # One worker: the in-memory test database fails concurrent writers
+        # with "table is locked" instead of waiting like a database file
+        with self.settings(BASE_DIR=Path(self.static_dir), MEDIA_ROOT=self.static_dir), \
+                mock.patch('skills.images.IMAGE_PROCESSING_WORKERS', 1), \
+                mock.patch('skills.images._executor', None), \
+                self.assertLogs('skills.images', 'ERROR'):
+            data = self.client.post('/api/create-test/', data=json.dumps(payload), content_type='application/json').json()
+            # Waits for every submitted job
+            images.get_image_executor().shutdown(wait=True)
+
+        question = Question.objects.get(test_id=data['test_id'])
+        self.assertTrue(question.question_image.name.startswith('/static/question_images/'))
+        self.assertTrue(question.options.get(order=1).option_image)
+        self.assertFalse(question.options.get(order=2).option_image)
+        self.assertEqual(Test.objects.get(id=data['test_id']).version, 2)
+        self.assertFalse(PendingImage.objects.exists())
+
+        details = self.client.get(f"/api/get-test/{data['test_id']}/").json()
+        self.assertTrue(details['success'])
+        self.assertEqual(len(details['test']['questions'][0]['options']), 2)
+
+
+class ImportTestsCommandTests(SkillsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='curriculum', password='x')
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        os.makedirs(os.path.join(self.tmp, 'skills', 'static'))
+
+    def bundle_test(self, name, image=None):
+        return {
+            'name': name,
+            'subject': 'Maths',
+            'duration': 20,
+            'grade': '6',
+            'questions': [{
+                'text': f'{name} question {i}',
+                'points': 1,
+                'questionImage': image if i == 0 else None,
+                'options': [{'text': 'Yes', 'isCorrect': True}, {'text': 'No', 'isCorrect': False, 'optionImage': image}]
+            } for i in range(3)]
+        }
+
+    def test_zip_bundle_is_imported_with_shared_images(self):
+        png = base64.b64decode(png_data_url().split(',', 1)[1])
+        path = os.path.join(self.tmp, 'bank.zip')
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('tests.json', json.dumps([self.bundle_test(f'T{i}', 'img/shape.png') for i in range(5)]))
+            archive.writestr('img/shape.png', png)
+
+        with self.settings(BASE_DIR=Path(self.tmp)), CaptureQueriesContext(connection) as ctx:
+            call_command('import_tests', path, author='curriculum', workers=2, stdout=StringIO())
+
+        self.assertLess(len(ctx.captured_queries), 20)
+        self.assertEqual(Test.objects.filter(created_by=self.author).count(), 5)
+        self.assertEqual(Question.objects.count(), 15)
+        self.assertEqual(Option.objects.count(), 30)
+        option = Option.objects.filter(option_image__startswith='/static/option_images/').first()
+        self.assertEqual(StoredImage.objects.get(path=option.option_image.name).ref_count, 15)
+        self.assertEqual(StoredImage.objects.filter(path__startswith='/static/question_images/').get().ref_count, 5)
+
+    def test_invalid_bundle_reports_every_error_and_imports_nothing(self):
+        tests = [self.bundle_test('Good'), self.bundle_test('Bad', 'missing.png')]
+        tests[1]['subject'] = 'Chemistry'
+        path = os.path.join(self.tmp, 'bank.json')
+        with open(path, 'w') as bundle:
+            json.dump(tests, bundle)
+
+        with self.assertRaises(CommandError) as ctx:
+            call_command('import_tests', path, author='curriculum', stdout=StringIO())
+
+        message = str(ctx.exception)
+        self.assertIn('subject must be one of', message)
+        self.assertIn("image 'missing.png' not found", message)
+        self.assertFalse(Test.objects.exists())
@@ -1,14 +1,20 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from .cohorts import select_students
+from .dashboard import invalidate_dashboard
 from .models import StudyMaterial, StudentMaterial, SignupUser, StudentEvent
+from .materials import available_materials as get_available_materials, grades_display
+from .taxonomy import get_taxonomy, sub_topic_names, taxonomy_etag, topic_names
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.http import JsonResponse
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_POST
 import json
-from django.db.models import Count
 
 
 def upload_study_material(request):
@@ -160,44 +166,18 @@ def log_tab_change(request, student_id, tab_name):
         
         # If tab is 'assign', fetch available materials
         elif tab_name == 'assign':
-            # Extract numeric part from grade string (e.g., "Grade 1" -> 1)
-            try:
-                if student.grade.startswith('Grade '):
-                    student_grade = int(student.grade.split('Grade ')[1])
-                else:
-                    student_grade = int(student.grade)
-            except (ValueError, AttributeError):
-                student_grade = 0
-            
-            # Get all materials appropriate for this student's grade level that haven't been assigned
-            available_materials = []
-            all_materials = StudyMaterial.objects.all()
-            
-            for material in all_materials:
-                try:
-                    # Safely get grades list with error handling
-                    grade_list = material.get_grades_list()
-                    if student_grade in grade_list:
-                        # Check if material is already assigned
-                        if not StudentMaterial.objects.filter(student=student, material=material).exists():
-                            # Handle grades display safely
-                            try:
-                                grades_list = [f"Grade {g}" for g in material.grades.split(',') if g.strip()]
-                                grades_display = ", ".join(grades_list) if grades_list else "No grades specified"
-                            except (AttributeError, ValueError):
-                                grades_display = "Grades format error"
-                                
-                            available_materials.append({
-                                'id': material.id,
-                                'subject': material.subject,
-                                'file_link': material.file_link,
-                                'topic': material.topic,
-                                'sub_topic': material.sub_topic,
-                                'short_video_link': material.short_video_link,
-                                'grades': grades_display
-                            })
-                except Exception as e:
-                    continue
+            available_materials = [
+                {
+                    'id': material.id,
+                    'subject': material.subject,
+                    'file_link': material.file_link,
+                    'topic': material.topic,
+                    'sub_topic': material.sub_topic,
+                    'short_video_link': material.short_video_link,
+                    'grades': grades_display(material)
+                }
+                for material in get_available_materials(student)
+            ]
             
             # Group by subject
             subject_materials = {}
@@ -320,29 +300,15 @@ def student_detail(request, student_id):
         })
     
     # Get materials available for this student's grade that haven't been assigned yet
-    student_grade = int(student.grade)
-    
-    # Get all materials appropriate for this student's grade level
-    available_materials = []
-    all_materials = StudyMaterial.objects.all()
-    
-    for material in all_materials:
-        # Check if material is appropriate for student's grade
-        grade_list = material.get_grades_list()
-        if student_grade in grade_list:
-            # Check if material is already assigned
-            if not StudentMaterial.objects.filter(student=student, material=material).exists():
-                available_materials.append({
-                    'id': material.id,
-                    'subject': material.subject,
-                    'file_link': material.file_link,
-                    'grades': material.grades
-                })
-    
-    # Group by subject
-    for material in available_materials:
-        grades_list = [f"Grade {g}" for g in material['grades'].split(',')]
-        material['grades'] = ", ".join(grades_list)
+    available_materials = [
+        {
+            'id': material.id,
+            'subject': material.subject,
+            'file_link': material.file_link,
+            'grades': grades_display(material)
+        }
+        for material in get_available_materials(student)
+    ]
     
     context = {
         'student': student,
@@ -354,39 +320,32 @@ def student_detail(request, student_id):
     return render(request, 'skills/student_detail.html', context)
 
 
+@etag(taxonomy_etag)
+@cache_control(no_cache=True)
+def material_taxonomy(request):
+    """Subjects, topics and sub topics of the study materials with how many use each"""
+    return JsonResponse(get_taxonomy()['taxonomy'])
+
+
+@etag(taxonomy_etag)
+@cache_control(no_cache=True)
 def get_topics(request):
     subject = request.GET.get('subject', '')
     if not subject:
         return JsonResponse([], safe=False)
     
-    # Get unique topics for the selected subject, ordered by most used
-    topics = StudyMaterial.objects.filter(subject=subject)\
-        .exclude(topic__isnull=True)\
-        .exclude(topic__exact='')\
-        .values('topic')\
-        .annotate(count=Count('topic'))\
-        .order_by('-count', 'topic')
-    
-    # Extract just the topic names
-    topic_list = [item['topic'] for item in topics]
-    return JsonResponse(topic_list, safe=False)
+    # Topics of the selected subject, most used first
+    return JsonResponse(topic_names(subject), safe=False)
 
+@etag(taxonomy_etag)
+@cache_control(no_cache=True)
 def get_subtopics(request):
     subject = request.GET.get('subject', '')
     if not subject:
         return JsonResponse([], safe=False)
     
-    # Get unique topics for the selected subject, ordered by most used
-    sub_topics = StudyMaterial.objects.filter(subject=subject)\
-        .exclude(topic__isnull=True)\
-        .exclude(topic__exact='')\
-        .values('sub_topic')\
-        .annotate(count=Count('sub_topic'))\
-        .order_by('-count', 'sub_topic')
-    
-    # Extract just the topic names
-    subtopic_list = [item['sub_topic'] for item in sub_topics]
-    return JsonResponse(subtopic_list, safe=False)
+    # Sub topics of the selected subject (or of one of its topics), most used first
+    return JsonResponse(sub_topic_names(subject, request.GET.get('topic', '').strip()), safe=False)
 
 
 def assign_student_material(request, student_id, material_id):
@@ -419,6 +378,85 @@ def assign_student_material(request, student_id, material_id):
     return redirect('student_detail', student_id=student_id)
 
 
+@login_required(login_url='/signin/admin/')
+def assign_materials_to_students(request):
+    """Assign study materials to a list of students and/or a server-side cohort selector"""
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+    
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            material_ids = data.get('material_ids') or []
+            student_ids = data.get('student_ids') or []
+            selector = data.get('selector')
+            
+            if not material_ids or (not student_ids and not selector):
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Provide material_ids and student_ids or a selector'
+                }, status=400)
+            
+            try:
+                valid_until = datetime.strptime(data.get('valid_until') or '', '%Y-%m-%d').date()
+            except ValueError:
+                return JsonResponse({'success': False, 'message': 'valid_until must be a YYYY-MM-DD date'}, status=400)
+            if valid_until < timezone.now().date():
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Validity date must be today or in the future'
+                }, status=400)
+            
+            materials = set(StudyMaterial.objects.filter(id__in=material_ids).values_list('id', flat=True))
+            missing = sorted(set(map(int, material_ids)) - materials)
+            if missing:
+                return JsonResponse({
+                    'success': False,
+                    'message': f"Unknown study materials: {', '.join(map(str, missing))}"
+                }, status=400)
+            
+            students = list(select_students(student_ids, selector).values_list('id', flat=True))
+            assignments = StudentMaterial.objects.filter(student_id__in=students, material_id__in=materials)
+            
+            # Pairs that are already assigned are skipped by the unique (student, material) constraint
+            with transaction.atomic():
+                existing = assignments.count()
+                StudentMaterial.objects.bulk_create(
+                    [
+                        StudentMaterial(student_id=student_id, material_id=material_id, valid_until=valid_until)
+                        for student_id in students
+                        for material_id in materials
+                    ],
+                    batch_size=500,
+                    ignore_conflicts=True
+                )
+                created_count = assignments.count() - existing
+            
+            # bulk_create does not send signals
+            invalidate_dashboard(*students)
+            
+            total = len(students) * len(materials)
+            return JsonResponse({
+                'success': True,
+                'message': f'{created_count} new assignments for {len(students)} students and {len(materials)} materials',
+                'created': created_count,
+                'skipped': total - created_count,
+                'total': total,
+                'students': len(students),
+                'materials': len(materials)
+            })
+            
+        except (KeyError, TypeError, ValueError) as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error assigning materials: {str(e)}'
+            })
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+
 def remove_student_material(request, student_id, assignment_id):
     if request.method == 'POST':
         try:
@@ -34,6 +34,7 @@ urlpatterns = [
     #### Sign IN
     path('signin/', sign_in_views.signin_view, name='signin'),
     path('dashboard/', sign_in_views.dashboard_view, name='dashboard'),
+    path('student/<int:student_id>/events/', sign_in_views.student_events_view, name='student_events'),
 
     #### Log out
     path('logout/', sign_in_views.logout_view, name='logout'),
@@ -41,6 +42,9 @@ urlpatterns = [
     #### Admin Related
     path('signin/admin/', admin_views.admin_login_view, name='admin_login'),
     path('dashboard/admin/', admin_views.admin_dashboard_view, name='admin_dashboard'),
+    path('api/admin/students/', admin_views.students_table_view, name='admin_students_table'),
+    path('api/admin/materials/', admin_views.materials_table_view, name='admin_materials_table'),
+    path('api/admin/search/', admin_views.admin_search_view, name='admin_search'),
     path('student/<int:student_id>/', admin_views.student_detail_view, name='student_detail'),
     path('admin/logout/', admin_views.admin_logout_view, name='admin_logout'),
 
@@ -50,10 +54,12 @@ urlpatterns = [
     path('delete-study-material/<int:material_id>/', upload_study_material.delete_study_material, name='delete_study_material'),
     path('api/get-topics/', upload_study_material.get_topics, name='get_topics'),
     path('api/get-subtopics/', upload_study_material.get_subtopics, name='get_subtopics'),
+    path('api/material-taxonomy/', upload_study_material.material_taxonomy, name='material_taxonomy'),
 
     #### Student Material Management
     path('student/<int:student_id>/tab-change/<str:tab_name>/', upload_study_material.log_tab_change, name='log_tab_change'),
     path('student/<int:student_id>/assign-material/<int:material_id>/', upload_study_material.assign_student_material, name='assign_student_material'),
+    path('api/assign-materials/', upload_study_material.assign_materials_to_students, name='assign_materials'),
     path('student/<int:student_id>/remove-material/<int:assignment_id>/', upload_study_material.remove_student_material, name='remove_student_material'),
     path('student/<int:student_id>/event/create/', upload_study_material.create_event, name='create_event'),
     path('student/<int:student_id>/event/<int:event_id>/update/', upload_study_material.update_event, name='update_event'),
@@ -61,21 +67,27 @@ urlpatterns = [
 
     #### Practice Test Admin Routes
     path('api/create-test/', practice_tests.create_test_view, name='create_test'),
+    path('api/upload-test-image/', practice_tests.upload_test_image_view, name='upload_test_image'),
     path('api/get-all-tests/', practice_tests.get_all_tests, name='get_all_tests'),
     path('api/get-test/<int:test_id>/', practice_tests.get_test_details, name='get_test_details'),
     path('api/edit-test/<int:test_id>/', practice_tests.edit_test_view, name='edit_test'),
     path('api/delete-test/<int:test_id>/', practice_tests.delete_test_view, name='delete_test'),
+    path('api/question-bank/publish/', practice_tests.publish_to_bank_view, name='publish_to_bank'),
+    path('api/question-bank/generate/', practice_tests.generate_practice_test_view, name='generate_practice_test'),
     path('api/assign-test/', practice_tests.assign_test_to_students, name='assign_test'),
     path('api/get-students-for-assignment/', practice_tests.get_students_for_assignment, name='get_students_for_assignment'),
     path('test/<int:test_id>/results/', practice_tests.test_results_view, name='test_results'),
+    path('api/export-results/', practice_tests.export_results_view, name='export_results'),
     path('api/get-assigned-tests/<int:student_id>/', practice_tests.get_assigned_tests, name='get_assigned_tests'),
     path('api/revoke-test/<int:student_id>/<int:test_id>/', practice_tests.revoke_test_assignment, name='revoke_test_assignment'),
     path('api/extend-test/<int:student_id>/<int:test_id>/', practice_tests.extend_test_validity, name='extend_test_validity'),
+    path('api/student-progress/<int:student_id>/', practice_tests.student_progress_view, name='student_progress'),
     
     #### Student Test Routes
     path('student/<int:student_id>/tests/', practice_tests.student_test_list, name='student_test_list'),
     path('student/<int:student_id>/test/<int:test_id>/', practice_tests.take_test_view, name='take_test'),
     path('student/<int:student_id>/test/<int:test_id>/submit/', practice_tests.submit_test_view, name='submit_test'),
+    path('student/<int:student_id>/test/<int:test_id>/checkpoint/', practice_tests.checkpoint_test_view, name='checkpoint_test'),
     path('student/<int:student_id>/test/<int:test_id>/results/', practice_tests.test_results_view, name='test_results'),
     path('student/<int:student_id>/test/<int:test_id>/feedback/', practice_tests.test_feedback_view, name='test_feedback'),
 
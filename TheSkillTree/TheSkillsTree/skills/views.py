@@ -7,7 +7,7 @@ import pytz
 from datetime import datetime
 from .models import DemoBooking, Skill
 from .forms import DemoBookingForm
-from .models import SignupUser
+from .page_cache import render_public_page
 
 
 def custom_404_view(request, exception):
@@ -16,68 +16,18 @@ def custom_404_view(request, exception):
 
 
 def home(request):
-    skills = Skill.objects.all()
-    user_email = request.session.get('user_email')
-
-    user = None
-    profile_picture_url = None
-
-    if user_email:
-        try:
-            user = SignupUser.objects.get(email=user_email)
-            profile_picture_url = user.get_profile_picture_url()
-        except SignupUser.DoesNotExist:
-            user = None
-            profile_picture_url = None
-
-    context = {
-        'user': user,
-        'profile_picture_url': profile_picture_url,
-        'skills': skills
-    }
-    return render(request, 'skills/home.html', context)
+    # The skills are only read when the shared page cache is cold
+    return render_public_page(request, 'skills/home.html', lambda: {
+        'skills': Skill.objects.select_related('category')
+    })
 
 
 def about(request):
-    user_email = request.session.get('user_email')
-
-    user = None
-    profile_picture_url = None
-
-    if user_email:
-        try:
-            user = SignupUser.objects.get(email=user_email)
-            profile_picture_url = user.get_profile_picture_url()
-        except SignupUser.DoesNotExist:
-            user = None
-            profile_picture_url = None
-
-    context = {
-        'user': user,
-        'profile_picture_url': profile_picture_url,
-    }
-    return render(request, 'skills/about.html', context)
+    return render_public_page(request, 'skills/about.html')
 
 
 def contact(request):
-    user_email = request.session.get('user_email')
-
-    user = None
-    profile_picture_url = None
-
-    if user_email:
-        try:
-            user = SignupUser.objects.get(email=user_email)
-            profile_picture_url = user.get_profile_picture_url()
-        except SignupUser.DoesNotExist:
-            user = None
-            profile_picture_url = None
-
-    context = {
-        'user': user,
-        'profile_picture_url': profile_picture_url,
-    }
-    return render(request, 'skills/contact.html', context)
+    return render_public_page(request, 'skills/contact.html')
 
 
 def get_timezones(request):